@@ -50,11 +50,13 @@ export function useProctoring({
   const participantIdRef = useRef(userId || `participant-${Date.now()}`);
   const pythonAvailableRef = useRef<boolean | null>(null);
   const lastFrameRef = useRef<string | null>(null);
+  const nextFrameAtRef = useRef(0); // worker flow control: no capture before this (ms epoch)
   const dedupeRef = useRef<Set<string>>(new Set());
   const browserActivityCooldownRef = useRef<Record<string, number>>({});
   const audioContextRef = useRef<AudioContext | null>(null);
   const analyserRef = useRef<AnalyserNode | null>(null);
   const audioSourceRef = useRef<MediaStreamAudioSourceNode | null>(null);
+  const pcmTapRef = useRef<ScriptProcessorNode | null>(null);
   const audioStreamRef = useRef<MediaStream | null>(null);
 
   // Stable function refs — interval callbacks read these so they never go stale
@@ -102,6 +104,27 @@ export function useProctoring({
       analyser.fftSize = 256;
       const source = ctx.createMediaStreamSource(stream);
       source.connect(analyser);
+      if (window.electronAPI?.sendAudioChunk) {
+        // Stream raw PCM to the worker's voice-activity detection; audioEnergy stays the fallback
+        const tap = ctx.createScriptProcessor(4096, 1, 1);
+        const mute = ctx.createGain();
+        mute.gain.value = 0;
+        tap.onaudioprocess = (e) => {
+          const input = e.inputBuffer.getChannelData(0);
+          const pcm = new Int16Array(input.length);
+          for (let i = 0; i < input.length; i++) pcm[i] = Math.max(-1, Math.min(1, input[i])) * 0x7fff;
+          window.electronAPI.sendAudioChunk({
+            pcm,
+            sampleRate: ctx.sampleRate,
+            timestamp: Date.now() - (input.length / ctx.sampleRate) * 1000,
+            participantId: participantIdRef.current,
+          });
+        };
+        source.connect(tap);
+        tap.connect(mute);
+        mute.connect(ctx.destination);
+        pcmTapRef.current = tap;
+      }
       audioContextRef.current = ctx;
       analyserRef.current = analyser;
       audioSourceRef.current = source;
@@ -112,6 +135,7 @@ export function useProctoring({
 
   const stopAudioCapture = useCallback(() => {
     try {
+      pcmTapRef.current?.disconnect();
       audioSourceRef.current?.disconnect();
       audioContextRef.current?.close();
       audioStreamRef.current?.getTracks().forEach(t => t.stop());
@@ -119,6 +143,7 @@ export function useProctoring({
     audioContextRef.current = null;
     analyserRef.current = null;
     audioSourceRef.current = null;
+    pcmTapRef.current = null;
     audioStreamRef.current = null;
   }, []);
 
@@ -280,6 +305,8 @@ export function useProctoring({
       return;
     }
     const v = localVideoRef.current;
+    // The worker is still busy with earlier frames: don't capture one it would have to wait for
+    if (Date.now() < nextFrameAtRef.current) return;
     // Use 640x480 so YOLO can detect phones reliably (320x240 is too small)
     const imageData = captureFrame(640, 480);
     if (!imageData) {
@@ -296,7 +323,9 @@ export function useProctoring({
         userId: userIdRef.current,
         participantId: participantIdRef.current,
       });
-      console.debug(`[Proctor] IPC send-video-frame result: ${result}`);
+      console.debug(`[Proctor] IPC send-video-frame result: ${JSON.stringify(result)}`);
+      // Pace capture to what the analyzer sustains; the 1s interval stays the fastest rate
+      nextFrameAtRef.current = result?.waitMs > 1000 ? Date.now() + result.waitMs - 100 : 0;
     } catch (e) {
       console.error("[Proctor] sendVideoFrame IPC failed:", e);
     }
@@ -453,6 +482,11 @@ export function useProctoring({
           signal: AbortSignal.timeout(3000),
         });
 
+        // 429 = frame shed by admission control (stale or server busy) — skip this tick, service is still up
+        if (res.status === 429) {
+          console.debug(`[Proctor] frame shed by Python service, retry after ${res.headers.get("Retry-After") ?? "?"}s`);
+          return;
+        }
         if (!res.ok) throw new Error(`HTTP ${res.status}`);
         const analysis = await res.json();
         console.log(`[Proctor] Python response: faces=${analysis.faceCount} faceDetected=${analysis.faceDetected} alerts=${JSON.stringify(analysis.alerts)}`);
@@ -57,6 +57,7 @@ const alertTypeColor = (type: string) => {
     GAZE_DEVIATION: "bg-amber-500",
     SUSTAINED_SPEECH: "bg-teal-500",
     IDENTITY_MISMATCH: "bg-rose-600",
+    CAMERA_BLOCKED: "bg-slate-500",
     MANUAL_FLAG: "bg-red-600",
     PARTICIPANT_LEFT: "bg-gray-600",
   };
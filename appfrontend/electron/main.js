@@ -20,6 +20,63 @@ let blockerId = null;
 let rendererReady = false;
 const logBuffer = [];
 
+// Credit-based flow control with the worker (python-worker/flow_control.py), per participant
+const FLOW_LOST_MS = 5000;  // unanswered this long past the staleness bound: the frames were lost
+let flowDefaults = { credits: Infinity, staleMs: 0 };
+const flows = new Map();    // participant key -> { epoch, sent, answered, lost, rateFps, sentAt, answeredAt }
+
+function flowFor(key) {
+  let st = flows.get(key);
+  if (!st) {
+    st = { epoch: null, sent: 0, answered: 0, lost: 0, rateFps: null, sentAt: 0, answeredAt: Date.now() };
+    flows.set(key, st);
+  }
+  return st;
+}
+
+function noteFlow(msg) {
+  if (msg.status === "READY") {
+    flowDefaults = { credits: Infinity, staleMs: 0, ...(msg.flow || {}) };
+    flows.clear();
+    return;
+  }
+  const key = msg.participantId || msg.userId;
+  if (key == null) return;
+  const st = flowFor(key);
+  if (msg.flow) {
+    // The first epoch seen is adopted (worker_pool.py shards each have their own)
+    if (st.epoch != null && msg.flow.epoch !== st.epoch) {
+      // Restarted worker: nothing of ours is in flight there any more
+      st.sent = msg.flow.answered;
+      st.lost = 0;
+    }
+    st.epoch = msg.flow.epoch;
+    st.answered = msg.flow.answered;
+    st.rateFps = msg.flow.rateFps;
+    st.answeredAt = Date.now();
+  } else if (msg.status === "FRAME_DROPPED") {
+    st.lost += 1;   // dropped by worker_pool.py before reaching a worker
+    st.answeredAt = Date.now();
+  }
+}
+
+// Whether a frame may go to the worker now; otherwise how long until one may
+function flowGate(key) {
+  const st = flowFor(key);
+  const now = Date.now();
+  const credits = flowDefaults.credits;
+  const minGap = st.rateFps ? 1000 / st.rateFps : 0;
+  if (st.sent - st.answered - st.lost >= credits) {
+    if (now - st.answeredAt > (flowDefaults.staleMs || 0) + FLOW_LOST_MS) {
+      st.sent = st.answered + st.lost;   // never answered: lost with a crashed worker
+    } else {
+      return { ok: false, waitMs: Math.max(minGap, 100) };
+    }
+  }
+  const wait = st.sentAt + minGap - now;
+  return wait > 0 ? { ok: false, waitMs: wait } : { ok: true, waitMs: minGap };
+}
+
 function dbg(msg) {
   const line = `[PROCTOR] ${msg}`;
   console.log(line); // always in terminal
@@ -158,8 +215,10 @@ function getPythonExe() {
 }
 
 function startPythonWorker() {
-  // simple_proctoring_worker.py has YOLO support built-in now
-  const workerPath = path.join(__dirname, "python-worker", "simple_proctoring_worker.py");
+  // simple_proctoring_worker.py has YOLO support built-in now; with PROCTOR_POOL_WORKERS > 1,
+  // worker_pool.py runs that many of them behind the same protocol, sharded by participant
+  const pooled = parseInt(process.env.PROCTOR_POOL_WORKERS || "1", 10) > 1;
+  const workerPath = path.join(__dirname, "python-worker", pooled ? "worker_pool.py" : "simple_proctoring_worker.py");
   startWorker(workerPath);
 }
 
@@ -174,6 +233,8 @@ function startWorker(scriptPath) {
       // Clear PYTHONPATH so system numpy doesn't shadow venv numpy
       PYTHONPATH: "",
       PYTHONNOUSERSITE: "1",
+      // Only changed results, alerts and a periodic HEARTBEAT status line
+      PROCTOR_OUTPUT: process.env.PROCTOR_OUTPUT || "delta",
     },
   });
 
@@ -185,6 +246,7 @@ function startWorker(scriptPath) {
     lines.forEach((line) => {
       try {
         const analysis = JSON.parse(line);
+        noteFlow(analysis);
         if (analysis.status && !analysis.alerts) {
           dbg(`PY-STATUS: ${analysis.status}`);
           return;
@@ -264,29 +326,53 @@ ipcMain.handle("renderer-ready", () => {
   return true;
 });
 
+// Returns { sent, waitMs }: waitMs is when the worker can take the next frame (credits, measured rate)
 ipcMain.handle("send-video-frame", (event, frameData) => {
   const pyReady = pythonProcess && pythonProcess.stdin.writable;
   dbg(`IPC send-video-frame: pyReady=${pyReady} dataLen=${frameData?.imageData?.length ?? 0}`);
   if (pyReady) {
+    const key = frameData?.participantId || frameData?.userId;
+    const gate = flowGate(key);
+    if (!gate.ok) {
+      dbg(`send-video-frame: worker busy, next frame in ${Math.round(gate.waitMs)}ms`);
+      return { sent: false, waitMs: gate.waitMs };
+    }
     try {
       pythonProcess.stdin.write(
         JSON.stringify({ type: "VIDEO_FRAME", data: frameData }) + "\n",
       );
-      return true;
+      const st = flowFor(key);
+      st.sent += 1;
+      st.sentAt = Date.now();
+      return { sent: true, waitMs: gate.waitMs };
     } catch (error) {
       dbg(`Failed to send frame to Python: ${error.message}`);
     }
   } else {
     dbg("send-video-frame: Python process not ready!");
   }
-  return false;
+  return { sent: false, waitMs: 0 };
 });
 
-ipcMain.handle("load-reference-face", (event, { imageUrl, userId }) => {
+// Raw microphone PCM: a JSON header line, then the int16 samples as bytes (no base64)
+ipcMain.on("send-audio-chunk", (event, { pcm, sampleRate, timestamp, participantId }) => {
+  if (!pythonProcess || !pythonProcess.stdin.writable || !pcm) return;
+  try {
+    const bytes = Buffer.from(pcm.buffer, pcm.byteOffset, pcm.byteLength);
+    pythonProcess.stdin.write(
+      JSON.stringify({ type: "AUDIO_PCM", participantId, sampleRate, timestamp, bytes: bytes.length }) + "\n",
+    );
+    pythonProcess.stdin.write(bytes);
+  } catch (error) {
+    dbg(`Failed to send audio to Python: ${error.message}`);
+  }
+});
+
+ipcMain.handle("load-reference-face", (event, { imageUrl, userId, participantId }) => {
   if (pythonProcess && pythonProcess.stdin.writable) {
     try {
       pythonProcess.stdin.write(
-        JSON.stringify({ type: "LOAD_REFERENCE_FACE", imageUrl, userId }) + "\n"
+        JSON.stringify({ type: "LOAD_REFERENCE_FACE", imageUrl, userId, participantId }) + "\n"
       );
       return true;
     } catch (error) {
@@ -348,11 +434,18 @@ ipcMain.handle("stop-proctoring", () => {
   if (blockerId) { try { powerSaveBlocker.stop(blockerId); } catch {} blockerId = null; }
   try { globalShortcut.unregisterAll(); } catch {}
 
-  // Kill Python worker to free CPU/GPU resources
+  // Stop the Python worker to free CPU/GPU resources. STOP_PROCESSING first: the exam ended
+  // normally, so the worker deletes its state snapshot and the next session starts fresh.
   if (pythonProcess) {
-    try { pythonProcess.kill(); } catch {}
+    const proc = pythonProcess;
     pythonProcess = null;
-    dbg("Python worker killed on stop-proctoring");
+    try {
+      proc.stdin.write(JSON.stringify({ type: "STOP_PROCESSING" }) + "\n");
+      proc.stdin.end();
+    } catch {}
+    const killTimer = setTimeout(() => { try { proc.kill(); } catch {} }, 2000);
+    proc.once("exit", () => clearTimeout(killTimer));
+    dbg("Python worker stopped on stop-proctoring");
   }
   return true;
 });
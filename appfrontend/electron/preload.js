@@ -3,7 +3,8 @@ const { contextBridge, ipcRenderer } = require('electron');
 contextBridge.exposeInMainWorld('electronAPI', {
   // Proctoring methods
   sendVideoFrame: (frameData) => ipcRenderer.invoke('send-video-frame', frameData),
-  loadReferenceFace: (imageUrl, userId) => ipcRenderer.invoke('load-reference-face', { imageUrl, userId }),
+  sendAudioChunk: (chunk) => ipcRenderer.send('send-audio-chunk', chunk),
+  loadReferenceFace: (imageUrl, userId, participantId) => ipcRenderer.invoke('load-reference-face', { imageUrl, userId, participantId }),
   startProctoring: (sessionData) => ipcRenderer.invoke('start-proctoring', sessionData),
   stopProctoring: () => ipcRenderer.invoke('stop-proctoring'),
   getProctoringStatus: () => ipcRenderer.invoke('get-proctoring-status'),
@@ -0,0 +1,197 @@
+"""
+Offline proctoring analysis of a recorded exam (run from this directory).
+
+    python analyze_recording.py exam.mp4 --reference face.jpg --out alerts.jsonl
+    python analyze_recording.py frames/ --fps 1 --workers 8
+
+The input is a video file or a directory of JPEG/PNG frames. A directory is
+read in name order. If every file stem is a number, it is taken as the
+capture time in epoch milliseconds; otherwise frames are spaced 1/--fps apart.
+Video is sampled at --fps, the rate the live client sends frames at.
+
+The recording is cut into time chunks analyzed in parallel on a process pool,
+one fresh ProctoringAnalyzer per chunk. Each chunk first replays WARMUP_SECONDS
+of the preceding frames without reporting, so its timers, streaks and cooldowns
+match a single pass. Alert timing follows frame timestamps (analyze_frame's
+`now`), never the wall clock. The per-chunk alerts are concatenated in chunk
+order into one timeline, so the output does not depend on worker scheduling.
+Each alert is written as one JSON line with its offset into the recording.
+
+Recordings carry no audio energy values, so SUSTAINED_SPEECH is not evaluated.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Each pool process is single threaded; the pool provides the parallelism
+os.environ.setdefault("PROCTOR_PHONE_MODE", "serial")
+os.environ.setdefault("PROCTOR_CPU_BUDGET", "1")
+
+import cv2
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+DEFAULT_FPS    = 1.0     # live capture cadence (useProctoring sends a frame per second)
+WARMUP_SECONDS = 150.0   # longer than the longest cooldown (IDENTITY_COOL) plus its confirmation streak
+JPEG_QUALITY   = 80
+IMAGE_EXT      = (".jpg", ".jpeg", ".png")
+
+
+def list_frames(path, fps):
+    """[(offset seconds, file)] and the recording start (epoch seconds) for a frame directory."""
+    files = sorted(f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(IMAGE_EXT))
+    stems = [os.path.splitext(os.path.basename(f))[0] for f in files]
+    if files and all(s.isdigit() for s in stems):
+        first = int(stems[0]) / 1000.0
+        return [(int(s) / 1000.0 - first, f) for s, f in zip(stems, files)], first
+    return [(i / fps, f) for i, f in enumerate(files)], None
+
+
+def video_duration(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"cannot open {path}")
+    vfps   = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    cap.release()
+    return frames / vfps
+
+
+def iter_video(path, fps, t0, t1):
+    """(offset, JPEG bytes) for t0 <= offset < t1: the first video frame at or after each 1/fps tick."""
+    cap  = cv2.VideoCapture(path)
+    vfps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    idx  = int(t0 * vfps)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+    tick = math.ceil(t0 * fps - 1e-6)   # ticks sit on one global grid, whatever the chunk start
+    while True:
+        t = idx / vfps
+        if t >= t1 or not cap.grab():
+            break
+        if t + 1e-6 >= tick / fps:
+            ok, frame = cap.retrieve()
+            if ok:
+                yield t, cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])[1].tobytes()
+            tick = math.floor(t * fps + 1e-6) + 1
+        idx += 1
+    cap.release()
+
+
+def iter_files(frames, t0, t1):
+    for t, f in frames:
+        if t0 <= t < t1:
+            with open(f, "rb") as fh:
+                yield t, fh.read()
+
+
+def _quiet():
+    sys.stderr = open(os.devnull, "w")
+
+
+def run_chunk(job):
+    """Analyze one chunk; returns (alerts as (offset, alert), frames analyzed, warm-up frames)."""
+    from simple_proctoring_worker import ProctoringAnalyzer
+
+    analyzer = ProctoringAnalyzer()
+    analyzer.governor.adaptive = False   # no wall-clock backoff: every frame gets its full analysis
+    if job["reference"] is not None:
+        analyzer.load_reference_face(job["reference"], job["userId"])
+
+    warm = max(0.0, job["start"] - WARMUP_SECONDS)
+    if job["frames"] is None:
+        source = iter_video(job["source"], job["fps"], warm, job["end"])
+    else:
+        source = iter_files(job["frames"], warm, job["end"])
+
+    alerts, analyzed, warmed = [], 0, 0
+    for t, data in source:
+        result = analyzer.analyze_frame({"imageData": data}, now=job["base"] + t)
+        if t < job["start"]:
+            warmed += 1
+            continue
+        analyzed += 1
+        alerts.extend((round(t, 3), a) for a in result.get("alerts", []))
+    return alerts, analyzed, warmed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="video file or directory of frames")
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS, help="frames per second to analyze")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk", type=float, default=None,
+                        help="seconds per chunk (default: recording length / workers, at least 2x warm-up)")
+    parser.add_argument("--reference", default=None, help="reference face image for identity checks")
+    parser.add_argument("--user-id", default=None)
+    parser.add_argument("--start", type=float, default=None,
+                        help="recording start, epoch seconds (default: from numeric frame names, else file mtime - length)")
+    parser.add_argument("--out", default=None, help="alert timeline JSONL (default stdout)")
+    parser.add_argument("--verbose", action="store_true", help="keep the analyzer's [PY] logs")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        frames, named_start = list_frames(args.input, args.fps)
+        if not frames:
+            raise SystemExit(f"no frames in {args.input}")
+        duration = frames[-1][0] + 1.0 / args.fps
+    else:
+        frames, named_start = None, None
+        duration = video_duration(args.input)
+    if args.start is not None:
+        base = args.start
+    elif named_start is not None:
+        base = named_start
+    else:
+        # Not 0: cooldowns start at 0.0 and would hold back the first alerts.
+        # The file's mtime keeps runs over the same file identical.
+        first = args.input if frames is None else frames[0][1]
+        base  = float(int(os.path.getmtime(first) - duration))
+
+    reference = None
+    if args.reference:
+        with open(args.reference, "rb") as f:
+            reference = f.read()
+
+    workers = max(1, args.workers)
+    chunk   = args.chunk or max(duration / workers, 2 * WARMUP_SECONDS)   # keep warm-up overhead <= 50%
+    jobs, start = [], 0.0
+    while start < duration:
+        jobs.append({
+            "source": args.input, "frames": frames, "fps": args.fps, "base": base,
+            "start": start, "end": min(start + chunk, duration),
+            "reference": reference, "userId": args.user_id,
+        })
+        start += chunk
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                             initializer=None if args.verbose else _quiet) as pool:
+        chunks = list(pool.map(run_chunk, jobs))   # map keeps chunk order: the timeline is deterministic
+    wall = time.perf_counter() - t0
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    counts, analyzed, warmed = Counter(), 0, 0
+    for alerts, n, w in chunks:
+        analyzed += n
+        warmed   += w
+        for offset, alert in alerts:
+            counts[alert["alertType"]] += 1
+            out.write(json.dumps({"offsetSeconds": offset, **alert}) + "\n")
+    if out is not sys.stdout:
+        out.close()
+
+    print(f"{duration:.0f}s recording, {analyzed} frames (+{warmed} warm-up) in {len(jobs)} chunks "
+          f"on {min(workers, len(jobs))} processes: {wall:.1f}s wall, {duration / wall:.1f}x real time", file=sys.stderr)
+    for name, n in sorted(counts.items()):
+        print(f"  {name:<20}{n:>5}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Streaming voice-activity detection over raw microphone PCM.
+
+The host streams audio separately from video, as AUDIO_PCM messages: a JSON
+header line followed by exactly `bytes` raw bytes of int16 little-endian mono
+PCM (no base64, no JSON escaping):
+
+    {"type":"AUDIO_PCM","participantId":"p1","sampleRate":48000,"timestamp":<ms>,"bytes":N}\\n<N bytes>
+
+`timestamp` is the capture time of the chunk's first sample, epoch ms.
+
+Each participant has a ring buffer holding the last RING_SECONDS of samples.
+Once a chunk is appended, every complete SUB_MS sub-frame not yet classified
+is read back as one (sub-frames x samples) matrix and scored with array
+operations:
+
+  energy      mean square, dBFS; voiced needs ENERGY_DB and SNR_DB above
+              the participant's tracked noise floor
+  zcr         zero crossings per second, at most ZCR_MAX (hiss and fricative
+              noise cross far more often than voiced speech); wiggles inside
+              ZCR_DEADZONE x frame RMS of zero don't count, so background
+              noise riding on speech doesn't inflate it
+  band ratio  share of spectral energy in SPEECH_BAND, at least BAND_MIN
+              (hum, rumble and broadband noise fall outside it)
+
+Voiced sub-frames join into segments that bridge pauses up to HANGOVER_MS; a
+segment that has run for SPEECH_THRESH seconds raises SUSTAINED_SPEECH
+(SPEECH_COOL between alerts, the same thresholds as the energy path).
+
+All of it runs on the AudioChannel thread. main() only hands the bytes over;
+if the thread falls behind, whole chunks are dropped and counted, never
+queued in front of a video frame.
+"""
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+SUB_MS       = 20
+RING_SECONDS = float(os.environ.get("PROCTOR_AUDIO_RING", 30))
+ENERGY_DB    = -50.0          # absolute floor for voiced sub-frames, dBFS
+SNR_DB       = 10.0           # above the tracked noise floor
+ZCR_MAX      = 5000.0         # crossings per second
+ZCR_DEADZONE = 0.2            # fraction of the frame RMS treated as zero
+SPEECH_BAND  = (300.0, 3400.0)
+BAND_MIN     = 0.55
+FLOOR_RISE   = 3.0            # dB per second the noise floor may climb
+HANGOVER_MS  = 600
+SPEECH_THRESH = 15.0; SPEECH_COOL = 90.0
+STREAM_STALE = 3.0            # seconds without PCM before the energy path takes over again
+QUEUE_CHUNKS = 64             # ~5s of the renderer's 4096-sample chunks at 48 kHz
+SEGMENTS_KEPT = 32
+
+
+def _iso(t):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + "Z"
+
+
+def vad_features(frames, sample_rate):
+    """Energy (dBFS), zero crossings per second and speech-band ratio for each row of `frames`."""
+    energy = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    # Signs with a deadzone, zeros carrying the previous sign forward; a crossing is a sign flip
+    dead   = ZCR_DEADZONE * np.sqrt(np.mean(frames * frames, axis=1, keepdims=True))
+    signs  = np.where(frames > dead, 1, np.where(frames < -dead, -1, 0))
+    last   = np.where(signs != 0, np.arange(frames.shape[1]), 0)
+    np.maximum.accumulate(last, axis=1, out=last)
+    signs  = np.take_along_axis(signs, last, axis=1)
+    zcr    = np.count_nonzero(signs[:, 1:] * signs[:, :-1] < 0, axis=1) * (sample_rate / frames.shape[1])
+    power  = np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), axis=1)) ** 2
+    freqs  = np.fft.rfftfreq(frames.shape[1], 1.0 / sample_rate)
+    band   = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    ratio  = power[:, band].sum(axis=1) / (power.sum(axis=1) + 1e-12)
+    return energy, zcr, ratio
+
+
+class SpeechStream:
+    """One participant: ring buffer, noise floor and the current speech segment."""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.sub         = max(1, sample_rate * SUB_MS // 1000)
+        self.ring        = np.zeros(int(RING_SECONDS * sample_rate), np.float32)
+        self.written     = 0      # samples ever appended
+        self.classified  = 0      # samples ever classified
+        self.t0          = None   # epoch seconds of sample 0
+        self.floor       = ENERGY_DB - SNR_DB   # noise floor, dBFS; climbs at FLOOR_RISE to the real one
+        self.seg_start   = None;  self.last_voiced = None
+        self.alerted_at  = 0.0
+        self.voiced      = 0;     self.subframes   = 0
+        self.segments    = deque(maxlen=SEGMENTS_KEPT)   # closed (start, end), epoch seconds
+
+    def time_of(self, sample):
+        return self.t0 + sample / self.sample_rate
+
+    def append(self, pcm, ts):
+        """Add int16 samples captured from `ts` (epoch s); re-anchors after gaps or drops."""
+        if self.t0 is None or abs(self.time_of(self.written) - ts) > 1.0:
+            # First chunk, or the stream broke (dropped chunks, suspended tab): restart at ts
+            self.close_segment()
+            self.t0 = ts - self.written / self.sample_rate
+            self.classified = self.written
+        samples = pcm.astype(np.float32) * (1.0 / 32768.0)
+        n, cap = len(samples), len(self.ring)
+        if n > cap:
+            samples, self.written = samples[-cap:], self.written + n - cap
+            self.classified = max(self.classified, self.written)
+            n = cap
+        at = self.written % cap
+        first = min(n, cap - at)
+        self.ring[at:at + first] = samples[:first]
+        self.ring[:n - first]    = samples[first:]
+        self.written += n
+
+    def recent(self, seconds):
+        """The last `seconds` of audio from the ring buffer, oldest first."""
+        n = min(int(seconds * self.sample_rate), self.written, len(self.ring))
+        return self.ring[(self.written - n + np.arange(n)) % len(self.ring)]
+
+    def classify(self):
+        """Score every complete unclassified sub-frame at once; returns SUSTAINED_SPEECH alerts."""
+        count = (self.written - self.classified) // self.sub
+        if count <= 0:
+            return []
+        start  = self.classified
+        idx    = (start + np.arange(count * self.sub)) % len(self.ring)
+        frames = self.ring[idx].reshape(count, self.sub)
+        self.classified += count * self.sub
+
+        energy, zcr, ratio = vad_features(frames, self.sample_rate)
+        seconds = count * self.sub / self.sample_rate
+        quiet   = float(np.percentile(energy, 10))
+        self.floor = min(self.floor + FLOOR_RISE * seconds, quiet)
+        voiced = (energy > max(ENERGY_DB, self.floor + SNR_DB)) & (zcr <= ZCR_MAX) & (ratio >= BAND_MIN)
+        self.voiced    += int(voiced.sum())
+        self.subframes += count
+
+        # Segments over the voiced sub-frames: a new one starts after a pause longer than the hangover
+        alerts = []
+        hang   = HANGOVER_MS / 1000.0
+        sub_s  = self.sub / self.sample_rate
+        tv     = self.time_of(start + np.flatnonzero(voiced) * self.sub)
+        if len(tv):
+            prev_end = np.concatenate(([self.last_voiced if self.seg_start is not None else -np.inf], tv[:-1] + sub_s))
+            breaks   = tv - prev_end > hang
+            run      = np.cumsum(breaks)
+            starts   = tv[breaks]
+            seg_of   = np.where(run == 0, self.seg_start if self.seg_start is not None else np.nan,
+                                starts[np.maximum(run - 1, 0)] if len(starts) else np.nan)
+            for i in np.flatnonzero(breaks).tolist():
+                if i == 0:
+                    self.close_segment()
+                else:
+                    self.segments.append((float(seg_of[i - 1]), float(prev_end[i])))
+            held = tv + sub_s - seg_of > SPEECH_THRESH
+            for k in np.flatnonzero(held).tolist():
+                if tv[k] - self.alerted_at > SPEECH_COOL:
+                    elapsed = tv[k] + sub_s - seg_of[k]
+                    alerts.append({
+                        "alertType":   "SUSTAINED_SPEECH",
+                        "description": f"Continuous speech for {int(elapsed)}s",
+                        "confidence":  0.8, "severity": "MEDIUM", "timestamp": _iso(tv[k]),
+                        "source":      "vad",
+                    })
+                    self.alerted_at = float(tv[k])
+            self.seg_start   = float(seg_of[-1])
+            self.last_voiced = float(tv[-1] + sub_s)
+        if self.seg_start is not None and self.time_of(self.classified) - self.last_voiced > hang:
+            self.close_segment()
+        return alerts
+
+    def close_segment(self):
+        if self.seg_start is not None:
+            self.segments.append((self.seg_start, self.last_voiced))
+        self.seg_start = self.last_voiced = None
+
+    def stats(self):
+        return {
+            "sampleRate":   self.sample_rate,
+            "seconds":      round(self.written / self.sample_rate, 1),
+            "voicedRatio":  round(self.voiced / self.subframes, 3) if self.subframes else 0.0,
+            "noiseFloorDb": round(self.floor, 1),
+            "speaking":     self.seg_start is not None,
+            "segments":     len(self.segments),
+        }
+
+
+class AudioChannel:
+    def __init__(self, queue_chunks=QUEUE_CHUNKS):
+        self.streams  = {}                 # participant id -> SpeechStream
+        self.queue    = queue.Queue(maxsize=queue_chunks)
+        self.pending  = []                 # alerts not yet folded into a video result
+        self.lock     = threading.Lock()
+        self.received = 0
+        self.dropped  = 0
+        self.last_at  = None               # time.monotonic() of the last chunk
+        self.thread   = None
+        self.closed   = False
+
+    def submit(self, header, payload):
+        """Hot path (stdin loop): hand one chunk to the audio thread; never blocks."""
+        if self.closed:
+            return
+        self.last_at = time.monotonic()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="audio", daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait((header, payload))
+            self.received += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def streaming(self):
+        return self.last_at is not None and time.monotonic() - self.last_at < STREAM_STALE
+
+    def take_alerts(self):
+        with self.lock:
+            alerts, self.pending = self.pending, []
+        return alerts
+
+    def process(self, header, payload):
+        """Append and classify one chunk (audio thread, or inline in tools)."""
+        rate = int(header.get("sampleRate") or 16000)
+        pid  = header.get("participantId")
+        stream = self.streams.get(pid)
+        if stream is None or stream.sample_rate != rate:
+            stream = self.streams[pid] = SpeechStream(rate)
+        ts  = header.get("timestamp")
+        pcm = np.frombuffer(payload, "<i2", len(payload) // 2)
+        stream.append(pcm, float(ts) / 1000.0 if ts else time.time() - len(pcm) / rate)
+        alerts = stream.classify()
+        if alerts:
+            with self.lock:
+                self.pending.extend(alerts)
+        return alerts
+
+    def close(self):
+        """Stop the audio thread once it has drained what is queued (the participant is gone)."""
+        self.closed = True
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            header, payload = item
+            try:
+                self.process(header, payload)
+            except Exception as e:
+                print(f"[PY] audio error: {e}", file=sys.stderr)
+
+    def stats(self):
+        return {
+            "received":     self.received,
+            "dropped":      self.dropped,
+            "participants": {str(pid): s.stats() for pid, s in self.streams.items()},
+        }
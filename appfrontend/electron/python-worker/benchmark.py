@@ -0,0 +1,995 @@
+"""
+Benchmarks for the proctoring worker (run from this directory).
+
+    python benchmark.py quality --frames 60    # CPU per frame on good vs dark/covered feeds, quality gate on/off
+    python benchmark.py profiles               # per-stage latency and face agreement for each resolution profile
+    python benchmark.py parallel               # per-frame latency with phone detection serial / parallel / async
+    python benchmark.py governor --budget 0.5  # measured CPU vs budget and detector backoff over a paced feed
+    python benchmark.py output --minutes 10    # stdout bytes and host parse CPU, full vs delta results
+    python benchmark.py snapshot               # state snapshot capture/write/restore cost
+    python benchmark.py clock --seconds 30     # live wall-clock run vs unpaced frame-clock replay: same alerts?
+    python benchmark.py capture                # stdin recorder: hot-path cost, writer cost, capture size
+    python benchmark.py vad                    # PCM voice-activity detection vs per-frame energy; video latency
+    python benchmark.py passes                 # proctoring_worker face passes: worst-case latency, budget/order/pool
+    python benchmark.py backends --images 'rec/*.jpg'   # Haar cascades vs YuNet DNN: face latency and agreement
+    python benchmark.py gaze                   # eye-cascade gaze vs landmark head pose: cost and pose accuracy
+    python benchmark.py pool --workers 1,2,4   # worker_pool.py replay throughput by shard count
+    python benchmark.py flow --fps 10          # host outpacing the worker: FIFO vs staleness drops vs credits
+"""
+import argparse
+import base64
+import glob
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+
+def scene_frames(n, brightness=1.0, seed=0, size=(640, 480)):
+    """Distinct synthetic webcam-like JPEGs (base64): lit gradient, a head-sized blob, sensor noise."""
+    rng = np.random.RandomState(seed)
+    w, h = size
+    base = np.tile(np.linspace(60, 200, w, dtype=np.float32), (h, 1))
+    cv2.ellipse(base, (w // 2, h // 2), (w // 8, h // 5), 0, 0, 360, 150, -1)
+    cv2.rectangle(base, (w // 10, h // 10), (w // 4, h // 3), 230, -1)
+    out = []
+    for _ in range(n):
+        img = base * brightness + rng.normal(0, 4 * max(brightness, 0.1), (h, w))
+        img = np.clip(img, 0, 255).astype(np.uint8)
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        out.append(base64.b64encode(cv2.imencode(".jpg", img)[1].tobytes()).decode())
+    return out
+
+
+def cpu_per_frame(analyzer, frames):
+    t0 = time.process_time()
+    results = [analyzer.analyze_frame({"imageData": b64}) for b64 in frames]
+    return (time.process_time() - t0) / len(frames) * 1e3, results
+
+
+def bench_quality(args):
+    import contextlib
+    from simple_proctoring_worker import ProctoringAnalyzer
+
+    feeds = [
+        ("good",    scene_frames(args.frames, 1.0, seed=1)),
+        ("dark",    scene_frames(args.frames, 0.12, seed=2)),
+        ("covered", scene_frames(args.frames, 0.02, seed=3)),
+    ]
+    print(f"{'feed':<10}{'gate':<6}{'cpu ms/frame':>14}{'skipped':>9}{'NO_FACE':>9}{'CAMERA_BLOCKED':>16}")
+    for name, frames in feeds:
+        for gate in ("on", "off"):
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+                analyzer = ProctoringAnalyzer()
+                analyzer.gate.refresh = 0.0   # measure the detectors, not frame reuse
+                if gate == "off":
+                    analyzer.quality.assess = lambda small: None
+                # Compress the session clock so the 10s timers fire within the run
+                clock = [time.time()]
+
+                def fake_time():
+                    clock[0] += 0.5
+                    return clock[0]
+                real_time, time.time = time.time, fake_time
+                try:
+                    ms, results = cpu_per_frame(analyzer, frames)
+                finally:
+                    time.time = real_time
+            skipped = sum(r.get("analysis") == "skipped" for r in results)
+            types = [a["alertType"] for r in results for a in r["alerts"]]
+            print(f"{name:<10}{gate:<6}{ms:>14.2f}{skipped:>9}{types.count('NO_FACE'):>9}"
+                  f"{types.count('CAMERA_BLOCKED'):>16}")
+
+
+def iou(a, b):
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+def timed(stats, name, fn):
+    def wrapper(*a, **kw):
+        t0 = time.perf_counter()
+        try:
+            return fn(*a, **kw)
+        finally:
+            stats[name] = stats.get(name, 0.0) + time.perf_counter() - t0
+    return wrapper
+
+
+def bench_profiles(args):
+    """
+    Each profile analyzes the same frames with frame reuse disabled. Agreement
+    is the share of frames whose face boxes match the accuracy profile's
+    (same count, every box IoU >= 0.5). Pass --images with recorded webcam
+    JPEGs for meaningful agreement; the synthetic scene has no real faces.
+    """
+    import contextlib
+    import frame_pyramid
+    from simple_proctoring_worker import ProctoringAnalyzer
+
+    if args.images:
+        frames = [base64.b64encode(open(f, "rb").read()).decode() for f in sorted(glob.glob(args.images))]
+    else:
+        w, h = (int(v) for v in args.size.split("x"))
+        frames = scene_frames(args.frames, 1.0, seed=4, size=(w, h))
+    if not frames:
+        sys.exit("no frames")
+
+    boxes = {}
+    print(f"{'profile':<10}{'cpu ms':>9}{'wall ms':>9}{'faces ms':>10}{'phone ms':>10}{'ident ms':>10}{'agree':>8}")
+    for name in ("accuracy", "balanced", "low-end"):
+        os.environ["PROCTOR_PROFILE"] = name
+        stats = {}
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            analyzer = ProctoringAnalyzer()
+            analyzer.gate.refresh = 0.0
+            analyzer.detect_faces     = timed(stats, "faces", analyzer.detect_faces)
+            analyzer.detect_phone     = timed(stats, "phone", analyzer.detect_phone)
+            analyzer.compare_identity = timed(stats, "identity", analyzer.compare_identity)
+            if args.reference:
+                with open(args.reference, "rb") as f:
+                    analyzer.load_reference_face(base64.b64encode(f.read()).decode(), "bench")
+            found = []
+            c0, w0 = time.process_time(), time.perf_counter()
+            for b64 in frames:
+                analyzer.analyze_frame({"imageData": b64})
+                found.append(analyzer.last_det["faces"] if analyzer.last_det else [])
+            cpu, wall = time.process_time() - c0, time.perf_counter() - w0
+        boxes[name] = found
+        ref = boxes["accuracy"]
+        agree = sum(
+            len(a) == len(b) and all(max((iou(x, y) for y in b), default=0) >= 0.5 for x in a)
+            for a, b in zip(found, ref)
+        ) / len(frames)
+        n = len(frames)
+        print(f"{name:<10}{cpu / n * 1e3:>9.1f}{wall / n * 1e3:>9.1f}{stats.get('faces', 0) / n * 1e3:>10.1f}"
+              f"{stats.get('phone', 0) / n * 1e3:>10.1f}{stats.get('identity', 0) / n * 1e3:>10.1f}{agree:>8.0%}")
+    print(f"profiles: {frame_pyramid.PROFILES}")
+
+
+def cpu_stand_in(ms):
+    """
+    GIL-releasing CPU work of about `ms` milliseconds, calibrated single-threaded.
+    Stands in for YOLO when ultralytics/torch are not installed.
+    """
+    img = np.random.RandomState(0).randint(0, 255, (480, 640), np.uint8)
+    t0 = time.perf_counter()
+    for _ in range(20):
+        cv2.GaussianBlur(img, (15, 15), 0)
+    per = (time.perf_counter() - t0) / 20
+    n = max(1, int(ms / 1e3 / per))
+
+    def detect_phone(_img):
+        for _ in range(n):
+            cv2.GaussianBlur(img, (15, 15), 0)
+        return False
+    return detect_phone
+
+
+def bench_parallel(args):
+    import contextlib
+    from concurrent.futures import ThreadPoolExecutor
+    from simple_proctoring_worker import ProctoringAnalyzer, _split_threads
+
+    frames = scene_frames(args.frames, 1.0, seed=5)
+    cores = os.cpu_count() or 1
+    print(f"{cores} cores; thread split cv2/torch = {_split_threads(cores)}")
+    print(f"{'mode':<10}{'phone':<14}{'p50 ms':>9}{'p90 ms':>9}{'faces ms':>10}{'phone ms':>10}{'inferences':>12}")
+    for mode in ("serial", "parallel", "async"):
+        stats = {}
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            analyzer = ProctoringAnalyzer()
+        analyzer.gate.refresh = 0.0
+        phone = "yolo"
+        if analyzer.yolo is None:
+            analyzer.detect_phone = cpu_stand_in(args.phone_ms)
+            phone = f"~{args.phone_ms:.0f}ms cpu"
+        analyzer.detect_faces = timed(stats, "faces", analyzer.detect_faces)
+        analyzer.detect_phone = timed(stats, "phone", analyzer.detect_phone)
+        analyzer.phone_mode = mode
+        analyzer.phone_pool = ThreadPoolExecutor(max_workers=1) if mode != "serial" else None
+        lat, inferences = [], 0
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            for b64 in frames:
+                t0 = time.perf_counter()
+                r = analyzer.analyze_frame({"imageData": b64})
+                lat.append(time.perf_counter() - t0)
+                inferences += len(r.get("phoneResults", [])) if mode == "async" else 1
+                time.sleep(args.interval)
+        lat.sort()
+        n = len(frames)
+        print(f"{mode:<10}{phone:<14}{lat[n // 2] * 1e3:>9.1f}{lat[int(n * 0.9)] * 1e3:>9.1f}"
+              f"{stats['faces'] / n * 1e3:>10.1f}{stats.get('phone', 0) / max(inferences, 1) * 1e3:>10.1f}"
+              f"{inferences:>12}")
+
+
+def bench_governor(args):
+    import contextlib
+    os.environ["PROCTOR_CPU_BUDGET"] = str(args.budget)
+    from simple_proctoring_worker import ProctoringAnalyzer
+
+    frames = scene_frames(args.fps * 2, 1.0, seed=6)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        analyzer = ProctoringAnalyzer()
+    analyzer.gate.refresh = 0.0   # every frame would be a full analysis without the governor
+    print(f"budget {analyzer.governor.budget} cores, {args.fps} frames/s offered")
+    print(f"{'t s':>5}{'usage cores':>13}{'interval s':>12}{'computed':>10}{'reused':>8}")
+    start = time.monotonic()
+    counts = {"computed": 0, "reused": 0}
+    i, next_report = 0, 1.0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        while time.monotonic() - start < args.duration:
+            r = analyzer.analyze_frame({"imageData": frames[i % len(frames)]})
+            counts[r.get("analysis", "computed")] = counts.get(r.get("analysis", "computed"), 0) + 1
+            i += 1
+            delay = start + i / args.fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if time.monotonic() - start >= next_report:
+                rep = analyzer.governor.report()
+                print(f"{next_report:>5.0f}{rep['usageCores'] or 0:>13.2f}{rep['detectorInterval']:>12.2f}"
+                      f"{counts['computed']:>10}{counts['reused']:>8}", file=sys.__stdout__)
+                counts = {"computed": 0, "reused": 0}
+                next_report += 1.0
+
+
+NODE_PARSE = r"""
+const fs = require("fs");
+const text = fs.readFileSync(process.argv[1], "utf8");
+const t0 = process.cpuUsage();
+let results = 0;
+for (let r = 0; r < 20; r++) {
+  for (const line of text.split("\n")) {
+    if (!line.trim()) continue;
+    const a = JSON.parse(line);
+    if (a.status && !a.alerts) continue;
+    results++;
+  }
+}
+const used = process.cpuUsage(t0);
+console.log(((used.user + used.system) / 1000 / 20).toFixed(2));
+"""
+
+
+def host_parse_ms(data):
+    """CPU ms the Electron host spends splitting and parsing a stdout capture (node, else Python)."""
+    node = shutil.which("node")
+    with tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False) as f:
+        f.write(data)
+    try:
+        if node:
+            out = subprocess.run([node, "-e", NODE_PARSE, f.name], capture_output=True, text=True, check=True)
+            return float(out.stdout), "node"
+        import json
+        t0 = time.process_time()
+        for _ in range(20):
+            for line in data.decode().split("\n"):
+                if line.strip():
+                    json.loads(line)
+        return (time.process_time() - t0) / 20 * 1e3, "python"
+    finally:
+        os.unlink(f.name)
+
+
+def bench_output(args):
+    import contextlib
+    from output_channel import OutputChannel, orjson
+    from simple_proctoring_worker import ProctoringAnalyzer
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        analyzer = ProctoringAnalyzer()
+        samples = [analyzer.analyze_frame({"imageData": b64}) for b64 in scene_frames(10, 1.0, seed=7)]
+    for r in samples:
+        r.update({"meetingId": "m-1", "userId": "u-1", "participantId": "p-1"})
+    alert = {"type": "GAZE_AWAY", "severity": "medium", "message": "Looking away from screen for 5s",
+             "confidence": 0.8, "timestamp": samples[0]["timestamp"]}
+
+    n = int(args.minutes * 60 * args.fps)
+    alert_every = max(1, int(args.alert_every * args.fps))
+    print(f"{n} frames at {args.fps} fps, one alert every {args.alert_every:.0f}s, "
+          f"serializer {'orjson' if orjson else 'json'}")
+    print(f"{'mode':<7}{'lines':>8}{'bytes':>11}{'alerts':>8}{'parse ms':>10}")
+    base = None
+    for mode in ("full", "delta"):
+        buf = io.BytesIO()
+        ch = OutputChannel(mode, buf)
+        alerts = 0
+        for i in range(n):
+            r = dict(samples[i % len(samples)])
+            r["alerts"] = [alert] if i % alert_every == alert_every - 1 else []
+            alerts += ch.result(r, now=i / args.fps) and bool(r["alerts"])
+        data = buf.getvalue()
+        ms, parser_name = host_parse_ms(data)
+        lines = data.count(b"\n")
+        print(f"{mode:<7}{lines:>8}{len(data):>11}{alerts:>8}{ms:>10.2f}")
+        if base is None:
+            base = (len(data), ms)
+        else:
+            print(f"delta: {base[0] / len(data):.1f}x fewer bytes, {base[1] / max(ms, 1e-3):.1f}x less "
+                  f"{parser_name} parse CPU")
+
+
+def bench_snapshot(args):
+    import contextlib
+    import state_snapshot
+    from simple_proctoring_worker import ProctoringAnalyzer
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        analyzer = ProctoringAnalyzer()
+        fresh    = ProctoringAnalyzer()
+    rng = np.random.RandomState(0)
+    analyzer.ref_crops   = [rng.randn(s, s).astype(np.float32) for s in (32, 64, 96)]
+    analyzer.ref_user_id = "u-1"
+    analyzer.no_face_start, analyzer.phone_alerted_at = time.time() - 4, time.time() - 12
+    for _ in range(40):
+        analyzer.face_history.append(1)
+        analyzer.gaze_away_history.append(False)
+        analyzer.audio_history.append(float(rng.rand()))
+
+    path = os.path.join(tempfile.mkdtemp(), "state.snap")
+    capture_us, write_ms, read_ms = [], [], []
+    for _ in range(args.rounds):
+        t0 = time.perf_counter()
+        state = state_snapshot.capture(analyzer)
+        capture_us.append((time.perf_counter() - t0) * 1e6)
+        t0 = time.perf_counter()
+        size = state_snapshot.write_snapshot(path, [state])
+        write_ms.append((time.perf_counter() - t0) * 1e3)
+        t0 = time.perf_counter()
+        state_snapshot.restore(fresh, state_snapshot.read_snapshot(path)[0])
+        read_ms.append((time.perf_counter() - t0) * 1e3)
+    same = all(np.array_equal(a, b) for a, b in zip(analyzer.ref_crops, fresh.ref_crops)) and \
+        all(getattr(fresh, n) == getattr(analyzer, n) for n in state_snapshot.SCALARS)
+    os.remove(path)
+
+    med = lambda xs: sorted(xs)[len(xs) // 2]
+    print(f"snapshot {size} bytes, {args.rounds} rounds, restored state identical: {same}")
+    print(f"capture (frame loop)   {med(capture_us):8.1f} us median  {max(capture_us):8.1f} max")
+    print(f"write + fsync (thread) {med(write_ms):8.2f} ms median  {max(write_ms):8.2f} max")
+    print(f"mmap restore           {med(read_ms):8.2f} ms median  {max(read_ms):8.2f} max")
+    every = state_snapshot.SNAPSHOT_EVERY
+    print(f"every {every:.0f}s: {med(capture_us) / every / 1e3:.4f} ms/s on the frame loop, "
+          f"{med(write_ms) / every:.3f} ms/s on the snapshot thread")
+
+
+def bench_clock(args):
+    import contextlib
+    from clock import Clock
+    from simple_proctoring_worker import ProctoringAnalyzer
+
+    # An empty room, then the lens covered for the rest of the session
+    n = int(args.seconds * args.fps)
+    scene = scene_frames(20, 1.0, seed=8)
+    covered = base64.b64encode(cv2.imencode(".jpg", np.full((480, 640, 3), 3, np.uint8))[1].tobytes()).decode()
+    frames = [scene[i % 20] if i < n * 0.4 else covered for i in range(n)]
+
+    def run(clock, paced):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            analyzer = ProctoringAnalyzer()
+        analyzer.clock = clock
+        start, alerts = time.time(), []
+        t0 = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            for i, b64 in enumerate(frames):
+                if paced:
+                    delay = start + i / args.fps - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                fd = {"imageData": b64, "timestamp": int((start + i / args.fps) * 1000)}
+                alerts += [(round(analyzer.clock.last - start, 1), a["alertType"])
+                           for a in analyzer.analyze_frame(fd)["alerts"]]
+        return alerts, time.perf_counter() - t0
+
+    live, live_s = run(Clock("wall"), paced=True)
+    replay, replay_s = run(Clock("frame"), paced=False)
+    print(f"{n} frames at {args.fps} fps")
+    print(f"live   (wall clock, paced)    {live_s:6.1f}s  {live}")
+    print(f"replay (frame clock, unpaced) {replay_s:6.1f}s  {replay}")
+    same = [t for _, t in live] == [t for _, t in replay] and \
+        all(abs(a - b) <= 1.0 / args.fps + 0.2 for (a, _), (b, _) in zip(live, replay))
+    print(f"same alerts: {same}, replay {live_s / replay_s:.1f}x faster")
+
+
+def bench_capture(args):
+    import json
+    import stdin_capture
+
+    lines = [json.dumps({"type": "VIDEO_FRAME", "data": {"imageData": "data:image/jpeg;base64," + b64,
+                                                          "timestamp": 0, "userId": "u-1"}})
+             for b64 in scene_frames(args.frames, 1.0, seed=9)]
+    text_bytes = sum(len(l) + 1 for l in lines)
+
+    prefix = os.path.join(tempfile.mkdtemp(), "cap")
+    rec = stdin_capture.CaptureRecorder(prefix, max_mb=args.max_mb, max_files=args.files)
+    hot = []
+    for line in lines:
+        t0 = time.perf_counter()
+        rec.record(line)
+        hot.append((time.perf_counter() - t0) * 1e6)
+        time.sleep(0.01)   # frames arrive spaced out; gives the writer its turn as in the worker
+    rec.close()
+
+    t0 = time.perf_counter()
+    for line in lines:
+        stdin_capture.pack(0.0, line)
+    pack_ms = (time.perf_counter() - t0) / len(lines) * 1e3
+    files = stdin_capture.capture_files(prefix)
+    replayed = sum(1 for f in files for _ in stdin_capture.read_capture(f))
+
+    med = sorted(hot)[len(hot) // 2]
+    print(f"{len(lines)} frames, {text_bytes / len(lines) / 1024:.1f} KB per stdin line")
+    print(f"hot path record()   {med:7.1f} us median  {max(hot):7.1f} max")
+    print(f"writer thread pack  {pack_ms:7.2f} ms per frame")
+    print(f"capture {rec.bytes} bytes ({rec.bytes / text_bytes:.0%} of the text), {len(files)} file(s) kept "
+          f"of {rec.seq} written, {replayed} messages readable, {rec.dropped} dropped")
+
+
+def synth_audio(rate, seed=0):
+    """A labelled mic track: quiet room, speech, hiss, mains hum, fan + speech. Returns (int16 pcm, [(start, end, label)])."""
+    rng = np.random.RandomState(seed)
+
+    def room(sec, db=-65):
+        return rng.normal(0, 10 ** (db / 20), int(sec * rate))
+
+    def speech(sec, db=-25):
+        # Harmonics of a wandering ~120 Hz voice (falling with frequency) under three formants,
+        # in 4 Hz syllables with short gaps
+        t = np.arange(int(sec * rate)) / rate
+        f0 = 120 + 15 * np.sin(2 * np.pi * 0.3 * t)
+        phase = 2 * np.pi * np.cumsum(f0) / rate
+        sig = np.zeros_like(t)
+        for h in range(1, 30):
+            f = 120 * h
+            gain = sum(a * np.exp(-((f - fc) / bw) ** 2) for fc, bw, a in ((700, 200, 1.0), (1200, 250, 0.5), (2600, 400, 0.2)))
+            sig += (gain + 0.02) / h * np.sin(h * phase)   # glottal tilt
+        syllables = (np.sin(2 * np.pi * 4 * t) > -0.6).astype(float)
+        sig *= syllables / np.sqrt(np.mean(sig ** 2))
+        return sig * 10 ** (db / 20) + room(sec)
+
+    def hiss(sec, db=-30):
+        return rng.normal(0, 10 ** (db / 20), int(sec * rate))
+
+    def hum(sec, db=-25):
+        t = np.arange(int(sec * rate)) / rate
+        return 10 ** (db / 20) * np.sqrt(2) * (np.sin(2 * np.pi * 50 * t) + 0.3 * np.sin(2 * np.pi * 150 * t)) + room(sec)
+
+    parts = [("quiet", room(10)), ("speech", speech(25)), ("hiss", hiss(20)), ("hum", hum(20)),
+             ("speech", speech(20) + hiss(20, -45)), ("quiet", room(10))]
+    labels, at = [], 0.0
+    for name, x in parts:
+        labels.append((at, at + len(x) / rate, name))
+        at += len(x) / rate
+    pcm = np.clip(np.concatenate([x for _, x in parts]), -1, 1)
+    return (pcm * 32767).astype("<i2"), labels
+
+
+def analyser_energy(pcm, rate, at):
+    """What the renderer sends as audioEnergy: AnalyserNode byte spectrum (fftSize 256, -100..-30 dB) averaged / 255."""
+    x = pcm[max(0, int(at * rate) - 256):int(at * rate)].astype(np.float32) / 32768.0
+    if len(x) < 256:
+        return 0.0
+    mag = np.abs(np.fft.rfft(x * np.blackman(256)))[:128] / 256
+    db = 20 * np.log10(mag + 1e-12)
+    return float(np.mean(np.clip((db + 100) / 70, 0, 1)))
+
+
+def bench_vad(args):
+    import calendar
+    import contextlib
+    import audio_vad
+    from simple_proctoring_worker import ProctoringAnalyzer, SPEECH_ENERGY
+
+    rate = args.rate
+    pcm, labels = synth_audio(rate, seed=3)
+    chunk = args.chunk
+    t_start = 1_700_000_000.0
+
+    # VAD over the whole track in renderer-sized chunks
+    channel = audio_vad.AudioChannel()
+    alerts, cost = [], 0.0
+    for i in range(0, len(pcm), chunk):
+        part = pcm[i:i + chunk]
+        header = {"participantId": "p1", "sampleRate": rate, "timestamp": (t_start + i / rate) * 1000}
+        t0 = time.perf_counter()
+        alerts += channel.process(header, part.tobytes())
+        cost += time.perf_counter() - t0
+    stream = channel.streams["p1"]
+    seconds = len(pcm) / rate
+    print(f"{seconds:.0f}s at {rate} Hz in {chunk}-sample chunks ({chunk / rate * 1e3:.0f} ms)")
+    print(f"VAD cost {cost / seconds * 1e3:.2f} ms per audio second ({seconds / cost:.0f}x real time), "
+          f"{cost / (len(pcm) / chunk) * 1e6:.0f} us per chunk")
+
+    # Per-label voiced share: re-run the features on the label spans
+    sub = stream.sub
+    print(f"{'span':<16}{'label':<8}{'voiced sub-frames':>18}{'frames > SPEECH_ENERGY':>24}")
+    legacy_alerts, speech_start, alerted = [], None, 0.0
+    for a, b, name in labels:
+        frames = pcm[int(a * rate):int(b * rate)]
+        frames = frames[:len(frames) // sub * sub].astype(np.float32).reshape(-1, sub) / 32768.0
+        e, z, r = audio_vad.vad_features(frames, rate)
+        voiced = (e > audio_vad.ENERGY_DB) & (z <= audio_vad.ZCR_MAX) & (r >= audio_vad.BAND_MIN)
+        energies = [analyser_energy(pcm, rate, t) for t in np.arange(a + 1, b, 1.0)]
+        over = np.mean([x > SPEECH_ENERGY for x in energies]) if energies else 0.0
+        print(f"{a:5.0f}-{b:<4.0f}s     {name:<8}{voiced.mean():>18.0%}{over:>24.0%}")
+    # The former path: one analyser energy per 1 fps video frame
+    for t in np.arange(1, seconds, 1.0):
+        x = analyser_energy(pcm, rate, t)
+        if x > SPEECH_ENERGY:
+            if speech_start is None:
+                speech_start = t
+            elif t - speech_start > audio_vad.SPEECH_THRESH and t - alerted > audio_vad.SPEECH_COOL:
+                legacy_alerts.append(t)
+                alerted, speech_start = t, t
+        else:
+            speech_start = None
+    vad_at = [calendar.timegm(time.strptime(a["timestamp"], "%Y-%m-%dT%H:%M:%SZ")) - t_start for a in alerts]
+    print(f"SUSTAINED_SPEECH (cooldown {audio_vad.SPEECH_COOL:.0f}s)  vad at {[round(t) for t in vad_at]}s  "
+          f"energy path at {[round(t) for t in legacy_alerts]}s  "
+          f"(speech at {[(round(a), round(b)) for a, b, n in labels if n == 'speech']})")
+
+    # Video latency while PCM streams through the audio thread (default 10x real time)
+    frames = scene_frames(args.frames, 1.0, seed=4)
+
+    def video(with_audio):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            analyzer = ProctoringAnalyzer()
+        analyzer.gate.refresh = 0.0
+        stop = []
+
+        def feed():
+            i = 0
+            while not stop:
+                part = pcm[i % len(pcm):i % len(pcm) + chunk]
+                analyzer.audio.submit({"participantId": "p1", "sampleRate": rate,
+                                       "timestamp": (t_start + i / rate) * 1000}, part.tobytes())
+                i += chunk
+                time.sleep(chunk / rate / args.audio_speed)
+
+        feeder = None
+        if with_audio:
+            import threading
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
+        lat = []
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            for b64 in frames:
+                t0 = time.perf_counter()
+                analyzer.analyze_frame({"imageData": b64})
+                lat.append((time.perf_counter() - t0) * 1e3)
+        stop.append(True)
+        if feeder:
+            feeder.join()
+        lat.sort()
+        return lat[len(lat) // 2], lat[int(len(lat) * 0.95)], analyzer.audio.stats()
+
+    p50, p95, _ = video(False)
+    print(f"video only          p50 {p50:6.1f} ms  p95 {p95:6.1f} ms")
+    p50, p95, st = video(True)
+    print(f"video + {args.audio_speed:g}x audio   p50 {p50:6.1f} ms  p95 {p95:6.1f} ms  ({st['received']} chunks, {st['dropped']} dropped)")
+
+
+def bench_passes(args):
+    """
+    Legacy proctoring_worker.detect_faces latency, before (all seven passes in
+    fixed order, serial) and after (adaptive order with the default budget of
+    every pass, a trimmed --budget, optional pool), with the share of frames
+    where the face was found.
+    Scenarios: an empty frame, where no pass hits (the worst case), and a
+    participant turned away, where only the mirrored equalized profile pass
+    finds the face. Every pass runs its real cascade for the cost, but the
+    outcome is fixed by the scenario (synthetic frames have no real faces and
+    the odd cascade false positive would blur the comparison).
+    """
+    import contextlib
+    import proctoring_worker
+
+    if args.images:
+        frames = [cv2.imdecode(np.frombuffer(open(f, "rb").read(), np.uint8), cv2.IMREAD_COLOR)
+                  for f in sorted(glob.glob(args.images))]
+    else:
+        frames = [cv2.imdecode(np.frombuffer(base64.b64decode(b), np.uint8), cv2.IMREAD_COLOR)
+                  for b in scene_frames(args.frames, 1.0, seed=6)]
+
+    def analyzer(budget, workers, adaptive):
+        if budget is None:
+            os.environ.pop("PROCTOR_FACE_PASSES", None)
+        else:
+            os.environ["PROCTOR_FACE_PASSES"] = str(budget)
+        os.environ["PROCTOR_FACE_WORKERS"] = str(workers)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            a = proctoring_worker.ProctoringAnalyzer()
+        if not adaptive:
+            a._face_pass_order = lambda participant: list(a.face_passes)
+        return a
+
+    def run(a, hit_pass):
+        real = a._run_face_pass
+
+        def run_pass(name, grays, cancelled=None):
+            real(name, grays, cancelled)   # full cascade cost; the outcome is the scenario's
+            hit = name == hit_pass and not (cancelled is not None and cancelled.is_set())
+            return [[200, 120, 160, 160]] if hit else []
+
+        a._run_face_pass = run_pass
+        lat, ran, found = [], 0, 0
+        for img in frames:
+            t0 = time.perf_counter()
+            found += bool(a.detect_faces(img, "p1")[0])   # faces, not the upper-body fallback
+            lat.append((time.perf_counter() - t0) * 1e3)
+            ran += a.last_face_passes["ran"]
+        lat.sort()
+        return lat[len(lat) // 2], lat[-1], ran / len(frames), found / len(frames)
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or max(2, min(3, cores - 1))
+    configs = [("before", 7, 1, False), ("default (every pass)", None, 1, True),
+               (f"budget {args.budget}", args.budget, 1, True),
+               (f"budget {args.budget}, {workers} threads", args.budget, workers, True)]
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]}, {cores} cores")
+    print(f"{'config':<26}{'scenario':<12}{'p50 ms':>9}{'max ms':>9}{'passes':>8}{'found':>7}")
+    for label, budget, n_workers, adaptive in configs:
+        for scenario, hit_pass in (("empty", None), ("turned", "profile_eq_flip")):
+            a = analyzer(budget, n_workers, adaptive)
+            p50, worst, ran, found = run(a, hit_pass)
+            print(f"{label:<26}{scenario:<12}{p50:>9.1f}{worst:>9.1f}{ran:>8.1f}{found:>7.0%}")
+            if a.face_pool is not None:
+                a.face_pool.shutdown()
+
+
+def bench_backends(args):
+    """
+    Face detection per frame with each backend, in both workers, on the same
+    frames. Agreement is the share of frames where the backend's boxes match
+    Haar's (same count, every box IoU >= 0.5); pass --images with recorded
+    webcam JPEGs for it to mean anything, the synthetic scene has no faces.
+    """
+    import contextlib
+    import face_backends
+    import proctoring_worker
+    from frame_pyramid import FramePyramid
+    from simple_proctoring_worker import ProctoringAnalyzer
+
+    if args.images:
+        jpegs = [open(f, "rb").read() for f in sorted(glob.glob(args.images))]
+    else:
+        jpegs = [base64.b64decode(b) for b in scene_frames(args.frames, 1.0, seed=7)]
+    if not jpegs:
+        sys.exit("no frames")
+    frames = [cv2.imdecode(np.frombuffer(j, np.uint8), cv2.IMREAD_COLOR) for j in jpegs]
+
+    dnn = face_backends.load_face_backend("yunet", args.model)
+    if dnn is None:
+        print("yunet unavailable (see above); timing haar only. Fetch the model with download_models.py "
+              "or pass --model.")
+    backends = [("haar", None)] + ([("yunet", dnn)] if dnn is not None else [])
+
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'worker':<10}{'backend':<8}{'p50 ms':>9}{'max ms':>9}{'faces/frame':>13}{'agree':>8}")
+    for worker in ("simple", "legacy"):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            analyzer = ProctoringAnalyzer() if worker == "simple" else proctoring_worker.ProctoringAnalyzer()
+        ref = None
+        for name, backend in backends:
+            analyzer.face_dnn = backend
+            found, lat = [], []
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+                for img in frames:
+                    t0 = time.perf_counter()
+                    if worker == "simple":
+                        faces = analyzer.detect_faces(FramePyramid(img))[0]
+                    else:
+                        faces = analyzer.detect_faces(img, "bench")[0]
+                    lat.append((time.perf_counter() - t0) * 1e3)
+                    found.append(faces)
+            ref = ref or found
+            agree = sum(
+                len(a) == len(b) and all(max((iou(x, y) for y in b), default=0) >= 0.5 for x in a)
+                for a, b in zip(found, ref)
+            ) / len(frames)
+            lat.sort()
+            print(f"{worker:<10}{name:<8}{lat[len(lat) // 2]:>9.1f}{lat[-1]:>9.1f}"
+                  f"{sum(map(len, found)) / len(frames):>13.2f}{agree:>8.0%}")
+
+
+def bench_gaze(args):
+    """
+    Per-face gaze cost of the legacy eye-cascade check against head pose
+    (dlib 68-point predictor when installed and loaded, YuNet's five
+    landmarks otherwise), and head-pose accuracy on landmarks projected from
+    the PnP model at known yaw/pitch with pixel noise.
+    """
+    import contextlib
+    import head_pose
+    import proctoring_worker
+
+    frames = [cv2.imdecode(np.frombuffer(base64.b64decode(b), np.uint8), cv2.IMREAD_COLOR)
+              for b in scene_frames(args.frames, 1.0, seed=2)]
+    h, w = frames[0].shape[:2]
+    box = [w // 2 - 80, h // 2 - 100, 160, 200]   # the scene's head blob
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        legacy = proctoring_worker.ProctoringAnalyzer()
+    legacy.head_pose.mode = "heuristic"
+
+    def per_call(fn):
+        fn(frames[0])
+        t0 = time.perf_counter()
+        for img in frames:
+            fn(img)
+        return (time.perf_counter() - t0) / len(frames) * 1e3
+
+    cam = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], np.float64)
+    rng = np.random.RandomState(1)
+
+    def project(source, yaw, pitch):
+        model = head_pose.MODELS[source][0]
+        rot = cv2.Rodrigues(np.radians([0, yaw, 0]))[0] @ cv2.Rodrigues(np.radians([pitch, 0, 0]))[0]
+        pts, _ = cv2.projectPoints(model, cv2.Rodrigues(rot)[0], np.array([0.0, 0.0, 2500.0]), cam, None)
+        return pts.reshape(-1, 2) + rng.normal(0, args.noise, (len(model), 2))
+
+    pose = head_pose.HeadPose("heuristic")   # no predictor load; landmarks supplied below
+    pose.mode = "headpose"
+    marks = project("yunet5", 10, 5)
+    print(f"{len(frames)} frames {w}x{h}, face box {box[2]}x{box[3]}")
+    print(f"eye cascade (legacy check_gaze_away)   {per_call(lambda img: legacy.check_gaze_away(img, box)):7.2f} ms")
+    print(f"head pose, yunet5 landmarks (solvePnP)  {per_call(lambda img: pose.estimate(img, box, marks)):7.3f} ms")
+    predictor = head_pose.HeadPose("headpose")
+    for _ in range(50):
+        if predictor.predictor is not None:
+            break
+        time.sleep(0.1)
+    if predictor.predictor is not None:
+        print(f"head pose, dlib68 predictor in box      {per_call(lambda img: predictor.estimate(img, box)):7.2f} ms")
+    else:
+        missing = "dlib not installed" if not head_pose.DLIB_AVAILABLE else \
+            f"{os.path.basename(head_pose.PREDICTOR_FILE)} missing or unreadable, run download_models.py"
+        print(f"head pose, dlib68 predictor in box         n/a ({missing})")
+
+    # Accuracy: rotations built yaw-after-pitch, the order RQDecomp3x3 reports
+    correct = total = 0
+    for source in ("dlib68", "yunet5"):
+        pose.guess.clear()
+        errors = []
+        for yaw in range(-50, 51, 10):
+            for pitch in range(-40, 41, 10):
+                est = pose.solve(source, project(source, yaw, pitch), w, h)
+                if est is None:
+                    continue
+                if abs(yaw) <= 30 and abs(pitch) <= 30:
+                    errors.append(max(abs(est[0] - yaw), abs(est[1] - pitch)))
+                if min(abs(abs(yaw) - head_pose.YAW_MAX), abs(abs(pitch) - head_pose.PITCH_MAX)) > 5:
+                    total += 1
+                    correct += pose.away(*est) == (abs(yaw) > head_pose.YAW_MAX or abs(pitch) > head_pose.PITCH_MAX)
+        print(f"{source}: pose error within +-30 deg {np.median(errors):.1f} deg median, {max(errors):.1f} max "
+              f"({args.noise:g}px landmark noise)")
+    print(f"away verdict correct (poses > 5 deg from a limit): {correct}/{total}")
+
+
+def bench_pool(args):
+    """
+    Replay throughput of one multi-participant capture through worker_pool.py
+    with 1, 2, 4... shards (replay_capture.py --speed 0), and whether every
+    participant's results match the single-shard run. Shards only scale while
+    there are cores for them: on a machine with fewer cores than shards the
+    extra shards just time-share.
+    """
+    import json
+    import stdin_capture
+
+    prefix = os.path.join(tempfile.mkdtemp(), "pool")
+    rec = stdin_capture.CaptureRecorder(prefix)
+    rec.record(json.dumps({"type": "START_PROCESSING"}))
+    feeds = [scene_frames(min(args.frames, 8), 1.0, seed=p) for p in range(args.participants)]
+    for i in range(args.frames):
+        for p, feed in enumerate(feeds):
+            rec.record(json.dumps({"type": "VIDEO_FRAME", "data": {
+                "imageData": "data:image/jpeg;base64," + feed[i % len(feed)], "timestamp": 1.7e12 + i * 1000,
+                "participantId": f"p{p}", "userId": f"u{p}", "meetingId": "bench"}}))
+        time.sleep(0.002)
+    rec.close()
+    total = args.frames * args.participants
+    print(f"{args.participants} participants x {args.frames} frames, {os.cpu_count()} core(s)")
+
+    replay = os.path.join(SCRIPT_DIR, "replay_capture.py")
+    counts = [int(x) for x in args.workers.split(",")]
+    if max(counts) > (os.cpu_count() or 1):
+        print(f"NOTE: more shards than cores; speedups beyond {os.cpu_count()} shard(s) are not a scaling "
+              "measurement, rerun on a machine with at least as many cores as shards")
+    print(f"{'shards':>6}{'wall s':>9}{'frames/s':>10}{'speedup':>9}  same results as 1")
+    base_fps, base_out = None, None
+    for n in counts:
+        out = f"{prefix}.out{n}.jsonl"
+        err = subprocess.run([sys.executable, replay, "replay", prefix, "--speed", "0", "--workers", str(n),
+                              "--out", out], capture_output=True, text=True).stderr
+        wall = float(err.rsplit(" replay (", 1)[0].rsplit(", ", 1)[1].rstrip("s"))
+        fps  = total / wall
+        same = "-"
+        if base_out is None:
+            base_fps, base_out = fps, out
+        else:
+            same = "yes" if subprocess.run([sys.executable, replay, "diff", base_out, out],
+                                           capture_output=True).returncode == 0 else "NO"
+        print(f"{n:>6}{wall:>9.1f}{fps:>10.1f}{fps / base_fps:>8.2f}x  {same}")
+
+
+def bench_flow(args):
+    """
+    A host capturing faster than the worker analyzes (--fps), three ways:
+    plain FIFO (the old protocol), staleness drops only, and a host that
+    honours the credits and rateFps the worker grants (main.js's flowGate).
+    Latency is capture timestamp to result line.
+    """
+    import json
+    import queue
+    import threading
+
+    w, h = map(int, args.size.split("x"))
+    # Alternating exposure: every frame differs enough that the frame gate runs the full analysis
+    bright, dim = scene_frames(6, 1.0, seed=5, size=(w, h)), scene_frames(6, 0.7, seed=6, size=(w, h))
+    frames = [f for pair in zip(bright, dim) for f in pair]
+
+    def run(label, credits, stale_ms):
+        env = dict(os.environ, PROCTOR_OUTPUT="full", PROCTOR_STATE_FILE="", PROCTOR_STALE_MS=str(stale_ms))
+        proc = subprocess.Popen([sys.executable, os.path.join(SCRIPT_DIR, "simple_proctoring_worker.py")],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+        ready, lock = threading.Event(), threading.Lock()
+        lat, flow, stamps = [], {"answered": 0, "rateFps": None, "dropped": 0}, []
+
+        def reader():
+            for line in proc.stdout:
+                msg = json.loads(line)
+                with lock:
+                    if msg.get("status") == "READY":
+                        ready.set()
+                    flow.update(msg.get("flow") or {})
+                    if "alerts" in msg:   # answers come in send order; `answered` numbers this one
+                        lat.append(time.time() * 1000 - stamps[flow["answered"] - 1])
+
+        def writer():   # Node's stdin.write never blocks: it buffers without bound, as this queue does
+            for data in iter(pending.get, None):
+                proc.stdin.write(data)
+                proc.stdin.flush()
+            proc.stdin.close()
+
+        pending = queue.Queue()
+        threading.Thread(target=reader, daemon=True).start()
+        threading.Thread(target=writer, daemon=True).start()
+        ready.wait()
+        sent, skipped, sent_at = 0, 0, 0.0
+        end = time.monotonic() + args.seconds
+        while time.monotonic() < end:
+            tick = time.monotonic()
+            with lock:
+                in_flight, rate = sent - flow["answered"], flow["rateFps"]
+            if credits and (in_flight >= credits or (rate and tick - sent_at < 1.0 / rate)):
+                skipped += 1
+            else:
+                now_ms = time.time() * 1000
+                msg = {"type": "VIDEO_FRAME", "data": {"imageData": frames[sent % len(frames)], "timestamp": now_ms,
+                                                        "participantId": "p1"}}
+                with lock:
+                    stamps.append(now_ms)
+                pending.put((json.dumps(msg) + "\n").encode())
+                sent, sent_at = sent + 1, tick
+            time.sleep(max(0.0, 1.0 / args.fps - (time.monotonic() - tick)))
+        backlog_at = time.monotonic()
+        pending.put(None)
+        proc.wait()
+        drain = time.monotonic() - backlog_at
+        lat.sort()
+        p50 = lat[len(lat) // 2] if lat else float("nan")
+        p95 = lat[int(len(lat) * 0.95)] if lat else float("nan")
+        print(f"{label:<18}{sent:>6}{skipped:>9}{flow['dropped']:>9}{len(lat):>9}{p50:>9.0f}{p95:>9.0f}"
+              f"{drain:>9.1f}  {flow['rateFps']}")
+
+    print(f"capture {args.fps} fps for {args.seconds:.0f}s, staleness bound {args.stale_ms:.0f} ms")
+    print(f"{'host':<18}{'sent':>6}{'skipped':>9}{'dropped':>9}{'results':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'drain s':>9}  rateFps")
+    run("fifo", 0, 0)
+    run("stale drops", 0, args.stale_ms)
+    run("credits + rate", 2, args.stale_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("quality", help="CPU per frame on good vs poor feeds with the quality gate on and off")
+    p.add_argument("--frames", type=int, default=60)
+    p.set_defaults(func=bench_quality)
+
+    p = sub.add_parser("profiles", help="per-stage latency and face agreement per resolution profile")
+    p.add_argument("--frames", type=int, default=40)
+    p.add_argument("--size", default="1280x720", help="synthetic frame size")
+    p.add_argument("--images", default=None, help="glob of recorded JPEG frames instead of synthetic ones")
+    p.add_argument("--reference", default=None, help="reference face JPEG, enables the identity stage")
+    p.set_defaults(func=bench_profiles)
+
+    p = sub.add_parser("parallel", help="per-frame latency with phone detection serial vs parallel")
+    p.add_argument("--frames", type=int, default=30)
+    p.add_argument("--phone-ms", type=float, default=60.0, help="stand-in YOLO cost when ultralytics is missing")
+    p.add_argument("--interval", type=float, default=0.0, help="idle seconds between frames (capture cadence)")
+    p.set_defaults(func=bench_parallel)
+
+    p = sub.add_parser("governor", help="measured CPU vs budget and detector backoff over a paced feed")
+    p.add_argument("--budget", type=float, default=0.5)
+    p.add_argument("--fps", type=int, default=5)
+    p.add_argument("--duration", type=float, default=12.0)
+    p.set_defaults(func=bench_governor)
+
+    p = sub.add_parser("output", help="stdout bytes and host parse CPU for full vs delta results")
+    p.add_argument("--minutes", type=float, default=10.0)
+    p.add_argument("--fps", type=int, default=5)
+    p.add_argument("--alert-every", type=float, default=60.0, help="seconds between injected alerts")
+    p.set_defaults(func=bench_output)
+
+    p = sub.add_parser("snapshot", help="state snapshot capture/write/restore cost")
+    p.add_argument("--rounds", type=int, default=200)
+    p.set_defaults(func=bench_snapshot)
+
+    p = sub.add_parser("clock", help="live wall-clock run vs unpaced frame-clock replay of the same frames")
+    p.add_argument("--seconds", type=float, default=30.0)
+    p.add_argument("--fps", type=int, default=2)
+    p.set_defaults(func=bench_clock)
+
+    p = sub.add_parser("capture", help="stdin recorder: hot-path cost, writer cost, capture size")
+    p.add_argument("--frames", type=int, default=100)
+    p.add_argument("--max-mb", type=float, default=1.0, help="per-file cap (small, to exercise rotation)")
+    p.add_argument("--files", type=int, default=3)
+    p.set_defaults(func=bench_capture)
+
+    p = sub.add_parser("vad", help="PCM voice-activity detection vs per-frame energy; video latency with audio streaming")
+    p.add_argument("--rate", type=int, default=48000)
+    p.add_argument("--chunk", type=int, default=4096, help="samples per AUDIO_PCM chunk")
+    p.add_argument("--frames", type=int, default=30)
+    p.add_argument("--audio-speed", type=float, default=10.0, help="PCM feed rate during the video run, x real time")
+    p.set_defaults(func=bench_vad)
+
+    p = sub.add_parser("passes", help="proctoring_worker face passes: worst-case latency before/after budget and order")
+    p.add_argument("--frames", type=int, default=20)
+    p.add_argument("--images", default=None, help="glob of recorded JPEG frames instead of synthetic ones")
+    p.add_argument("--budget", type=int, default=4, help="trimmed pass budget to compare with the default")
+    p.add_argument("--workers", type=int, default=0, help="pool threads for the concurrent run (default min(3, cores-1), at least 2)")
+    p.set_defaults(func=bench_passes)
+
+    p = sub.add_parser("backends", help="Haar cascades vs YuNet DNN: per-frame face latency and agreement")
+    p.add_argument("--frames", type=int, default=20)
+    p.add_argument("--images", default=None, help="glob of recorded JPEG frames instead of synthetic ones")
+    p.add_argument("--model", default=None, help="YuNet ONNX file (default PROCTOR_FACE_MODEL or the bundled path)")
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser("gaze", help="eye-cascade gaze vs landmark head pose: per-face cost and pose accuracy")
+    p.add_argument("--frames", type=int, default=30)
+    p.add_argument("--noise", type=float, default=1.5, help="landmark noise, pixels")
+    p.set_defaults(func=bench_gaze)
+
+    p = sub.add_parser("pool", help="worker_pool.py replay throughput by shard count, results vs one shard")
+    p.add_argument("--participants", type=int, default=8)
+    p.add_argument("--frames", type=int, default=20, help="frames per participant")
+    p.add_argument("--workers", default="1,2,4", help="shard counts to compare")
+    p.set_defaults(func=bench_pool)
+
+    p = sub.add_parser("flow", help="host capturing faster than the worker: FIFO vs staleness drops vs credits")
+    p.add_argument("--fps", type=float, default=10.0, help="host capture rate")
+    p.add_argument("--seconds", type=float, default=15.0)
+    p.add_argument("--stale-ms", type=float, default=1500.0)
+    p.add_argument("--size", default="1920x1080", help="synthetic frame size (sets the analysis cost)")
+    p.set_defaults(func=bench_flow)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
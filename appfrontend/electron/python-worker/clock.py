@@ -0,0 +1,65 @@
+"""
+Clock sources for the analyzer's timers and cooldowns.
+
+  wall   time.time() when the frame is processed (the live default)
+  frame  the frame's own capture time: the "timestamp" the client sends, in
+         epoch milliseconds; frames without one fall back to the wall clock
+  sim    a simulated clock: starts at PROCTOR_SIM_START and advances
+         PROCTOR_SIM_STEP seconds per frame, or whatever set()/advance() say
+
+With frame or sim time, a recorded session can be replayed as fast as the CPU
+allows and still hit the same NO_FACE/GAZE/cooldown thresholds as the live run.
+
+Whatever the source, time handed out never moves backwards: an out-of-order
+frame is clamped to the latest time already seen. Timers and cooldowns then
+can't go negative or re-arm, and each clamp is counted.
+
+Select the source with PROCTOR_CLOCK=wall|frame|sim.
+"""
+import os
+import time
+
+SOURCES = ("wall", "frame", "sim")
+
+
+class Clock:
+    def __init__(self, source="wall", start=0.0, step=0.0):
+        if source not in SOURCES:
+            raise ValueError(f"unknown clock {source!r} (choose from {', '.join(SOURCES)})")
+        self.source   = source
+        self.sim_time = start
+        self.step     = step
+        self.last     = None
+        self.clamped  = 0
+
+    def set(self, t):
+        self.sim_time = t
+
+    def advance(self, dt):
+        self.sim_time += dt
+
+    def now(self, frame_ts_ms=None):
+        """Epoch seconds for the frame being analyzed; never earlier than the previous call."""
+        if self.source == "frame" and frame_ts_ms:
+            t = float(frame_ts_ms) / 1000.0
+        elif self.source == "sim":
+            t = self.sim_time
+            self.sim_time += self.step
+        else:
+            t = time.time()
+        if self.last is not None and t < self.last:
+            self.clamped += 1
+            t = self.last
+        self.last = t
+        return t
+
+    def stats(self):
+        return {"source": self.source, "clamped": self.clamped}
+
+
+def clock_from_env():
+    return Clock(
+        os.environ.get("PROCTOR_CLOCK", "wall"),
+        start=float(os.environ.get("PROCTOR_SIM_START", time.time())),
+        step=float(os.environ.get("PROCTOR_SIM_STEP", 1.0)),
+    )
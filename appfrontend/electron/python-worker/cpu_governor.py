@@ -0,0 +1,118 @@
+"""
+CPU budget governor for the proctoring worker.
+
+The exam laptop is also running the call, so the worker gets a budget in
+cores rather than the whole machine. The budget comes from PROCTOR_CPU_BUDGET
+(set by whoever spawns the worker) or a SET_CPU_BUDGET message after READY.
+It defaults to half the cores. From the budget the governor:
+
+  - sizes every thread pool: OpenMP/BLAS env vars (set before cv2/torch are
+    imported), cv2.setNumThreads, torch intra-op threads and the phone thread;
+  - optionally pins the process to that many cores (PROCTOR_CPU_PIN=1),
+    taking the highest-numbered ones so core 0 stays with the UI;
+  - measures actual usage (process CPU seconds per wall second, smoothed) and
+    backs off the detector cadence when usage exceeds the budget. Frames in
+    between reuse the last detections, exactly like the frame gate, so the
+    time-based alert timers keep running. PROCTOR_CPU_ADAPTIVE=0 turns the
+    backoff off (replays and offline analysis, where it would make the output
+    depend on how fast the frames are fed).
+"""
+import math
+import os
+import time
+
+DEFAULT_BUDGET = max(1.0, (os.cpu_count() or 2) / 2)
+USAGE_ALPHA    = 0.2     # EWMA weight of each new usage sample
+SAMPLE_EVERY   = 1.0     # seconds between usage samples
+BACKOFF_STEP   = 0.25    # seconds added to the detector interval per over-budget sample
+MAX_INTERVAL   = 2.0     # never stretch beyond the frame gate's refresh
+RELAX_BELOW    = 0.7     # shrink the interval again once usage is under 70% of budget
+
+THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def budget_from_env():
+    try:
+        return max(0.5, float(os.environ.get("PROCTOR_CPU_BUDGET", DEFAULT_BUDGET)))
+    except ValueError:
+        return DEFAULT_BUDGET
+
+
+def preset_thread_env(budget=None):
+    """Must run before cv2/torch are imported: their OpenMP pools read these once."""
+    threads = str(max(1, int(budget or budget_from_env())))
+    for name in THREAD_ENV:
+        os.environ.setdefault(name, threads)
+
+
+class CpuGovernor:
+    def __init__(self, budget=None, pin=None):
+        self.budget   = budget or budget_from_env()
+        self.pin      = os.environ.get("PROCTOR_CPU_PIN") == "1" if pin is None else pin
+        self.threads  = {}
+        self.pinned   = None
+        self.interval = 0.0           # minimum seconds between full analyses
+        self.usage    = None          # smoothed cores in use
+        self.adaptive = os.environ.get("PROCTOR_CPU_ADAPTIVE", "1") != "0"   # False: never back off (offline)
+        self._allowed = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+        self._cpu0    = time.process_time()
+        self._wall0   = time.monotonic()
+
+    def apply(self, cv2_mod, split, phone_thread):
+        """Size cv2/torch pools from the budget. split(cores) -> (cv2, torch)."""
+        cores = max(1, int(self.budget))
+        if phone_thread:
+            cv2_threads, torch_threads = split(cores)
+        else:
+            cv2_threads = torch_threads = cores
+        cv2_mod.setNumThreads(cv2_threads)
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            torch_threads = None
+        self.threads = {"cv2": cv2_threads, "torch": torch_threads, "phone": 1 if phone_thread else 0}
+        if hasattr(os, "sched_setaffinity"):
+            if self.pin:
+                avail = sorted(self._allowed)
+                want  = avail[-max(1, math.ceil(self.budget)):]
+                os.sched_setaffinity(0, want)
+                self.pinned = want
+            elif self.pinned is not None:
+                os.sched_setaffinity(0, self._allowed)
+                self.pinned = None
+        return self.threads
+
+    def set_budget(self, budget, cv2_mod, split, phone_thread, pin=None):
+        self.budget = max(0.5, float(budget))
+        if pin is not None:
+            self.pin = pin
+        self.interval = 0.0
+        return self.apply(cv2_mod, split, phone_thread)
+
+    def sample(self):
+        """Update measured usage and the detector interval; call once per frame."""
+        wall = time.monotonic()
+        if not self.adaptive or wall - self._wall0 < SAMPLE_EVERY:
+            return
+        cpu = time.process_time()
+        used = (cpu - self._cpu0) / (wall - self._wall0)
+        self._cpu0, self._wall0 = cpu, wall
+        self.usage = used if self.usage is None else self.usage + USAGE_ALPHA * (used - self.usage)
+        if self.usage > self.budget:
+            self.interval = min(MAX_INTERVAL, self.interval + BACKOFF_STEP)
+        elif self.usage < self.budget * RELAX_BELOW:
+            self.interval = max(0.0, self.interval - BACKOFF_STEP)
+
+    def throttled(self, since_last_analysis):
+        """True when a full analysis now would exceed the backed-off cadence."""
+        return self.interval > 0 and since_last_analysis < self.interval
+
+    def report(self):
+        return {
+            "budgetCores":      self.budget,
+            "usageCores":       round(self.usage, 2) if self.usage is not None else None,
+            "threads":          self.threads,
+            "pinnedCores":      self.pinned,
+            "detectorInterval": self.interval,
+        }
@@ -1,32 +1,72 @@
 import urllib.request
 import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def download_file(url, filename):
-    """Download a file from URL to filename"""
+    """Download a file from URL to filename (via a .part file, so an interrupted download is retried)"""
     if not os.path.exists(filename):
         print(f"Downloading {filename}...")
-        urllib.request.urlretrieve(url, filename)
+        urllib.request.urlretrieve(url, filename + '.part')
+        os.replace(filename + '.part', filename)
         print(f"Downloaded {filename}")
     else:
         print(f"{filename} already exists")
 
+def extract_bz2(filename):
+    """Extract filename.bz2 to filename; a truncated archive is deleted so the next run downloads it again"""
+    import bz2
+    print(f"Extracting {filename}.bz2...")
+    try:
+        with bz2.BZ2File(filename + '.bz2') as fr, open(filename + '.part', 'wb') as fw:
+            while True:
+                block = fr.read(1 << 20)
+                if not block:
+                    break
+                fw.write(block)
+    except (EOFError, OSError) as e:
+        for path in (filename + '.bz2', filename + '.part'):
+            if os.path.exists(path):
+                os.remove(path)
+        raise RuntimeError(f"{filename}.bz2 is truncated or corrupt ({e}); deleted, run this script again") from e
+    os.replace(filename + '.part', filename)
+    print(f"Extracted to {filename}")
+
 # Download dlib models
 models = {
-    'shape_predictor_68_face_landmarks.dat': 
+    'shape_predictor_68_face_landmarks.dat':
         'http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2',
-    'dlib_face_recognition_resnet_model_v1.dat': 
-        'http://dlib.net/files/dlib_face_recognition_resnet_model_v1.dat.bz2'
+    'dlib_face_recognition_resnet_model_v1.dat':
+        'http://dlib.net/files/dlib_face_recognition_resnet_model_v1.dat.bz2',
+    # YuNet CNN face detector for PROCTOR_FACE_BACKEND=yunet (cv2.FaceDetectorYN)
+    'face_detection_yunet_2023mar.onnx':
+        'https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx',
 }
 
-for filename, url in models.items():
-    download_file(url, filename)
-    
-    # Extract if it's a .bz2 file
-    if filename.endswith('.bz2'):
-        import bz2
-        extracted_name = filename.replace('.bz2', '')
-        if not os.path.exists(extracted_name):
-            print(f"Extracting {filename}...")
-            with bz2.BZ2File(filename) as fr, open(extracted_name, 'wb') as fw:
-                fw.write(fr.read())
-            print(f"Extracted to {extracted_name}")
\ No newline at end of file
+def main():
+    failed = []
+    for name, url in models.items():
+        filename = os.path.join(SCRIPT_DIR, name)
+        try:
+            # dlib publishes .bz2 archives: fetch the archive, then extract it to the name the workers load
+            if url.endswith('.bz2'):
+                # Older runs of this script saved the archive itself under the final name
+                if os.path.exists(filename) and not os.path.exists(filename + '.bz2'):
+                    with open(filename, 'rb') as f:
+                        if f.read(3) == b'BZh':
+                            os.rename(filename, filename + '.bz2')
+                download_file(url, filename + '.bz2')
+                if not os.path.exists(filename):
+                    extract_bz2(filename)
+            else:
+                download_file(url, filename)
+        except (OSError, RuntimeError) as e:
+            print(f"ERROR: {name}: {e}")
+            failed.append(name)
+    if failed:
+        print(f"ERROR: {len(failed)} model(s) missing: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Face detector backends for the workers.
+
+  haar   each worker's own cascade passes (the default; nothing to load)
+  yunet  OpenCV's YuNet CNN through cv2.FaceDetectorYN, from a local ONNX
+         file: one pass returns scored boxes with five landmarks (eyes, nose
+         tip, mouth corners), frontal through near-profile, so the
+         frontal/profile/mirrored passes and the _filter_faces cleanup are
+         not needed. Runs on OpenCV's own DNN module; no torch.
+
+Select with PROCTOR_FACE_BACKEND=haar|yunet. The model is PROCTOR_FACE_MODEL,
+by default face_detection_yunet_2023mar.onnx next to this file
+(download_models.py fetches it). If the model file or cv2.FaceDetectorYN is
+missing, the worker logs why and stays on Haar.
+"""
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+SCRIPT_DIR  = os.path.dirname(os.path.abspath(__file__))
+BACKENDS    = ("haar", "yunet")
+YUNET_MODEL = os.path.join(SCRIPT_DIR, "face_detection_yunet_2023mar.onnx")
+YUNET_SCORE = 0.7    # per-face confidence floor
+YUNET_NMS   = 0.3
+YUNET_TOP_K = 50
+
+
+class YuNetBackend:
+    name = "yunet"
+
+    def __init__(self, model, score=YUNET_SCORE, nms=YUNET_NMS):
+        self.model = model
+        self.net   = cv2.FaceDetectorYN.create(model, "", (320, 320), score, nms, YUNET_TOP_K)
+        self.size  = None
+        self.lock  = threading.Lock()   # setInputSize + detect must stay paired
+
+    def detect(self, bgr):
+        """
+        Faces in `bgr`, best first: (boxes [[x, y, w, h]], scores, landmarks as
+        five [x, y] points per face), all in `bgr`'s pixel coordinates.
+        """
+        h, w = bgr.shape[:2]
+        with self.lock:
+            if self.size != (w, h):
+                self.net.setInputSize((w, h))
+                self.size = (w, h)
+            _, found = self.net.detect(bgr)
+        if found is None or len(found) == 0:
+            return [], [], []
+        found = found[np.argsort(-found[:, 14])]
+        x0 = np.clip(found[:, 0], 0, w - 1)
+        y0 = np.clip(found[:, 1], 0, h - 1)
+        x1 = np.clip(found[:, 0] + found[:, 2], 0, w)
+        y1 = np.clip(found[:, 1] + found[:, 3], 0, h)
+        boxes = np.stack([x0, y0, x1 - x0, y1 - y0], axis=1).round().astype(int).tolist()
+        return boxes, found[:, 14].tolist(), found[:, 4:14].reshape(-1, 5, 2).tolist()
+
+
+def load_face_backend(name=None, model=None):
+    """The configured DNN backend, or None for the Haar cascades."""
+    name = name or os.environ.get("PROCTOR_FACE_BACKEND", "haar")
+    if name not in BACKENDS:
+        print(f"[PY] unknown face backend {name!r} (choose from {', '.join(BACKENDS)}); using haar", file=sys.stderr)
+        return None
+    if name == "haar":
+        return None
+    model = model or os.environ.get("PROCTOR_FACE_MODEL", YUNET_MODEL)
+    if not hasattr(cv2, "FaceDetectorYN"):
+        print(f"[PY] cv2 {cv2.__version__} has no FaceDetectorYN (needs 4.5.4+); using haar", file=sys.stderr)
+        return None
+    if not os.path.isfile(model):
+        print(f"[PY] face model {model} not found (run download_models.py); using haar", file=sys.stderr)
+        return None
+    try:
+        backend = YuNetBackend(model)
+    except cv2.error as e:
+        print(f"[PY] face model {model} failed to load: {e}; using haar", file=sys.stderr)
+        return None
+    print(f"[PY] Face backend yunet ({os.path.basename(model)})", file=sys.stderr)
+    return backend
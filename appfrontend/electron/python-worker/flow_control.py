@@ -0,0 +1,96 @@
+"""
+Credit-based flow control between the host and the worker.
+
+Without it the host writes frames into the stdin pipe as fast as it captures
+them and the worker analyzes them in FIFO order, however old they have become.
+With it, each participant's frame stream has a window of CREDITS frames the host
+may have in flight (sent but not yet answered):
+
+  READY           "flow": {"credits", "staleMs", "epoch"}
+  every result    "flow": {"credits", "answered", "dropped", "rateFps", "epoch"}
+  FRAME_DROPPED   a stale frame, with the same "flow"
+  CREDIT          the same "flow" alone, for a result delta output suppressed
+
+`answered` counts the participant's frames the worker has finished with
+(analyzed or dropped), so the host's in-flight count is frames sent minus
+`answered`, and it sends only while that is below `credits`. Because the count
+is cumulative, suppressed delta-mode results lose nothing; a CREDIT line goes
+out only once `credits` answers have gone unreported, when the host has
+certainly sent that many and cannot send again without a line. Until then it
+still has credit, or frames are still queued whose answers will report.
+
+`epoch` identifies the worker process. The host adopts the first one it sees
+for a participant and treats a change as a restart, forgetting what it had
+in flight. Behind worker_pool.py each shard has its own epoch, so the pool's
+READY carries none.
+
+`rateFps` is the frame rate the worker can sustain for the participant: the
+inverse of the smoothed analysis time per frame, shared between the
+participants it is serving. The host paces its capture to it.
+
+A VIDEO_FRAME whose `timestamp` (capture time, epoch ms) is more than
+PROCTOR_STALE_MS old when the worker reads it is answered with FRAME_DROPPED
+and never decoded; its alerts would describe a moment long past, and
+analyzing it delays every frame behind it. PROCTOR_STALE_MS=0 turns this off
+(replays and offline analysis, whose timestamps are old by design).
+"""
+import os
+import time
+
+CREDITS    = max(1, int(os.environ.get("PROCTOR_CREDITS", 2)))
+STALE_MS   = float(os.environ.get("PROCTOR_STALE_MS", 3000))
+RATE_ALPHA = 0.2    # EWMA weight of each frame's analysis time
+
+
+class FlowControl:
+    def __init__(self, credits=CREDITS, stale_ms=STALE_MS):
+        self.credits  = credits
+        self.stale_ms = stale_ms
+        self.epoch    = int(time.time() * 1000)
+        self.streams  = {}      # participant key -> {"answered", "dropped", "reported"}
+        self.service  = None    # smoothed seconds per analyzed frame, all participants
+
+    def _stream(self, key):
+        s = self.streams.get(key)
+        if s is None:
+            s = self.streams[key] = {"answered": 0, "dropped": 0, "reported": 0}
+        return s
+
+    def stale_ms_of(self, frame_data, now=None):
+        """The frame's age in ms if it is past the staleness bound, else None."""
+        ts = frame_data.get("timestamp")
+        if not self.stale_ms or not isinstance(ts, (int, float)):
+            return None
+        age = (time.time() if now is None else now) * 1000.0 - ts
+        return age if age > self.stale_ms else None
+
+    def analyzed(self, key, seconds):
+        self._stream(key)["answered"] += 1
+        self.service = seconds if self.service is None else self.service + RATE_ALPHA * (seconds - self.service)
+
+    def dropped(self, key):
+        s = self._stream(key)
+        s["answered"] += 1
+        s["dropped"]  += 1
+
+    def must_report(self, key):
+        """True when the host has run out of credit unless this answer is emitted."""
+        s = self._stream(key)
+        return s["answered"] - s["reported"] >= self.credits
+
+    def reported(self, key):
+        s = self._stream(key)
+        s["reported"] = s["answered"]
+
+    def rate(self):
+        if not self.service:
+            return None
+        return round(1.0 / self.service / max(1, len(self.streams)), 2)
+
+    def state(self, key):
+        s = self._stream(key)
+        return {"credits": self.credits, "answered": s["answered"], "dropped": s["dropped"],
+                "rateFps": self.rate(), "epoch": self.epoch}
+
+    def ready(self):
+        return {"credits": self.credits, "staleMs": self.stale_ms, "epoch": self.epoch}
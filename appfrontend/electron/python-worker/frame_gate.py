@@ -0,0 +1,70 @@
+"""
+Frame-difference gate shared by the proctoring workers.
+
+Each incoming JPEG is decoded at 1/4 scale straight to grayscale (libjpeg
+skips most of the IDCT work) and shrunk to a GATE_W x GATE_H thumbnail. If it
+differs from the thumbnail of the last fully analyzed frame by less than
+GATE_DIFF (mean absolute difference, 0-255), and that analysis is younger than
+GATE_REFRESH, the worker reuses the previous detection outputs instead of
+running the cascades, gaze, phone and identity stages again.
+
+The reference is only replaced on a full analysis, so slow drift accumulates
+until it crosses the threshold rather than creeping past it frame by frame.
+"""
+import cv2
+import numpy as np
+
+GATE_W, GATE_H = 32, 24
+GATE_DIFF      = 3.0    # mean abs grey-level difference below which a frame counts as unchanged
+GATE_REFRESH   = 2.0    # every detector is refreshed at least this often, even on a static scene
+
+
+def small_gray(data: bytes):
+    """1/4-scale grayscale decode of encoded image bytes, or None if undecodable."""
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+
+
+def gate_thumb(small):
+    """Tiny thumbnail of a small_gray() frame."""
+    if small is None:
+        return None
+    return cv2.resize(small, (GATE_W, GATE_H), interpolation=cv2.INTER_AREA)
+
+
+class FrameGate:
+    def __init__(self, diff=GATE_DIFF, refresh=GATE_REFRESH):
+        self.diff_thresh = diff
+        self.refresh     = refresh
+        self.ref_thumb   = None
+        self.ref_at      = 0.0
+        self.last_diff   = None
+        self.computed    = 0
+        self.reused      = 0
+
+    def can_reuse(self, thumb, now):
+        """True when the previous detection outputs still describe this frame."""
+        self.last_diff = None
+        if thumb is None or self.ref_thumb is None or now - self.ref_at >= self.refresh:
+            return False
+        self.last_diff = float(cv2.absdiff(thumb, self.ref_thumb).mean())
+        if self.last_diff < self.diff_thresh:
+            self.reused += 1
+            return True
+        return False
+
+    def mark_computed(self, thumb, now):
+        self.ref_thumb = thumb
+        self.ref_at    = now
+        self.computed += 1
+
+    def reset(self):
+        """Force the next frame through full analysis (e.g. a new reference face)."""
+        self.ref_thumb = None
+
+    def stats(self):
+        total = self.computed + self.reused
+        return {
+            "computed":   self.computed,
+            "reused":     self.reused,
+            "reuseRate":  round(self.reused / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,71 @@
+"""
+Per-detector working resolutions from a single per-frame pyramid.
+
+A profile gives the image width each stage works at; 0 means the decoded
+frame itself. Levels are built lazily, once per frame, each one resized from
+the smallest already-built level that is still at least as wide. Boxes
+found on a level are mapped back to frame coordinates with that level's exact
+x/y factors, so everything downstream (gaze fractions, _face_changed, identity
+crops) keeps working in one coordinate system.
+
+Select a profile with PROCTOR_PROFILE=low-end|balanced|accuracy.
+"""
+import os
+
+import cv2
+
+PROFILES = {
+    # width per stage: faces = Haar cascade, phone = YOLO input size, identity = crop source
+    "low-end":  {"faces": 320, "phone": 416, "identity": 320},
+    "balanced": {"faces": 320, "phone": 640, "identity": 0},
+    "accuracy": {"faces": 640, "phone": 640, "identity": 0},
+}
+DEFAULT_PROFILE = "balanced"
+REFERENCE_WIDTH = 640   # width the detector parameters (minSize etc.) were tuned at
+
+
+def load_profile(name=None):
+    name = name or os.environ.get("PROCTOR_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"unknown profile {name!r} (choose from {', '.join(PROFILES)})")
+    return name, PROFILES[name]
+
+
+class FramePyramid:
+    def __init__(self, frame):
+        self.frame  = frame
+        self.height, self.width = frame.shape[:2]
+        self.levels = {self.width: frame}
+
+    def at(self, width):
+        """Frame resized to `width` (never upscaled; 0 = the frame itself)."""
+        if not width or width >= self.width:
+            return self.frame
+        level = self.levels.get(width)
+        if level is None:
+            src_w = min(w for w in self.levels if w > width)
+            height = max(1, round(self.height * width / self.width))
+            level = cv2.resize(self.levels[src_w], (width, height), interpolation=cv2.INTER_AREA)
+            self.levels[width] = level
+        return level
+
+    def factors(self, width):
+        """(sx, sy) mapping level coordinates to frame coordinates."""
+        level = self.at(width)
+        return self.width / level.shape[1], self.height / level.shape[0]
+
+    def to_frame(self, rects, width):
+        sx, sy = self.factors(width)
+        if sx == 1.0 and sy == 1.0:
+            return [list(map(int, r)) for r in rects]
+        return [[int(round(x * sx)), int(round(y * sy)), int(round(w * sx)), int(round(h * sy))]
+                for x, y, w, h in rects]
+
+    def from_frame(self, rects, width):
+        sx, sy = self.factors(width)
+        return [[int(round(x / sx)), int(round(y / sy)), int(round(w / sx)), int(round(h / sy))]
+                for x, y, w, h in rects]
+
+    def param_scale(self, width):
+        """Factor for pixel-size parameters tuned at REFERENCE_WIDTH."""
+        return self.at(width).shape[1] / REFERENCE_WIDTH
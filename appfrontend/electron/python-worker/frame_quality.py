@@ -0,0 +1,59 @@
+"""
+Frame quality pre-check for the proctoring worker.
+
+Runs on the 1/4-scale grayscale decode (see frame_gate.small_gray) before any
+detector. A covered lens, a very dark room, heavy motion blur or a frozen
+feed makes the cascades and YOLO burn CPU only to report "no face"; such
+frames are rejected here and reported as frameQuality instead.
+
+  covered  almost uniform image (contrast below COVERED_STD)
+  dark     mean brightness below DARK_MEAN
+  frozen   FROZEN_FRAMES consecutive byte-identical frames (a live sensor is never noise-free)
+  blurred  Laplacian variance below BLUR_VAR
+"""
+import zlib
+
+import cv2
+
+DARK_MEAN     = 30.0   # mean grey level
+COVERED_STD   = 6.0    # grey-level std dev
+BLUR_VAR      = 8.0    # Laplacian variance at 1/4 scale
+FROZEN_FRAMES = 5
+
+
+class QualityGate:
+    def __init__(self):
+        self.last_crc  = None
+        self.same      = 0
+        self.checked   = 0
+        self.rejected  = 0
+
+    def assess(self, small):
+        """Quality metrics for a small grayscale frame; 'issue' is None when the frame is usable."""
+        self.checked += 1
+        crc = zlib.crc32(small.tobytes())
+        self.same = self.same + 1 if crc == self.last_crc else 0
+        self.last_crc = crc
+
+        mean, std = cv2.meanStdDev(small)
+        brightness, contrast = float(mean[0][0]), float(std[0][0])
+        sharpness = float(cv2.Laplacian(small, cv2.CV_32F).var())
+
+        issue = None
+        if contrast < COVERED_STD:
+            issue = "covered"
+        elif brightness < DARK_MEAN:
+            issue = "dark"
+        elif self.same >= FROZEN_FRAMES - 1:
+            issue = "frozen"
+        elif sharpness < BLUR_VAR:
+            issue = "blurred"
+        if issue is not None:
+            self.rejected += 1
+        return {
+            "usable":     issue is None,
+            "issue":      issue,
+            "brightness": round(brightness, 1),
+            "contrast":   round(contrast, 1),
+            "sharpness":  round(sharpness, 1),
+        }
@@ -0,0 +1,155 @@
+"""
+Head-pose gaze: yaw/pitch from facial landmarks with solvePnP.
+
+Landmarks come from one of:
+
+  dlib68  dlib's 68-point shape predictor (shape_predictor_68_face_landmarks.dat
+          next to this file, or PROCTOR_LANDMARKS), run only inside the face
+          box the detector already found. Not in git: download_models.py
+          fetches it (setup_proctoring.py runs that)
+  yunet5  the five landmarks the YuNet face backend returns with each box
+          (face_backends.py), at no extra cost
+
+The predictor file is ~100 MB, so it is loaded on a background thread when
+the analyzer starts; until it is ready (or if dlib or the file is missing)
+the worker keeps its previous gaze heuristic.
+
+The PnP model is fixed and cached: the generic 3D face points per landmark
+set, a camera matrix per frame size (focal length = frame width, principal
+point at the centre, no distortion), and the previous frame's pose as the
+starting guess, so a steady head converges in one or two iterations. A face
+is away when |yaw| > YAW_MAX or |pitch| > PITCH_MAX degrees.
+
+Select with PROCTOR_GAZE=headpose|heuristic (default headpose, which falls
+back to the heuristic whenever no landmarks are available).
+"""
+import copy
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+try:
+    import dlib
+    DLIB_AVAILABLE = True
+except ImportError:
+    DLIB_AVAILABLE = False
+
+SCRIPT_DIR      = os.path.dirname(os.path.abspath(__file__))
+PREDICTOR_FILE  = os.environ.get("PROCTOR_LANDMARKS", os.path.join(SCRIPT_DIR, "shape_predictor_68_face_landmarks.dat"))
+GAZE_MODES      = ("headpose", "heuristic")
+YAW_MAX         = 30.0
+PITCH_MAX       = 25.0
+
+# Generic face, image-aligned axes (x right, y down, z away from the camera), nose tip at the origin
+MODELS = {
+    # dlib indices: nose tip, chin, outer eye corners, mouth corners
+    "dlib68": (np.array([[0, 0, 0], [0, 330, 65], [-225, -170, 135], [225, -170, 135],
+                         [-150, 150, 125], [150, 150, 125]], np.float64),
+               (30, 8, 36, 45, 48, 54)),
+    # YuNet order: right eye, left eye (centres), nose tip, right and left mouth corners
+    "yunet5": (np.array([[-165, -170, 135], [165, -170, 135], [0, 0, 0],
+                         [-150, 150, 125], [150, 150, 125]], np.float64),
+               (0, 1, 2, 3, 4)),
+}
+
+
+class HeadPose:
+    def __init__(self, mode=None, predictor_file=PREDICTOR_FILE):
+        self.mode      = mode or os.environ.get("PROCTOR_GAZE", "headpose")
+        if self.mode not in GAZE_MODES:
+            raise ValueError(f"unknown gaze mode {self.mode!r} (choose from {', '.join(GAZE_MODES)})")
+        self._shared   = {"predictor": None}   # shared with fork()s
+        self.cameras   = {}     # (w, h) -> camera matrix
+        self.guess     = {}     # landmark set -> (rvec, tvec) of the last solve
+        self.last      = None   # {"yaw", "pitch", "source"} of the last estimate
+        if self.mode == "headpose":
+            threading.Thread(target=self._load, args=(predictor_file,), name="landmarks", daemon=True).start()
+
+    def _load(self, path):
+        if not DLIB_AVAILABLE:
+            print("[PY] dlib not installed: head pose from YuNet landmarks only", file=sys.stderr)
+            return
+        if not os.path.exists(path):
+            print(f"[PY] {path} missing (run download_models.py): head pose from YuNet landmarks only",
+                  file=sys.stderr)
+            return
+        try:
+            with open(path, "rb") as f:
+                if f.read(3) == b"BZh":
+                    print(f"[PY] {path} is still bz2-compressed (run download_models.py)", file=sys.stderr)
+                    return
+            self._shared["predictor"] = dlib.shape_predictor(path)
+            print(f"[PY] Landmark predictor loaded ({os.path.getsize(path) >> 20} MB)", file=sys.stderr)
+        except (OSError, RuntimeError) as e:
+            print(f"[PY] landmark predictor unavailable: {e} (re-run download_models.py)", file=sys.stderr)
+
+    @property
+    def predictor(self):
+        return self._shared["predictor"]
+
+    def fork(self):
+        """Another participant's estimator: same predictor (loaded or loading), own pose guesses."""
+        other = copy.copy(self)
+        other.cameras, other.guess, other.last = {}, {}, None
+        return other
+
+    def available(self, landmarks=None):
+        """Whether estimate() can run now: a loaded predictor or detector landmarks."""
+        return self.mode == "headpose" and (self.predictor is not None or landmarks is not None)
+
+    def _camera(self, w, h):
+        cam = self.cameras.get((w, h))
+        if cam is None:
+            cam = self.cameras[(w, h)] = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], np.float64)
+        return cam
+
+    def estimate(self, img, face_rect, landmarks=None):
+        """
+        (yaw, pitch) in degrees for the face at `face_rect` in `img` (BGR or
+        gray), or None. Uses the 68-point predictor on the face box when it is
+        loaded, else the detector's five `landmarks`.
+        """
+        if self.predictor is not None:
+            # Only the face box (plus a margin for the jaw line) is converted and searched
+            h, w = img.shape[:2]
+            fx, fy, fw, fh = (int(v) for v in face_rect)
+            x0, y0 = max(0, fx - fw // 5), max(0, fy - fh // 5)
+            x1, y1 = min(w, fx + fw + fw // 5), min(h, fy + fh + fh // 5)
+            roi = img[y0:y1, x0:x1]
+            if roi.ndim == 3:
+                roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+            shape  = self.predictor(roi, dlib.rectangle(fx - x0, fy - y0, fx - x0 + fw, fy - y0 + fh))
+            source = "dlib68"
+            idx = MODELS[source][1]
+            pts = np.array([[shape.part(i).x + x0, shape.part(i).y + y0] for i in idx], np.float64)
+        elif landmarks is not None:
+            source = "yunet5"
+            idx = MODELS[source][1]
+            pts = np.asarray(landmarks, np.float64)[list(idx)]
+        else:
+            return None
+        return self.solve(source, pts, img.shape[1], img.shape[0])
+
+    def solve(self, source, pts, w, h):
+        """(yaw, pitch) in degrees from image points of MODELS[source] in a w x h frame, or None."""
+        model = MODELS[source][0]
+        cam   = self._camera(w, h)
+        guess = self.guess.get(source)
+        if guess is None:
+            ok, rvec, tvec = cv2.solvePnP(model, pts, cam, None, flags=cv2.SOLVEPNP_SQPNP)
+        else:
+            ok, rvec, tvec = cv2.solvePnP(model, pts, cam, None, guess[0].copy(), guess[1].copy(),
+                                          True, cv2.SOLVEPNP_ITERATIVE)
+        if not ok or tvec[2, 0] <= 0:
+            self.guess.pop(source, None)
+            return None
+        self.guess[source] = (rvec, tvec)
+        pitch, yaw, _ = cv2.RQDecomp3x3(cv2.Rodrigues(rvec)[0])[0]
+        self.last = {"yaw": round(float(yaw), 1), "pitch": round(float(pitch), 1), "source": source}
+        return float(yaw), float(pitch)
+
+    def away(self, yaw, pitch):
+        return abs(yaw) > YAW_MAX or abs(pitch) > PITCH_MAX
@@ -0,0 +1,134 @@
+"""
+stdout channel for the proctoring worker.
+
+In "full" mode (the old behaviour) every analyzed frame is written as one JSON
+line. In "delta" mode a result line is written only when it carries something
+the host acts on:
+
+  - any alert (alerts are never suppressed),
+  - a change in one of SIGNIFICANT_FIELDS or in frameQuality.issue,
+  - a positive async phone result, or the periodic cpu report.
+
+Changes are tracked per participant, so a worker serving several of them
+(a worker_pool.py shard) still suppresses each one's unchanged frames.
+Unchanged frames are counted instead, and a HEARTBEAT status line with the
+counters goes out every HEARTBEAT_EVERY seconds so the host can still tell a
+quiet exam from a dead worker. The heartbeat runs on its own timer thread
+(start_heartbeat), so it also goes out while no frames arrive at all; sends
+from both threads share a lock. Emitted results are complete objects, so the
+host needs no state to interpret them.
+
+Lines are serialized with orjson when it is installed, otherwise with the
+stdlib encoder using compact separators.
+
+Select the mode with PROCTOR_OUTPUT=full|delta.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+OUTPUT_MODE     = os.environ.get("PROCTOR_OUTPUT", "full")
+HEARTBEAT_EVERY = 5.0    # seconds between HEARTBEAT lines in delta mode
+SIGNIFICANT_FIELDS = ("faceDetected", "faceCount", "identityVerified", "mode",
+                      "meetingId", "userId", "participantId")
+
+
+def encode(obj) -> bytes:
+    """One JSON line, newline included."""
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    return (json.dumps(obj, separators=(",", ":")) + "\n").encode()
+
+
+def _participant(result):
+    return result.get("participantId") or result.get("userId")
+
+
+def _state_key(result):
+    quality = result.get("frameQuality") or {}
+    return tuple(result.get(f) for f in SIGNIFICANT_FIELDS) + (quality.get("issue"),)
+
+
+class OutputChannel:
+    def __init__(self, mode=None, out=None, heartbeat=HEARTBEAT_EVERY):
+        self.mode      = mode or OUTPUT_MODE
+        if self.mode not in ("full", "delta"):
+            raise ValueError(f"unknown output mode {self.mode!r} (choose full or delta)")
+        self.out       = out if out is not None else sys.stdout.buffer
+        self.heartbeat = heartbeat
+        self.last_keys = {}     # participant key -> state key of its last emitted result
+        self.last_beat = None
+        self.frames    = 0
+        self.emitted   = 0
+        self.suppressed = 0
+        self.bytes     = 0
+        self.lock      = threading.Lock()
+        self.stopped   = threading.Event()
+
+    def send(self, obj):
+        line = encode(obj)
+        with self.lock:
+            self.out.write(line)
+            self.out.flush()
+            self.bytes += len(line)
+
+    def beat(self, now=None):
+        """Write a HEARTBEAT if one is due (delta mode); returns True when it did."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.last_beat is None:
+                self.last_beat = now
+            if self.mode != "delta" or now - self.last_beat < self.heartbeat:
+                return False
+            self.last_beat = now
+            counters = {"frames": self.frames, "emitted": self.emitted, "suppressed": self.suppressed,
+                        "bytes": self.bytes}
+        self.send({
+            "status":     "HEARTBEAT",
+            **counters,
+            "timestamp":  time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        })
+        return True
+
+    def start_heartbeat(self):
+        """Beat from a daemon thread, independent of frames; a no-op in full mode."""
+        if self.mode != "delta":
+            return
+        self.beat()
+
+        def run():
+            while not self.stopped.wait(self.heartbeat / 4):
+                self.beat()
+
+        threading.Thread(target=run, name="heartbeat", daemon=True).start()
+
+    def close(self):
+        self.stopped.set()
+
+    def must_emit(self, result):
+        if self.mode == "full" or result.get("alerts") or "cpu" in result:
+            return True
+        if any(r.get("detected") for r in result.get("phoneResults") or ()):
+            return True
+        return _state_key(result) != self.last_keys.get(_participant(result))
+
+    def result(self, result, now=None):
+        """Write (or count) one frame result; returns True when a line was written."""
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        emit = self.must_emit(result)
+        if emit:
+            self.send(result)
+            self.emitted += 1
+            self.last_keys[_participant(result)] = _state_key(result)
+        else:
+            self.suppressed += 1
+        self.beat(now)
+        return emit
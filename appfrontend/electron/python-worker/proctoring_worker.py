@@ -1,13 +1,20 @@
 import base64
 import json
+import os
 import sys
+import threading
 import time
 import urllib.request
 from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import cv2
 import numpy as np
 
+from face_backends import load_face_backend
+from frame_gate import FrameGate, gate_thumb, small_gray
+from head_pose import HeadPose
+
 try:
     from ultralytics import YOLO
     YOLO_AVAILABLE = True
@@ -34,6 +41,48 @@ class ProctoringAnalyzer:
             cv2.data.haarcascades + "haarcascade_upperbody.xml"
         )
 
+        # ── Optional DNN face detector (PROCTOR_FACE_BACKEND) ───────────
+        # One pass with landmarks; replaces the cascade passes below when loaded
+        self.face_dnn = load_face_backend()
+        self.last_landmarks = None
+
+        # ── Head-pose gaze (PROCTOR_GAZE); replaces the eye cascade once landmarks exist ──
+        self.head_pose = HeadPose()
+
+        # ── Face pass budget ──────────────────────────────────────────────
+        # Each pass is one full-frame detectMultiScale: (cascade, gray, mirrored).
+        # At most face_pass_budget run per frame, the upper-body fallback
+        # included; passes are ordered by which ones recently found this
+        # participant's face, and with face_pass_workers > 1 they run
+        # concurrently and the first hit cancels the rest. A CascadeClassifier
+        # is not safe to share between threads (profile_eq and profile_eq_flip
+        # may run together, and a cancelled pass can still be running when the
+        # next frame starts), so every pool thread loads its own copies.
+        self.face_passes = {
+            "frontal_clahe":      ("frontal", "clahe", False),
+            "frontal_eq":         ("frontal", "eq", False),
+            "profile_clahe":      ("profile", "clahe", False),
+            "profile_clahe_flip": ("profile", "clahe", True),
+            "profile_eq":         ("profile", "eq", False),
+            "profile_eq_flip":    ("profile", "eq", True),
+        }
+        self.face_pass_cascades = threading.local()
+        self.face_pass_cascades.by_kind = {"frontal": self.face_cascade, "profile": self.face_profile_cascade}
+        if self.face_profile_cascade.empty():
+            self.face_passes = {k: v for k, v in self.face_passes.items() if not k.startswith("profile")}
+        # Default: every pass plus the upper-body slot, the detection coverage of the
+        # old fixed chain; ordering and first-hit cancel still cut the average cost
+        self.face_pass_budget = max(1, int(os.environ.get("PROCTOR_FACE_PASSES", len(self.face_passes) + 1)))
+        self.face_pass_workers = max(1, int(os.environ.get("PROCTOR_FACE_WORKERS", min(3, (os.cpu_count() or 1) - 1) or 1)))
+        self.face_pass_decay = 0.8
+        self.face_pass_scores = {}   # participant -> {pass: recency-weighted hits}
+        self.face_pass_rotation = {}   # participant -> offset of the untried passes
+        self.last_face_passes = {"ran": 0, "hit": None}
+        self.face_pool = None
+        if self.face_pass_workers > 1:
+            self.face_pool = ThreadPoolExecutor(max_workers=self.face_pass_workers, thread_name_prefix="face-pass")
+        print(f"Face passes: budget {self.face_pass_budget}, {self.face_pass_workers} worker(s)", file=sys.stderr)
+
         # ── YOLO ──────────────────────────────────────────────────────────
         self.yolo = None
         if YOLO_AVAILABLE:
@@ -85,6 +134,10 @@ class ProctoringAnalyzer:
         self.speech_alerted_at = 0.0
         self.speech_alert_cooldown = 45.0
 
+        # ── Frame-difference gate: static frames reuse last detections ───
+        self.gate = FrameGate()
+        self.last_detection = None
+
         print("Proctoring analyzer ready", file=sys.stderr)
 
     # ── Helpers ───────────────────────────────────────────────────────────
@@ -101,20 +154,23 @@ class ProctoringAnalyzer:
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         return cv2.equalizeHist(gray)
 
-    def decode_image(self, b64: str):
+    def read_image_bytes(self, b64: str):
         try:
             if b64.startswith("http://") or b64.startswith("https://"):
                 with urllib.request.urlopen(b64, timeout=5) as r:
-                    data = r.read()
-                arr = np.frombuffer(data, np.uint8)
-                img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-            else:
-                if "," in b64:
-                    b64 = b64.split(",")[1]
-                b64 += "=" * (-len(b64) % 4)
-                data = base64.b64decode(b64)
-                arr = np.frombuffer(data, np.uint8)
-                img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+                    return r.read()
+            if "," in b64:
+                b64 = b64.split(",")[1]
+            b64 += "=" * (-len(b64) % 4)
+            return base64.b64decode(b64)
+        except Exception as exc:
+            print(f"Image decode error: {exc}", file=sys.stderr)
+            return None
+
+    def decode_bytes(self, data: bytes):
+        try:
+            arr = np.frombuffer(data, np.uint8)
+            img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
             if img is None:
                 return None
             h, w = img.shape[:2]
@@ -127,37 +183,106 @@ class ProctoringAnalyzer:
             print(f"Image decode error: {exc}", file=sys.stderr)
             return None
 
-    # ── Face detection ────────────────────────────────────────────────────
+    def decode_image(self, b64: str):
+        data = self.read_image_bytes(b64)
+        return None if data is None else self.decode_bytes(data)
 
-    def detect_faces(self, image):
-        gc = self._gray_clahe(image)
-        ge = self._gray_eq(image)
-        faces = []
+    # ── Face detection ────────────────────────────────────────────────────
 
-        for gray in (gc, ge):
-            found = self.face_cascade.detectMultiScale(
+    def _face_pass_order(self, participant):
+        """
+        Face passes, the ones that recently found this participant first. The
+        rest rotate on every frame without a hit, so passes beyond the budget
+        still get their turn and can be learned.
+        """
+        scores = self.face_pass_scores.get(participant, {})
+        names = list(self.face_passes)
+        k = self.face_pass_rotation.get(participant, 0) % len(names)
+        return sorted(names[k:] + names[:k], key=lambda n: -scores.get(n, 0.0))
+
+    def _record_face_pass(self, participant, hit):
+        scores = self.face_pass_scores.setdefault(participant, {})
+        for name in scores:
+            scores[name] *= self.face_pass_decay
+        scores[hit] = scores.get(hit, 0.0) + 1.0
+
+    def _face_pass_cascade(self, kind):
+        """This thread's own classifier for a face pass; loaded on a pool thread's first pass."""
+        by_kind = getattr(self.face_pass_cascades, "by_kind", None)
+        if by_kind is None:
+            by_kind = self.face_pass_cascades.by_kind = {
+                "frontal": cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml"),
+                "profile": cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_profileface.xml"),
+            }
+        return by_kind[kind]
+
+    def _run_face_pass(self, name, grays, cancelled=None):
+        """One detectMultiScale pass; boxes in unflipped image coordinates. Skipped once cancelled."""
+        if cancelled is not None and cancelled.is_set():
+            return []
+        kind, which, flip = self.face_passes[name]
+        cascade = self._face_pass_cascade(kind)
+        gray = grays[which]
+        if flip:
+            gray = cv2.flip(gray, 1)
+        if kind == "frontal":
+            found = cascade.detectMultiScale(
                 gray, scaleFactor=1.05, minNeighbors=4,
                 minSize=(60, 60), flags=cv2.CASCADE_SCALE_IMAGE
             )
-            if len(found) > 0:
-                faces = found.tolist()
-                break
-
-        if not faces and not self.face_profile_cascade.empty():
-            for gray in (gc, ge):
-                found = self.face_profile_cascade.detectMultiScale(
-                    gray, scaleFactor=1.05, minNeighbors=4, minSize=(60, 60)
-                )
-                if len(found) > 0:
-                    faces = found.tolist()
-                    break
-                flipped = cv2.flip(gray, 1)
-                found = self.face_profile_cascade.detectMultiScale(
-                    flipped, scaleFactor=1.05, minNeighbors=4, minSize=(60, 60)
-                )
-                if len(found) > 0:
-                    faces = found.tolist()
+        else:
+            found = cascade.detectMultiScale(
+                gray, scaleFactor=1.05, minNeighbors=4, minSize=(60, 60)
+            )
+        faces = [list(f) for f in found] if len(found) > 0 else []
+        if flip:
+            w = gray.shape[1]
+            faces = [[w - x - fw, y, fw, fh] for x, y, fw, fh in faces]
+        return faces
+
+    def detect_faces(self, image, participant=None):
+        if self.face_dnn is not None:
+            return self._detect_faces_dnn(image)
+        self.last_landmarks = None
+        grays = {"clahe": self._gray_clahe(image), "eq": self._gray_eq(image)}
+        order = self._face_pass_order(participant)
+        # The last slot of the budget is kept for the upper-body fallback
+        passes = order[:max(1, self.face_pass_budget - 1)]
+        hit = None
+
+        # The likeliest pass runs alone; only if it misses do the rest run, serially
+        # or concurrently
+        ran = 1
+        faces = self._run_face_pass(passes[0], grays)
+        if faces:
+            hit = passes[0]
+        elif self.face_pool is None or len(passes) <= 2:
+            for name in passes[1:]:
+                ran += 1
+                faces = self._run_face_pass(name, grays)
+                if faces:
+                    hit = name
                     break
+        else:
+            # The first to find a face wins; queued passes are cancelled and running
+            # ones (cv2 can't be interrupted) are left to finish unseen
+            cancelled = threading.Event()
+            futures = {self.face_pool.submit(self._run_face_pass, name, grays, cancelled): name for name in passes[1:]}
+            pending = set(futures)
+            while pending and hit is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    ran += 1
+                    found = fut.result()
+                    if found and hit is None:
+                        faces, hit = found, futures[fut]
+            cancelled.set()
+            for fut in pending:
+                fut.cancel()
+        if hit is not None:
+            self._record_face_pass(participant, hit)
+        else:
+            self.face_pass_rotation[participant] = self.face_pass_rotation.get(participant, 0) + len(passes)
 
         # Deduplicate IoU > 0.4
         unique = []
@@ -175,19 +300,43 @@ class ProctoringAnalyzer:
                 unique.append(f)
 
         body_detected = False
-        if not unique and not self.upper_body_cascade.empty():
+        if not unique and not self.upper_body_cascade.empty() and ran < self.face_pass_budget:
             bodies = self.upper_body_cascade.detectMultiScale(
-                gc, scaleFactor=1.05, minNeighbors=3, minSize=(60, 60)
+                grays["clahe"], scaleFactor=1.05, minNeighbors=3, minSize=(60, 60)
             )
             body_detected = len(bodies) > 0
+            ran += 1
 
+        self.last_face_passes = {"ran": ran, "hit": hit}
         return unique, body_detected
 
+    def _detect_faces_dnn(self, image):
+        boxes, _, marks = self.face_dnn.detect(image)
+        keep  = [i for i, b in enumerate(boxes) if min(b[2], b[3]) >= 60]
+        faces = [boxes[i] for i in keep]
+        self.last_landmarks = [marks[i] for i in keep]
+        ran, body_detected = 1, False
+        if not faces and not self.upper_body_cascade.empty():
+            bodies = self.upper_body_cascade.detectMultiScale(
+                self._gray_clahe(image), scaleFactor=1.05, minNeighbors=3, minSize=(60, 60)
+            )
+            body_detected = len(bodies) > 0
+            ran += 1
+        self.last_face_passes = {"ran": ran, "hit": self.face_dnn.name if faces else None}
+        return faces, body_detected
+
     # ── Gaze ──────────────────────────────────────────────────────────────
 
-    def check_gaze_away(self, image, face_rect):
-        """No eyes found in top 55% of face ROI = looking away."""
+    def check_gaze_away(self, image, face_rect, landmarks=None):
+        """
+        Head pose past its yaw/pitch limits = looking away, when landmarks are
+        available; otherwise no eyes found in top 55% of face ROI = looking away.
+        """
         try:
+            if self.head_pose.available(landmarks):
+                pose = self.head_pose.estimate(image, face_rect, landmarks)
+                if pose is not None:
+                    return self.head_pose.away(*pose)
             gc = self._gray_clahe(image)
             fx, fy, fw, fh = face_rect
             roi = gc[fy: fy + int(fh * 0.55), fx: fx + fw]
@@ -293,6 +442,7 @@ class ProctoringAnalyzer:
             return False
         self.reference_face_signature = result[0]
         self.reference_user_id = user_id
+        self.gate.reset()
         print(f"Reference face loaded for {user_id}", file=sys.stderr)
         return True
 
@@ -341,103 +491,113 @@ class ProctoringAnalyzer:
 
     # ── Main analysis ─────────────────────────────────────────────────────
 
-    def analyze_frame(self, frame_data):
-        try:
-            raw = frame_data.get("imageData", "")
-            print(f"[PY] analyze_frame: len={len(raw)}", file=sys.stderr)
-            image = self.decode_image(raw)
-            if image is None:
-                print("[PY] decode_image returned None!", file=sys.stderr)
-                return {"alerts": [], "faceDetected": False, "faceCount": 0}
-            print(f"[PY] decoded image shape={image.shape}", file=sys.stderr)
-
-            alerts = []
-            now = time.time()
-
-            faces, body_detected = self.detect_faces(image)
-            face_count = len(faces)
-            print(f"[PY] detect_faces: face_count={face_count} body={body_detected}", file=sys.stderr)
+    def detect(self, image, participant=None):
+        """Detection stage: runs every detector on a fully decoded frame."""
+        faces, body_detected = self.detect_faces(image, participant)
+        face_count = len(faces)
+        print(f"[PY] detect_faces: face_count={face_count} body={body_detected} "
+              f"passes={self.last_face_passes['ran']} hit={self.last_face_passes['hit']}", file=sys.stderr)
+        looking_away = False
+        if face_count == 1:
+            looking_away = self.check_gaze_away(image, faces[0], self.last_landmarks[0] if self.last_landmarks else None)
+            print(f"[PY] gaze_away={looking_away}", file=sys.stderr)
+        return {
+            "faces": faces,
+            "body_detected": body_detected,
+            "looking_away": looking_away,
+            "phone": self.detect_phone(image),
+            "identity": self.compare_identity(image),
+        }
 
-            # ── No face ───────────────────────────────────────────────────
-            if face_count == 0:
-                if self.no_face_start is None:
-                    self.no_face_start = now
-                    print("[PY] No face timer started", file=sys.stderr)
-                else:
-                    absent_for = now - self.no_face_start
-                    print(f"[PY] No face for {absent_for:.1f}s / threshold={self.no_face_threshold}s", file=sys.stderr)
-                    if (
-                        absent_for >= self.no_face_threshold
-                        and now - self.no_face_alerted_at > self.no_face_cooldown
-                    ):
-                        desc = "Face not visible — please look at the camera" if body_detected else "No face detected in frame for over 10 seconds"
-                        alerts.append({
-                            "alertType": "NO_FACE",
-                            "description": desc,
-                            "confidence": 0.85,
-                            "severity": "MEDIUM",
-                            "timestamp": self._iso(),
-                        })
-                        self.no_face_alerted_at = now
+    def apply_alerts(self, detection, now, computed):
+        """
+        Alert stage. Time-based timers advance on every frame; the phone frame
+        counter and identity verdicts only move on freshly computed detections.
+        """
+        alerts = []
+        faces = detection["faces"]
+        face_count = len(faces)
+        body_detected = detection["body_detected"]
+
+        # ── No face ───────────────────────────────────────────────────
+        if face_count == 0:
+            if self.no_face_start is None:
+                self.no_face_start = now
+                print("[PY] No face timer started", file=sys.stderr)
             else:
-                if self.no_face_start is not None:
-                    print(f"[PY] Face returned after {now - self.no_face_start:.1f}s", file=sys.stderr)
-                self.no_face_start = None
-
-            # ── Multiple faces ────────────────────────────────────────────
-            if face_count > 1:
-                if self.multi_face_start is None:
+                absent_for = now - self.no_face_start
+                print(f"[PY] No face for {absent_for:.1f}s / threshold={self.no_face_threshold}s", file=sys.stderr)
+                if (
+                    absent_for >= self.no_face_threshold
+                    and now - self.no_face_alerted_at > self.no_face_cooldown
+                ):
+                    desc = "Face not visible — please look at the camera" if body_detected else "No face detected in frame for over 10 seconds"
+                    alerts.append({
+                        "alertType": "NO_FACE",
+                        "description": desc,
+                        "confidence": 0.85,
+                        "severity": "MEDIUM",
+                        "timestamp": self._iso(),
+                    })
+                    self.no_face_alerted_at = now
+        else:
+            if self.no_face_start is not None:
+                print(f"[PY] Face returned after {now - self.no_face_start:.1f}s", file=sys.stderr)
+            self.no_face_start = None
+
+        # ── Multiple faces ────────────────────────────────────────────
+        if face_count > 1:
+            if self.multi_face_start is None:
+                self.multi_face_start = now
+                print("[PY] Multiple faces timer started", file=sys.stderr)
+            else:
+                present_for = now - self.multi_face_start
+                print(f"[PY] Multiple faces for {present_for:.1f}s / threshold={self.multi_face_threshold}s", file=sys.stderr)
+                if (
+                    present_for >= self.multi_face_threshold
+                    and now - self.multi_face_alerted_at > self.multi_face_cooldown
+                ):
+                    alerts.append({
+                        "alertType": "MULTIPLE_FACES",
+                        "description": f"{face_count} faces detected for over 5 seconds — another person may be assisting",
+                        "confidence": 0.88,
+                        "severity": "HIGH",
+                        "timestamp": self._iso(),
+                    })
+                    self.multi_face_alerted_at = now
                     self.multi_face_start = now
-                    print("[PY] Multiple faces timer started", file=sys.stderr)
+        else:
+            self.multi_face_start = None
+
+        # ── Gaze deviation ────────────────────────────────────────────
+        if face_count == 1:
+            if detection["looking_away"]:
+                if self.gaze_away_start is None:
+                    self.gaze_away_start = now
                 else:
-                    present_for = now - self.multi_face_start
-                    print(f"[PY] Multiple faces for {present_for:.1f}s / threshold={self.multi_face_threshold}s", file=sys.stderr)
+                    away_for = now - self.gaze_away_start
+                    print(f"[PY] Gaze away for {away_for:.1f}s / threshold={self.gaze_away_threshold}s", file=sys.stderr)
                     if (
-                        present_for >= self.multi_face_threshold
-                        and now - self.multi_face_alerted_at > self.multi_face_cooldown
+                        away_for >= self.gaze_away_threshold
+                        and now - self.gaze_alerted_at > self.gaze_alert_cooldown
                     ):
                         alerts.append({
-                            "alertType": "MULTIPLE_FACES",
-                            "description": f"{face_count} faces detected for over 5 seconds — another person may be assisting",
-                            "confidence": 0.88,
-                            "severity": "HIGH",
+                            "alertType": "GAZE_DEVIATION",
+                            "description": "Student has been looking away from the screen for over 8 seconds",
+                            "confidence": 0.70,
+                            "severity": "LOW",
                             "timestamp": self._iso(),
                         })
-                        self.multi_face_alerted_at = now
-                        self.multi_face_start = now
-            else:
-                self.multi_face_start = None
-
-            # ── Gaze deviation ────────────────────────────────────────────
-            if face_count == 1:
-                looking_away = self.check_gaze_away(image, faces[0])
-                print(f"[PY] gaze_away={looking_away}", file=sys.stderr)
-                if looking_away:
-                    if self.gaze_away_start is None:
+                        self.gaze_alerted_at = now
                         self.gaze_away_start = now
-                    else:
-                        away_for = now - self.gaze_away_start
-                        print(f"[PY] Gaze away for {away_for:.1f}s / threshold={self.gaze_away_threshold}s", file=sys.stderr)
-                        if (
-                            away_for >= self.gaze_away_threshold
-                            and now - self.gaze_alerted_at > self.gaze_alert_cooldown
-                        ):
-                            alerts.append({
-                                "alertType": "GAZE_DEVIATION",
-                                "description": "Student has been looking away from the screen for over 8 seconds",
-                                "confidence": 0.70,
-                                "severity": "LOW",
-                                "timestamp": self._iso(),
-                            })
-                            self.gaze_alerted_at = now
-                            self.gaze_away_start = now
-                else:
-                    self.gaze_away_start = None
             else:
                 self.gaze_away_start = None
+        else:
+            self.gaze_away_start = None
 
-            # ── Phone detection (YOLO preferred, cv2 fallback) ────────────
-            if self.detect_phone(image):
+        # ── Phone detection (YOLO preferred, cv2 fallback) ────────────
+        if computed:
+            if detection["phone"]:
                 self.phone_consecutive += 1
                 print(f"[PY] Phone consecutive={self.phone_consecutive}/{self.phone_consecutive_threshold}", file=sys.stderr)
                 if (
@@ -456,39 +616,68 @@ class ProctoringAnalyzer:
             else:
                 self.phone_consecutive = max(0, self.phone_consecutive - 1)
 
-            # ── Identity check ────────────────────────────────────────────
-            identity_result = self.compare_identity(image)
-            identity_verified = None
-            identity_similarity = None
-            if identity_result is not None:
-                identity_similarity = identity_result["similarity"]
-                identity_verified = identity_result["matches"]
-                if (
-                    not identity_result["matches"]
-                    and now - self.identity_alerted_at > self.identity_alert_cooldown
-                ):
-                    alerts.append({
-                        "alertType": "IDENTITY_MISMATCH",
-                        "description": f"Face does not match registered student (similarity {identity_similarity:.0%})",
-                        "confidence": round(1 - identity_similarity, 2),
-                        "severity": "HIGH",
-                        "timestamp": self._iso(),
-                    })
-                    self.identity_alerted_at = now
+        # ── Identity check ────────────────────────────────────────────
+        identity_result = detection["identity"]
+        if identity_result is not None and computed:
+            identity_similarity = identity_result["similarity"]
+            if (
+                not identity_result["matches"]
+                and now - self.identity_alerted_at > self.identity_alert_cooldown
+            ):
+                alerts.append({
+                    "alertType": "IDENTITY_MISMATCH",
+                    "description": f"Face does not match registered student (similarity {identity_similarity:.0%})",
+                    "confidence": round(1 - identity_similarity, 2),
+                    "severity": "HIGH",
+                    "timestamp": self._iso(),
+                })
+                self.identity_alerted_at = now
+        return alerts
+
+    def analyze_frame(self, frame_data):
+        try:
+            raw = frame_data.get("imageData", "")
+            print(f"[PY] analyze_frame: len={len(raw)}", file=sys.stderr)
+            data = self.read_image_bytes(raw)
+            if data is None:
+                return {"alerts": [], "faceDetected": False, "faceCount": 0}
+
+            now = time.time()
+            thumb = gate_thumb(small_gray(data))
+            computed = not (self.last_detection is not None and self.gate.can_reuse(thumb, now))
+            if computed:
+                image = self.decode_bytes(data)
+                if image is None:
+                    print("[PY] decode_image returned None!", file=sys.stderr)
+                    return {"alerts": [], "faceDetected": False, "faceCount": 0}
+                print(f"[PY] decoded image shape={image.shape}", file=sys.stderr)
+                self.last_detection = self.detect(image, frame_data.get("participantId"))
+                self.gate.mark_computed(thumb, now)
+            else:
+                print(f"[PY] frame unchanged (diff={self.gate.last_diff:.2f}), reusing detections", file=sys.stderr)
+            detection = self.last_detection
+
+            alerts = self.apply_alerts(detection, now, computed)
 
             # ── Audio ─────────────────────────────────────────────────────
             audio_energy = frame_data.get("audioEnergy")
             if audio_energy is not None:
                 alerts.extend(self.analyze_audio(float(audio_energy), now))
 
-            print(f"[PY] RESULT: faceDetected={face_count > 0} alerts={len(alerts)} mode={'yolo' if self.yolo else 'cv2'}", file=sys.stderr)
+            face_count = len(detection["faces"])
+            identity_result = detection["identity"]
+            identity_verified = identity_result["matches"] if identity_result is not None and computed else None
+            identity_similarity = identity_result["similarity"] if identity_result is not None else None
+            analysis = "computed" if computed else "reused"
+            print(f"[PY] RESULT: faceDetected={face_count > 0} alerts={len(alerts)} analysis={analysis} mode={'yolo' if self.yolo else 'cv2'}", file=sys.stderr)
             return {
                 "alerts": alerts,
                 "faceDetected": face_count > 0,
                 "faceCount": face_count,
-                "bodyDetected": body_detected,
+                "bodyDetected": detection["body_detected"],
                 "identityVerified": identity_verified,
                 "identitySimilarity": identity_similarity,
+                "analysis": analysis,
                 "timestamp": self._iso(),
                 "mode": "advanced" if self.yolo else "simple",
             }
@@ -503,6 +692,7 @@ def main():
         "status": "READY",
         "mode": "advanced" if analyzer.yolo else "simple",
         "yolo": analyzer.yolo is not None,
+        "faceBackend": analyzer.face_dnn.name if analyzer.face_dnn else "haar",
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
     }))
     sys.stdout.flush()
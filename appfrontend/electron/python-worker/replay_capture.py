@@ -0,0 +1,181 @@
+"""
+Replay a stdin capture (see stdin_capture.py) through a worker and diff outputs.
+
+    python replay_capture.py replay /tmp/exam --speed 1  --out paced.jsonl   # recorded pace
+    python replay_capture.py replay /tmp/exam --speed 8  --out fast8.jsonl   # 8x accelerated
+    python replay_capture.py replay /tmp/exam --speed 0  --out asap.jsonl    # as fast as the worker reads
+    python replay_capture.py diff paced.jsonl asap.jsonl
+    python replay_capture.py replay /tmp/exam --speed 0 --workers 4 --out pool4.jsonl   # through worker_pool.py
+
+A capture is one .prcap file or the prefix given as PROCTOR_CAPTURE (all its
+rotated files, in order). The replayed worker runs with PROCTOR_CLOCK=frame
+and full output by default, so an accelerated replay sees the same frame
+times, and therefore the same timers and alerts, as the recorded session.
+Frame staleness drops are off (PROCTOR_STALE_MS=0): recorded timestamps are
+old by the time they are replayed. So is the CPU governor's backoff
+(PROCTOR_CPU_ADAPTIVE=0): an accelerated replay saturates the budget, and
+stretching the detector interval would reuse detections a paced run computes.
+
+--workers N replays through worker_pool.py with N shards; the pool then
+blocks instead of dropping frames when a shard falls behind, as the single
+worker's pipe does.
+
+diff compares what the host acts on: result lines by alert types, face
+presence/count, identity and frame quality issue, in order per participant
+(a pool interleaves participants differently from run to run); status lines
+by status, as a multiset. Timestamps, timings and HEARTBEAT lines are ignored.
+
+SUSTAINED_SPEECH is left out of the per-line comparison. With AUDIO_PCM in the
+capture it comes from the VAD thread, and which frame result it is folded
+into depends on timing. diff reports each participant's count of it instead,
+as information rather than a failure.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from stdin_capture import capture_files, read_capture
+
+WORKER = os.path.join(SCRIPT_DIR, "simple_proctoring_worker.py")
+POOL   = os.path.join(SCRIPT_DIR, "worker_pool.py")
+TIMING_ALERTS = {"SUSTAINED_SPEECH"}   # folded into whichever result follows the VAD thread's detection
+
+
+def replay(args):
+    files = capture_files(args.capture)
+    if not files:
+        raise SystemExit(f"no capture at {args.capture}")
+    env = dict(os.environ, PROCTOR_CLOCK=args.clock, PROCTOR_OUTPUT="full", PROCTOR_STATE_FILE="",
+               PROCTOR_STALE_MS="0", PROCTOR_CPU_ADAPTIVE="0")
+    env.pop("PROCTOR_CAPTURE", None)
+    worker = args.worker
+    if args.workers:
+        worker = POOL if worker == WORKER else worker
+        env.update(PROCTOR_POOL_WORKERS=str(args.workers), PROCTOR_POOL_DROP="0")
+    proc = subprocess.Popen([sys.executable, worker], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=None if args.verbose else subprocess.DEVNULL, env=env)
+    ready = threading.Event()
+    lines = []
+
+    def reader():
+        for line in proc.stdout:
+            line = line.decode()
+            lines.append(line)
+            if not ready.is_set() and '"READY"' in line:
+                ready.set()
+        ready.set()
+
+    threading.Thread(target=reader, daemon=True).start()
+    ready.wait()
+
+    sent, t0, start = 0, None, time.monotonic()
+    for path in files:
+        for t, line, payload in read_capture(path):
+            if t0 is None:
+                t0 = t
+            if args.speed > 0:
+                delay = start + (t - t0) / args.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            proc.stdin.write(line.encode() + b"\n" + payload)
+            proc.stdin.flush()
+            sent += 1
+    proc.stdin.close()
+    proc.wait()
+    wall = time.monotonic() - start
+
+    if args.out:
+        with open(args.out, "w") as out:
+            out.writelines(lines)
+    else:
+        sys.stdout.writelines(lines)
+    span = 0.0 if t0 is None else t - t0
+    print(f"replayed {sent} messages from {len(files)} file(s): {span:.1f}s recorded, {wall:.1f}s replay "
+          f"({span / wall if wall else 0:.1f}x), {len(lines)} output lines", file=sys.stderr)
+
+
+def _key(line):
+    """(stream, key, timing alerts): stream is the participant for results, "status" for status lines."""
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return None
+    if "alerts" in obj:
+        quality = obj.get("frameQuality") or {}
+        types = [a.get("alertType", "") for a in obj["alerts"]]
+        return (obj.get("participantId") or obj.get("userId"),
+                ("result", tuple(sorted(t for t in types if t not in TIMING_ALERTS)), obj.get("faceDetected"),
+                 obj.get("faceCount"), obj.get("identityVerified"), quality.get("issue")),
+                sum(t in TIMING_ALERTS for t in types))
+    if obj.get("status") in (None, "HEARTBEAT"):
+        return None
+    return "status", ("status", obj["status"]), 0
+
+
+def diff(args):
+    def load(path):
+        streams, speech = {}, {}
+        with open(path) as f:
+            for k in map(_key, f):
+                if k is not None:
+                    streams.setdefault(k[0], []).append(k[1])
+                    speech[k[0]] = speech.get(k[0], 0) + k[2]
+        if "status" in streams:
+            streams["status"].sort()
+        return streams, speech
+
+    (a, speech_a), (b, speech_b) = load(args.a), load(args.b)
+    mismatches, compared, lengths = [], 0, []
+    for stream in sorted(set(a) | set(b), key=str):
+        x, y = a.get(stream, []), b.get(stream, [])
+        mismatches += [(stream, i, u, v) for i, (u, v) in enumerate(zip(x, y)) if u != v]
+        compared += min(len(x), len(y))
+        if len(x) != len(y):
+            lengths.append(f"{stream}: {len(x)} vs {len(y)} lines")
+    for stream, i, x, y in mismatches[:args.show]:
+        print(f"{stream} #{i}\n  - {x}\n  + {y}")
+    for line in lengths:
+        print(f"length differs, {line}")
+    alerts_a = sum(len(k[1]) for ks in a.values() for k in ks if k[0] == "result")
+    alerts_b = sum(len(k[1]) for ks in b.values() for k in ks if k[0] == "result")
+    print(f"{len(mismatches)} of {compared} lines differ; alerts {alerts_a} vs {alerts_b}")
+    for stream in sorted(set(speech_a) | set(speech_b), key=str):
+        if speech_a.get(stream) or speech_b.get(stream):
+            print(f"{stream}: {'/'.join(sorted(TIMING_ALERTS))} {speech_a.get(stream, 0)} vs {speech_b.get(stream, 0)} "
+                  "(not compared: timing dependent)")
+    sys.exit(1 if mismatches or lengths else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("replay", help="feed a capture to a worker and save its stdout")
+    p.add_argument("capture", help=".prcap file or PROCTOR_CAPTURE prefix")
+    p.add_argument("--speed", type=float, default=1.0, help="pace multiplier; 0 = as fast as possible")
+    p.add_argument("--clock", default="frame", help="PROCTOR_CLOCK for the replayed worker")
+    p.add_argument("--worker", default=WORKER)
+    p.add_argument("--workers", type=int, default=0, help="replay through worker_pool.py with this many shards")
+    p.add_argument("--out", default=None, help="worker output (default stdout)")
+    p.add_argument("--verbose", action="store_true", help="pass the worker's [PY] logs through")
+    p.set_defaults(func=replay)
+
+    p = sub.add_parser("diff", help="compare two replay outputs")
+    p.add_argument("a")
+    p.add_argument("b")
+    p.add_argument("--show", type=int, default=10, help="mismatches to print")
+    p.set_defaults(func=diff)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ import platform
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 VENV_DIR   = os.path.join(SCRIPT_DIR, "proctoring_env")
 REQ_FILE   = os.path.join(SCRIPT_DIR, "requirements.txt")
+MODELS     = os.path.join(SCRIPT_DIR, "download_models.py")
+PREDICTOR  = os.path.join(SCRIPT_DIR, "shape_predictor_68_face_landmarks.dat")
 
 def get_venv_python():
     if platform.system() == "Windows":
@@ -46,6 +48,9 @@ def main():
     print("[setup] Checking proctoring environment...")
 
     if check_already_installed():
+        if not os.path.exists(PREDICTOR):
+            print("[setup] Downloading models...")
+            run([get_venv_python(), MODELS])
         print("[setup] Environment already set up. Skipping.")
         return
 
@@ -93,5 +98,9 @@ def main():
         print(f"[setup] Verification failed:\n{check.stderr}")
         sys.exit(1)
 
+    # 7. Models (not in git: the landmark predictor alone is ~100 MB)
+    print("[setup] Downloading models...")
+    run([py, MODELS])
+
 if __name__ == "__main__":
     main()
@@ -1,16 +1,34 @@
 import base64
+import copy
 import json
 import os
 import sys
+import threading
 import time
 import urllib.request
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+from audio_vad import AudioChannel
+from clock import clock_from_env
+from cpu_governor import CpuGovernor, preset_thread_env
+from face_backends import load_face_backend
+from flow_control import FlowControl
+preset_thread_env()   # before cv2/torch create their OpenMP pools
+
 import cv2
 import numpy as np
 
+from frame_gate import FrameGate, gate_thumb, small_gray
+from head_pose import HeadPose
+from frame_quality import QualityGate
+from frame_pyramid import FramePyramid, load_profile
+from output_channel import OutputChannel
+from state_snapshot import Snapshotter
+from stdin_capture import CaptureRecorder
+
 try:
     from ultralytics import YOLO
     YOLO_AVAILABLE = True
@@ -49,10 +67,28 @@ GAZE_THRESH    = 5.0;   GAZE_COOL     = 45.0
 PHONE_FRAMES   = 2;     PHONE_COOL    = 30.0
 SPEECH_THRESH  = 15.0;  SPEECH_COOL   = 90.0
 SPEECH_ENERGY  = 0.10
+CPU_REPORT_EVERY = 10.0   # seconds between budget/usage reports attached to results
+PARTICIPANT_IDLE = float(os.environ.get("PROCTOR_PARTICIPANT_IDLE", 600))   # then its analyzer is dropped
+PARTICIPANT_SWEEP_EVERY = 30.0
+
+# Phone detection scheduling: "serial" runs YOLO after the face stages,
+# "parallel" runs it on a persistent thread alongside them (cascades and torch
+# both release the GIL). Parallel needs at least 2 cores to help. "async"
+# doesn't wait at all: YOLO works through the newest frame in the background
+# and its results are folded into whichever frame result comes next.
+PHONE_MODE = os.environ.get("PROCTOR_PHONE_MODE", "parallel" if (os.cpu_count() or 1) >= 2 else "serial")
+BAD_FEED_THRESH = 10.0; BAD_FEED_COOL = 60.0
 
+BAD_FEED_TEXT = {
+    "covered": "Camera appears covered or blocked for {}s",
+    "dark":    "Camera image too dark to analyse for {}s",
+    "frozen":  "Camera feed frozen for {}s",
+    "blurred": "Camera image too blurred to analyse for {}s",
+}
 
-def _iso():
-    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + "Z"
+
+def _iso(t=None):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + "Z"
 
 
 def _preprocess(img):
@@ -92,12 +128,27 @@ def _filter_faces(rects):
     return kept
 
 
+def _split_threads(cores):
+    """
+    (cv2, torch) intra-op thread counts for running the two side by side
+    without oversubscribing: YOLO gets the larger half, the cascades the rest.
+    """
+    torch_threads = max(1, (cores + 1) // 2)
+    return max(1, cores - torch_threads), torch_threads
+
+
 class ProctoringAnalyzer:
     def __init__(self):
         print("[PY] Initializing...", file=sys.stderr)
 
+        # Working resolution per detector (PROCTOR_PROFILE)
+        self.profile_name, self.profile = load_profile()
+        print(f"[PY] Resolution profile {self.profile_name}: {self.profile}", file=sys.stderr)
+
         self.face_cc    = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
         self.profile_cc = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_profileface.xml")
+        # Optional DNN detector (PROCTOR_FACE_BACKEND); None = the cascades above
+        self.face_dnn = load_face_backend()
 
         self.yolo = None
         if YOLO_AVAILABLE:
@@ -111,6 +162,42 @@ class ProctoringAnalyzer:
             except Exception as e:
                 print(f"[PY] YOLO load failed: {e}", file=sys.stderr)
 
+        self.phone_mode = PHONE_MODE if self.yolo is not None else "serial"
+        self.phone_pool = None
+        if self.phone_mode != "serial":
+            self.phone_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phone")
+
+        # CPU budget: thread pools, optional pinning, detector cadence backoff
+        self.governor = CpuGovernor()
+        self.governor.apply(cv2, _split_threads, self.phone_pool is not None)
+        print(f"[PY] Phone detection {self.phone_mode}, CPU budget {self.governor.report()}", file=sys.stderr)
+
+        # Gaze from head pose when landmarks are available; the predictor loads in the background
+        self.head_pose = HeadPose()
+
+        self._init_participant_state()
+        print("[PY] Ready", file=sys.stderr)
+
+    def for_participant(self):
+        """An analyzer for another participant: fresh state, this one's models, pools and governor."""
+        other = copy.copy(self)
+        other.head_pose = self.head_pose.fork()
+        other._init_participant_state()
+        return other
+
+    def _init_participant_state(self):
+        self.user_id        = None   # ids of the participant served, as its messages carry them
+        self.participant_id = None
+        self.last_landmarks = None
+        self.phone_lock    = threading.Lock()
+        self.phone_busy    = False
+        self.phone_next    = None   # async: newest frame waiting for the phone thread
+        self.phone_ready   = None   # async: this frame's phone input, handed off once its result is built
+        self.phone_results = []     # async: (hit, source frame time) not yet folded into a result
+
+        # Time source for every timer and cooldown (PROCTOR_CLOCK)
+        self.clock = clock_from_env()
+
         # Identity
         self.ref_crops             = None   # list of crops at 3 scales
         self.ref_user_id           = None
@@ -122,8 +209,9 @@ class ProctoringAnalyzer:
         # Face smoothing
         self.face_history = deque(maxlen=SMOOTH_WIN)
 
-        # Gaze rolling majority
+        # Gaze rolling majority; per-frame verdicts from head pose when landmarks are available
         self.gaze_away_history = deque(maxlen=5)
+        self.last_head_pose = None
 
         # Timers
         self.no_face_start     = None;  self.no_face_alerted_at = 0.0
@@ -133,43 +221,79 @@ class ProctoringAnalyzer:
         self.speech_start      = None;  self.speech_alerted_at  = 0.0
         self.audio_history     = deque(maxlen=30)
 
-        print("[PY] Ready", file=sys.stderr)
+        # Streamed PCM (AUDIO_PCM): VAD on its own thread replaces the per-frame energy
+        self.audio = AudioChannel()
+
+        # Frame-difference gate: static frames reuse the last detection outputs
+        self.gate     = FrameGate()
+        self.last_det = None
+
+        # Quality pre-check: unusable frames never reach the detectors
+        self.quality             = QualityGate()
+        self.bad_feed_start      = None
+        self.bad_feed_alerted_at = 0.0
 
     # ── Image decode ──────────────────────────────────────────────────────
 
-    def decode_image(self, b64: str):
+    def read_image_bytes(self, b64: str):
+        if isinstance(b64, bytes):
+            return b64   # already encoded image bytes (offline analysis)
         try:
             if b64.startswith("http://") or b64.startswith("https://"):
                 with urllib.request.urlopen(b64, timeout=5) as r:
-                    data = r.read()
-            else:
-                if "," in b64:
-                    b64 = b64.split(",")[1]
-                b64 += "=" * (-len(b64) % 4)
-                data = base64.b64decode(b64)
+                    return r.read()
+            if "," in b64:
+                b64 = b64.split(",")[1]
+            b64 += "=" * (-len(b64) % 4)
+            return base64.b64decode(b64)
+        except Exception as e:
+            print(f"[PY] decode error: {e}", file=sys.stderr)
+            return None
+
+    def decode_bytes(self, data: bytes, normalize=True):
+        try:
             arr = np.frombuffer(data, np.uint8)
             img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
             if img is None:
                 return None
             h, w = img.shape[:2]
-            if w != 640:
+            if normalize and w != 640:
                 img = cv2.resize(img, (640, int(h * 640.0 / w)), interpolation=cv2.INTER_LINEAR)
             return img
         except Exception as e:
             print(f"[PY] decode error: {e}", file=sys.stderr)
             return None
 
+    def decode_image(self, b64: str):
+        data = self.read_image_bytes(b64)
+        return None if data is None else self.decode_bytes(data)
+
     # ── Face detection ────────────────────────────────────────────────────
 
-    def detect_faces(self, img):
-        gray  = _preprocess(img)
-        raw   = self.face_cc.detectMultiScale(gray, FACE_SF, FACE_MIN_N, minSize=(FACE_MIN_SIZE, FACE_MIN_SIZE))
-        faces = _filter_faces(raw.tolist() if len(raw) > 0 else [])
+    def detect_faces(self, pyr):
+        """
+        Faces on the profile's face level; returned boxes are in frame coordinates.
+        The DNN backend also leaves five landmarks per face in self.last_landmarks.
+        """
+        width = self.profile["faces"]
+        ms    = max(24, int(round(FACE_MIN_SIZE * pyr.param_scale(width))))
+        if self.face_dnn is not None:
+            # One pass, scored and NMS'd by the network: no profile/flip passes, no _filter_faces
+            raw, _, marks = self.face_dnn.detect(pyr.at(width))
+            keep  = [i for i, (_, _, w, h) in enumerate(raw) if min(w, h) >= ms]
+            faces = [raw[i] for i in keep]
+            sx, sy = pyr.factors(width)
+            self.last_landmarks = [[[x * sx, y * sy] for x, y in marks[i]] for i in keep]
+        else:
+            gray  = _preprocess(pyr.at(width))
+            raw   = self.face_cc.detectMultiScale(gray, FACE_SF, FACE_MIN_N, minSize=(ms, ms))
+            faces = _filter_faces(raw.tolist() if len(raw) > 0 else [])
+            self.last_landmarks = None
 
-        if not faces and not self.profile_cc.empty():
+        if not faces and self.face_dnn is None and not self.profile_cc.empty():
             for flip in (False, True):
                 g  = cv2.flip(gray, 1) if flip else gray
-                pf = self.profile_cc.detectMultiScale(g, FACE_SF, FACE_MIN_N, minSize=(FACE_MIN_SIZE, FACE_MIN_SIZE))
+                pf = self.profile_cc.detectMultiScale(g, FACE_SF, FACE_MIN_N, minSize=(ms, ms))
                 if len(pf) > 0:
                     pf = pf.tolist()
                     if flip:
@@ -178,6 +302,7 @@ class ProctoringAnalyzer:
                     faces = _filter_faces(pf)
                     break
 
+        faces     = pyr.to_frame(faces, width)
         raw_count = len(faces)
         self.face_history.append(raw_count)
         smoothed = int(np.median(list(self.face_history)))
@@ -198,16 +323,25 @@ class ProctoringAnalyzer:
 
     # ── Gaze detection ────────────────────────────────────────────────────
 
-    def check_gaze_away(self, img, face_rect):
+    def check_gaze_away(self, img, face_rect, landmarks=None):
         """
-        Face-position based gaze — reliable on any webcam without eye cascade.
-        Away if:
+        Head-pose gaze when landmarks are available (head_pose.py): away if
+        yaw or pitch is past its limit. Otherwise face-position based gaze,
+        reliable on any webcam without eye cascade. Away if:
           1. Face center X is outside 25-75% of frame width (looking left/right)
           2. Face center Y is in top 30% of frame (looking up)
           3. Face area is < 8% of frame area (head turned away / too small)
         Rolling majority over last 5 frames to avoid flicker.
         """
         try:
+            pose = self.head_pose.estimate(img, face_rect, landmarks) if self.head_pose.available(landmarks) else None
+            self.last_head_pose = self.head_pose.last if pose is not None else None
+            if pose is not None:
+                away_frame = self.head_pose.away(*pose)
+                print(f"[PY] gaze: yaw={pose[0]:.0f} pitch={pose[1]:.0f} away={away_frame}", file=sys.stderr)
+                self.gaze_away_history.append(away_frame)
+                return sum(self.gaze_away_history) > len(self.gaze_away_history) / 2
+
             h_img, w_img = img.shape[:2]
             fx, fy, fw, fh = face_rect
 
@@ -240,10 +374,9 @@ class ProctoringAnalyzer:
         if self.yolo is None:
             return False
         try:
-            h, w = img.shape[:2]
-            # Always run at 640px for consistent detection
-            img_yolo = cv2.resize(img, (640, int(h * 640.0 / w)), interpolation=cv2.INTER_LINEAR) if w != 640 else img
-            results = self.yolo(img_yolo, conf=0.15, verbose=False)
+            # img is already the profile's phone level; infer at that size instead of YOLO's default 640
+            imgsz   = -(-max(img.shape[:2]) // 32) * 32
+            results = self.yolo(img, conf=0.15, imgsz=imgsz, verbose=False)
             for result in results:
                 if result.boxes is None:
                     continue
@@ -340,6 +473,7 @@ class ProctoringAnalyzer:
         self.identity_match_streak = 0
         self.identity_alerted_at   = 0.0
         self.last_face_cx          = None
+        self.gate.reset()
         print(f"[PY] Reference face loaded (multi-scale NCC) for {user_id}, face={best}", file=sys.stderr)
         return True
 
@@ -349,15 +483,17 @@ class ProctoringAnalyzer:
         self.last_face_cx = cx
         return changed
 
-    def compare_identity(self, img, faces):
+    def compare_identity(self, pyr, faces):
+        """faces are in frame coordinates; crops come from the profile's identity level."""
         if self.ref_crops is None or not faces:
             return None
         try:
-            gray         = _preprocess(img)
+            width        = self.profile["identity"]
+            gray         = _preprocess(pyr.at(width))
             best         = max(faces, key=lambda r: r[2] * r[3])
-            face_changed = self._face_changed(img.shape[1], best)
+            face_changed = self._face_changed(pyr.width, best)
 
-            sim = self._multi_scale_ncc(self.ref_crops, gray, best)
+            sim = self._multi_scale_ncc(self.ref_crops, gray, pyr.from_frame([best], width)[0])
             sim = max(0.0, min(1.0, sim))
 
             if sim >= IDENT_THRESHOLD:
@@ -395,7 +531,14 @@ class ProctoringAnalyzer:
     # ── Audio ─────────────────────────────────────────────────────────────
 
     def analyze_audio(self, energy, now):
-        alerts = []
+        """
+        SUSTAINED_SPEECH for this frame: alerts the VAD thread raised since the
+        last frame while PCM is streaming, else the frame's scalar audioEnergy.
+        """
+        alerts = self.audio.take_alerts()
+        if self.audio.streaming() or energy is None:
+            return alerts
+        energy = float(energy)
         self.audio_history.append(energy)
         if energy > SPEECH_ENERGY:
             if self.speech_start is None:
@@ -404,7 +547,7 @@ class ProctoringAnalyzer:
                 alerts.append({
                     "alertType": "SUSTAINED_SPEECH",
                     "description": f"Continuous speech for {int(now - self.speech_start)}s",
-                    "confidence": 0.74, "severity": "MEDIUM", "timestamp": _iso(),
+                    "confidence": 0.74, "severity": "MEDIUM", "timestamp": _iso(now),
                 })
                 self.speech_alerted_at = now
                 self.speech_start      = now
@@ -414,123 +557,255 @@ class ProctoringAnalyzer:
 
     # ── Main analysis ─────────────────────────────────────────────────────
 
-    def analyze_frame(self, frame_data):
-        try:
-            img = self.decode_image(frame_data.get("imageData", ""))
-            if img is None:
-                return {"alerts": [], "faceDetected": False, "faceCount": 0}
+    def submit_phone_async(self, img, ts):
+        with self.phone_lock:
+            if self.phone_busy:
+                self.phone_next = (img, ts)   # only the newest waiting frame matters
+                return
+            self.phone_busy = True
+        self.phone_pool.submit(self._phone_async_loop, img, ts)
+
+    def _phone_async_loop(self, img, ts):
+        while True:
+            hit = self.detect_phone(img)
+            with self.phone_lock:
+                self.phone_results.append((hit, ts))
+                if self.phone_next is None:
+                    self.phone_busy = False
+                    return
+                img, ts = self.phone_next
+                self.phone_next = None
+
+    def take_phone_results(self, det, now, computed):
+        """Phone inference results to count on this frame, as (hit, source frame time)."""
+        if self.phone_mode == "async":
+            with self.phone_lock:
+                results, self.phone_results = self.phone_results, []
+            return results
+        return [(det["phone"], now)] if computed else []
+
+    def detect(self, img, now):
+        """
+        Detection stage: every detector on a fully decoded frame, each at its
+        profile resolution from one shared pyramid. Updates the per-detector histories.
+        """
+        pyr       = FramePyramid(img)
+        phone_img = pyr.at(self.profile["phone"])
+        # Parallel mode: YOLO overlaps the face, gaze and identity stages; joined before the alert logic
+        pending = None
+        if self.phone_mode == "async":
+            self.phone_ready = (phone_img, now)
+        elif self.phone_pool is not None:
+            pending = self.phone_pool.submit(self.detect_phone, phone_img)
+
+        faces, raw_count, smoothed, display_count = self.detect_faces(pyr)
+        # raw_count: present/absent (immediate)
+        # display_count: what to show in UI (smoothed-corrected)
+        # smoothed: for multi-face alert timer
+        single = raw_count == 1 and len(faces) >= 1
+        det = {
+            "faces":         faces,
+            "raw_count":     raw_count,
+            "smoothed":      smoothed,
+            "display_count": display_count,
+            "landmarks":     self.last_landmarks,
+            "gaze_away":     self.check_gaze_away(img, faces[0], self.last_landmarks[0] if self.last_landmarks else None)
+                             if single else False,
+            "head_pose":     self.last_head_pose if single else None,
+            "identity":      self.compare_identity(pyr, faces) if raw_count >= 1 and len(faces) >= 1 else None,
+        }
+        if self.phone_mode == "async":
+            det["phone"] = None
+        else:
+            det["phone"] = pending.result() if pending is not None else self.detect_phone(phone_img)
+        return det
 
-            alerts = []
-            now    = time.time()
-
-            faces, raw_count, smoothed, display_count = self.detect_faces(img)
-
-            # raw_count: present/absent (immediate)
-            # display_count: what to show in UI (smoothed-corrected)
-            # smoothed: for multi-face alert timer
-
-            # ── No face ───────────────────────────────────────────────────
-            if raw_count == 0:
-                if self.no_face_start is None:
-                    self.no_face_start = now
-                else:
-                    absent = now - self.no_face_start
-                    if absent >= NO_FACE_THRESH and now - self.no_face_alerted_at > NO_FACE_COOL:
-                        alerts.append({
-                            "alertType": "NO_FACE",
-                            "description": "No face detected — please look at the camera",
-                            "confidence": 0.88, "severity": "MEDIUM", "timestamp": _iso(),
-                        })
-                        self.no_face_alerted_at = now
+    def apply_alerts(self, det, now, computed, phone_results):
+        """
+        Alert stage. Time-based timers (no face, multiple faces, gaze) advance on
+        every frame, reused or not. Identity confirmation only moves on freshly
+        computed detections, the phone streak once per phone inference result.
+        """
+        alerts    = []
+        raw_count = det["raw_count"]
+        smoothed  = det["smoothed"]
+
+        # ── No face ───────────────────────────────────────────────────
+        if raw_count == 0:
+            if self.no_face_start is None:
+                self.no_face_start = now
             else:
-                self.no_face_start = None
-
-            # ── Multiple faces ────────────────────────────────────────────
-            if smoothed > 1:
-                if self.multi_start is None:
-                    self.multi_start = now
-                else:
-                    present = now - self.multi_start
-                    print(f"[PY] multi_face smoothed={smoothed} {present:.0f}s/{MULTI_THRESH}s", file=sys.stderr)
-                    if present >= MULTI_THRESH and now - self.multi_alerted_at > MULTI_COOL:
-                        alerts.append({
-                            "alertType": "MULTIPLE_FACES",
-                            "description": f"{smoothed} faces detected — another person may be present",
-                            "confidence": 0.90, "severity": "HIGH", "timestamp": _iso(),
-                        })
-                        self.multi_alerted_at = now
-                        self.multi_start      = now
+                absent = now - self.no_face_start
+                if absent >= NO_FACE_THRESH and now - self.no_face_alerted_at > NO_FACE_COOL:
+                    alerts.append({
+                        "alertType": "NO_FACE",
+                        "description": "No face detected — please look at the camera",
+                        "confidence": 0.88, "severity": "MEDIUM", "timestamp": _iso(now),
+                    })
+                    self.no_face_alerted_at = now
+        else:
+            self.no_face_start = None
+
+        # ── Multiple faces ────────────────────────────────────────────
+        if smoothed > 1:
+            if self.multi_start is None:
+                self.multi_start = now
             else:
-                self.multi_start = None
-
-            # ── Gaze ──────────────────────────────────────────────────────
-            if raw_count == 1 and len(faces) >= 1:
-                away = self.check_gaze_away(img, faces[0])
-                if away:
-                    if self.gaze_start is None:
-                        self.gaze_start = now
-                    else:
-                        t = now - self.gaze_start
-                        print(f"[PY] gaze_away {t:.0f}s/{GAZE_THRESH}s", file=sys.stderr)
-                        if t >= GAZE_THRESH and now - self.gaze_alerted_at > GAZE_COOL:
-                            alerts.append({
-                                "alertType": "GAZE_DEVIATION",
-                                "description": f"Looking away from screen for {int(t)}s",
-                                "confidence": 0.72, "severity": "MEDIUM", "timestamp": _iso(),
-                            })
-                            self.gaze_alerted_at = now
-                            self.gaze_start      = now
-                else:
-                    self.gaze_start = None
+                present = now - self.multi_start
+                print(f"[PY] multi_face smoothed={smoothed} {present:.0f}s/{MULTI_THRESH}s", file=sys.stderr)
+                if present >= MULTI_THRESH and now - self.multi_alerted_at > MULTI_COOL:
+                    alerts.append({
+                        "alertType": "MULTIPLE_FACES",
+                        "description": f"{smoothed} faces detected — another person may be present",
+                        "confidence": 0.90, "severity": "HIGH", "timestamp": _iso(now),
+                    })
+                    self.multi_alerted_at = now
+                    self.multi_start      = now
+        else:
+            self.multi_start = None
+
+        # ── Gaze ──────────────────────────────────────────────────────
+        if raw_count == 1 and len(det["faces"]) >= 1 and det["gaze_away"]:
+            if self.gaze_start is None:
+                self.gaze_start = now
             else:
-                self.gaze_start = None
+                t = now - self.gaze_start
+                print(f"[PY] gaze_away {t:.0f}s/{GAZE_THRESH}s", file=sys.stderr)
+                if t >= GAZE_THRESH and now - self.gaze_alerted_at > GAZE_COOL:
+                    alerts.append({
+                        "alertType": "GAZE_DEVIATION",
+                        "description": f"Looking away from screen for {int(t)}s",
+                        "confidence": 0.72, "severity": "MEDIUM", "timestamp": _iso(now),
+                    })
+                    self.gaze_alerted_at = now
+                    self.gaze_start      = now
+        else:
+            self.gaze_start = None
 
-            # ── Phone ─────────────────────────────────────────────────────
-            if self.detect_phone(img):
+        # ── Phone ─────────────────────────────────────────────────────
+        # Counted per inference result, whichever frame result it arrives with
+        for hit, _ in phone_results:
+            if hit:
                 self.phone_consecutive += 1
                 print(f"[PY] phone {self.phone_consecutive}/{PHONE_FRAMES}", file=sys.stderr)
                 if self.phone_consecutive >= PHONE_FRAMES and now - self.phone_alerted_at > PHONE_COOL:
                     alerts.append({
                         "alertType": "PHONE_DETECTED",
                         "description": "Mobile phone detected in frame",
-                        "confidence": 0.88, "severity": "HIGH", "timestamp": _iso(),
+                        "confidence": 0.88, "severity": "HIGH", "timestamp": _iso(now),
                     })
                     self.phone_alerted_at  = now
                     self.phone_consecutive = 0
             else:
                 self.phone_consecutive = max(0, self.phone_consecutive - 1)
 
-            # ── Identity ──────────────────────────────────────────────────
-            identity_result     = self.compare_identity(img, faces) if raw_count >= 1 and len(faces) >= 1 else None
-            identity_verified   = None
-            identity_similarity = None
-            if identity_result is not None:
-                identity_similarity = identity_result["similarity"]
-                identity_verified   = identity_result["matches"]
-                if identity_verified is False and now - self.identity_alerted_at > IDENTITY_COOL:
-                    alerts.append({
-                        "alertType": "IDENTITY_MISMATCH",
-                        "description": f"Face does not match registered student (score {identity_similarity:.2f})",
-                        "confidence": round(max(0.0, 1.0 - identity_similarity), 2),
-                        "severity": "HIGH", "timestamp": _iso(),
-                    })
-                    self.identity_alerted_at = now
+        # ── Identity ──────────────────────────────────────────────────
+        # A reused frame carries the last similarity but never re-confirms a verdict
+        identity_result = det["identity"]
+        if identity_result is not None and computed and identity_result["matches"] is False \
+                and now - self.identity_alerted_at > IDENTITY_COOL:
+            alerts.append({
+                "alertType": "IDENTITY_MISMATCH",
+                "description": f"Face does not match registered student (score {identity_result['similarity']:.2f})",
+                "confidence": round(max(0.0, 1.0 - identity_result["similarity"]), 2),
+                "severity": "HIGH", "timestamp": _iso(now),
+            })
+            self.identity_alerted_at = now
+        return alerts
 
-            # ── Audio ─────────────────────────────────────────────────────
-            audio_energy = frame_data.get("audioEnergy")
-            if audio_energy is not None:
-                alerts.extend(self.analyze_audio(float(audio_energy), now))
+    def check_bad_feed(self, quality, now):
+        """
+        Alert stage for an unusable frame. It says nothing about faces or gaze,
+        so those timers are not held open across it; a sustained bad feed
+        raises CAMERA_BLOCKED instead of a false NO_FACE.
+        """
+        alerts = []
+        self.no_face_start = None
+        self.multi_start   = None
+        self.gaze_start    = None
+        if self.bad_feed_start is None:
+            self.bad_feed_start = now
+            return alerts
+        t = now - self.bad_feed_start
+        print(f"[PY] bad feed ({quality['issue']}) {t:.0f}s/{BAD_FEED_THRESH}s", file=sys.stderr)
+        if t >= BAD_FEED_THRESH and now - self.bad_feed_alerted_at > BAD_FEED_COOL:
+            alerts.append({
+                "alertType": "CAMERA_BLOCKED",
+                "description": BAD_FEED_TEXT[quality["issue"]].format(int(t)),
+                "confidence": 0.80, "severity": "MEDIUM", "timestamp": _iso(now),
+            })
+            self.bad_feed_alerted_at = now
+        return alerts
+
+    def analyze_frame(self, frame_data, now=None):
+        """One frame result. `now` (epoch seconds) drives every timer; defaults to self.clock."""
+        try:
+            data = self.read_image_bytes(frame_data.get("imageData", ""))
+            if data is None:
+                return {"alerts": [], "faceDetected": False, "faceCount": 0}
 
-            print(f"[PY] RESULT faceDetected={raw_count>0} raw={raw_count} smoothed={smoothed} alerts={len(alerts)}", file=sys.stderr)
-            return {
+            now     = self.clock.now(frame_data.get("timestamp")) if now is None else now
+            small   = small_gray(data)
+            quality = self.quality.assess(small) if small is not None else None
+            if quality is not None and not quality["usable"]:
+                alerts = self.check_bad_feed(quality, now)
+                alerts.extend(self.analyze_audio(frame_data.get("audioEnergy"), now))
+                print(f"[PY] RESULT frameQuality={quality['issue']} alerts={len(alerts)} analysis=skipped", file=sys.stderr)
+                return {
+                    "alerts":       alerts,
+                    "faceDetected": False,
+                    "faceCount":    0,
+                    "frameQuality": quality,
+                    "analysis":     "skipped",
+                    "timestamp":    _iso(now),
+                    "mode":         "yolo" if self.yolo else "cv2",
+                }
+            self.bad_feed_start = None
+
+            # Over budget, the governor stretches the interval between full analyses
+            self.governor.sample()
+            thumb = gate_thumb(small)
+            computed = not (self.last_det is not None and self.gate.ref_thumb is not None and (
+                self.governor.throttled(now - self.gate.ref_at) or self.gate.can_reuse(thumb, now)))
+            if computed:
+                img = self.decode_bytes(data, normalize=False)
+                if img is None:
+                    return {"alerts": [], "faceDetected": False, "faceCount": 0}
+                self.last_det = self.detect(img, now)
+                self.gate.mark_computed(thumb, now)
+            det = self.last_det
+
+            phone_results = self.take_phone_results(det, now, computed)
+            alerts = self.apply_alerts(det, now, computed, phone_results)
+
+            # ── Audio ─────────────────────────────────────────────────────
+            alerts.extend(self.analyze_audio(frame_data.get("audioEnergy"), now))
+
+            identity = det["identity"]
+            raw_count = det["raw_count"]
+            analysis  = "computed" if computed else "reused"
+            print(f"[PY] RESULT faceDetected={raw_count>0} raw={raw_count} smoothed={det['smoothed']} "
+                  f"alerts={len(alerts)} analysis={analysis} diff={self.gate.last_diff}", file=sys.stderr)
+            result = {
                 "alerts":             alerts,
                 "faceDetected":       raw_count > 0,
-                "faceCount":          display_count,
-                "identityVerified":   identity_verified,
-                "identitySimilarity": identity_similarity,
-                "timestamp":          _iso(),
+                "faceCount":          det["display_count"],
+                "identityVerified":   identity["matches"] if identity is not None and computed else None,
+                "identitySimilarity": identity["similarity"] if identity is not None else None,
+                "analysis":           analysis,
+                "frameQuality":       quality,
+                "headPose":           det["head_pose"] if computed else None,
+                "timestamp":          _iso(now),
                 "mode":               "yolo" if self.yolo else "cv2",
             }
+            if self.phone_mode == "async":
+                # Background inference results folded in here, tagged with the frame they ran on
+                result["phoneResults"] = [{"detected": hit, "frameTimestamp": _iso(ts)} for hit, ts in phone_results]
+                # Start YOLO only now, so it never competes with this frame's face path
+                if self.phone_ready is not None:
+                    self.submit_phone_async(*self.phone_ready)
+                    self.phone_ready = None
+            return result
         except Exception as e:
             import traceback
             print(f"[PY] analyze_frame error: {e}", file=sys.stderr)
@@ -538,54 +813,236 @@ class ProctoringAnalyzer:
             return {"alerts": [], "faceDetected": False, "faceCount": 0}
 
 
+class Participants:
+    """
+    One analyzer per participant (participantId, else userId), so one worker
+    can serve several participants, as a worker_pool.py shard does. Each new
+    analyzer shares the first one's models, thread pools and CPU governor,
+    and is restored from the snapshot entry its first message names, if any.
+    An analyzer with no message for PARTICIPANT_IDLE seconds is dropped and
+    its audio thread stopped; STOP_PROCESSING drops them all.
+    """
+
+    def __init__(self, primary, snapshots=None):
+        self.primary   = primary
+        self.snapshots = snapshots
+        self.spare     = primary   # not yet claimed by a participant
+        self.by_key    = {}        # participant key -> analyzer
+        self.users     = {}        # participant key -> userId of its frames
+        self.waiting   = {}        # userId -> analyzer given a reference before its first frame
+        self.seen      = {}        # analyzer -> time.monotonic() of its last message
+        self.swept     = time.monotonic()
+
+    def _fresh(self, user, participant_id):
+        a, self.spare = self.spare, None
+        a = a if a is not None else self.primary.for_participant()
+        if self.snapshots is not None:
+            self.snapshots.claim(a, user, participant_id)
+        return a
+
+    def for_frame(self, data):
+        """The analyzer for a VIDEO_FRAME's data (or an AUDIO_PCM header)."""
+        user = data.get("userId")
+        key  = data.get("participantId") or user
+        a    = self.by_key.get(key)
+        if a is None:
+            a = self.waiting.pop(user, None)
+            if a is None and user is None and len(self.waiting) == 1 and not self.by_key:
+                a = self.waiting.popitem()[1]   # single-participant host: frames without userId
+            self.by_key[key] = a or self._fresh(user, data.get("participantId"))
+            a = self.by_key[key]
+        if user is not None:
+            self.users[key] = a.user_id = user
+        if data.get("participantId") is not None:
+            a.participant_id = data["participantId"]
+        self._touch(a)
+        return a
+
+    def for_reference(self, data):
+        """Analyzers a LOAD_REFERENCE_FACE applies to: its participant, else every one of its user's."""
+        key, user = data.get("participantId"), data.get("userId")
+        if key is not None:
+            return [self.for_frame(data)]
+        found = [self.by_key[k] for k, u in self.users.items() if u == user]
+        if not found:
+            a = self.waiting.get(user)
+            if a is None:
+                a = self.waiting[user] = self._fresh(user, None)
+                a.user_id = user
+            found = [a]
+        for a in found:
+            self._touch(a)
+        return found
+
+    def _touch(self, a):
+        now = time.monotonic()
+        self.seen[a] = now
+        if now - self.swept >= PARTICIPANT_SWEEP_EVERY:
+            self.swept = now
+            self.evict_idle(now)
+
+    def _drop(self, gone):
+        for key in [k for k, a in self.by_key.items() if a in gone]:
+            del self.by_key[key]
+            self.users.pop(key, None)
+        for user in [u for u, a in self.waiting.items() if a in gone]:
+            del self.waiting[user]
+        for a in gone:
+            self.seen.pop(a, None)
+            a.audio.close()
+
+    def evict_idle(self, now=None):
+        """Drop analyzers idle for PARTICIPANT_IDLE seconds; returns how many."""
+        now = time.monotonic() if now is None else now
+        gone = {a for a, t in self.seen.items() if now - t > PARTICIPANT_IDLE}
+        if gone:
+            self._drop(gone)
+            print(f"[PY] dropped {len(gone)} idle participant(s), {len(self)} left", file=sys.stderr)
+        return len(gone)
+
+    def reset(self):
+        """Session over: drop every participant; the startup analyzer is reused, fresh."""
+        self._drop(set(self.all()) | set(self.seen))
+        self.primary.audio.close()
+        self.primary._init_participant_state()
+        self.spare = self.primary
+
+    def all(self):
+        return list(self.by_key.values()) + list(self.waiting.values())
+
+    def __len__(self):
+        return len(self.by_key) + len(self.waiting)
+
+
 def main():
-    analyzer = ProctoringAnalyzer()
-    print(json.dumps({
+    primary = ProctoringAnalyzer()
+    snapshots = Snapshotter()
+    participants = Participants(primary, snapshots)
+    out = OutputChannel()
+    flow = FlowControl()
+    out.send({
         "status":    "READY",
-        "mode":      "yolo" if analyzer.yolo else "cv2",
+        "mode":      "yolo" if primary.yolo else "cv2",
+        "output":    out.mode,
+        "faceBackend": primary.face_dnn.name if primary.face_dnn else "haar",
+        "snapshot":  snapshots.load(),
+        "clock":     primary.clock.stats(),
+        "audio":     {"message": "AUDIO_PCM", "format": "s16le"},
+        "flow":      flow.ready(),
+        "cpu":       primary.governor.report(),
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-    }))
-    sys.stdout.flush()
-
-    for line in sys.stdin:
-        line = line.strip()
+    })
+    out.start_heartbeat()   # delta mode: HEARTBEAT even while no frames arrive
+    cpu_reported = time.monotonic()
+    recorder = CaptureRecorder.from_env()   # PROCTOR_CAPTURE: record stdin for replay_capture.py
+
+    # Binary stdin: JSON lines, except that an AUDIO_PCM header line is followed by its raw PCM bytes
+    stdin = sys.stdin.buffer
+    for raw in stdin:
+        line = raw.decode("utf-8", "replace").strip()
         if not line:
             continue
+        payload = b""
         try:
             data = json.loads(line)
             t    = data.get("type")
-
-            if t == "VIDEO_FRAME":
-                fd     = data.get("data", {})
-                result = analyzer.analyze_frame(fd)
+            if t == "AUDIO_PCM":
+                payload = stdin.read(int(data.get("bytes") or 0))
+            if recorder is not None:
+                recorder.record(line, payload)
+
+            if t == "AUDIO_PCM":
+                participants.for_frame(data).audio.submit(data, payload)
+
+            elif t == "VIDEO_FRAME":
+                fd  = data.get("data", {})
+                key = fd.get("participantId") or fd.get("userId")
+                age = flow.stale_ms_of(fd)
+                if age is not None:
+                    # Too old to act on: answer it without decoding
+                    flow.dropped(key)
+                    flow.reported(key)
+                    out.send({
+                        "status":         "FRAME_DROPPED",
+                        "reason":         "stale",
+                        "ageMs":          int(age),
+                        "frameTimestamp": fd.get("timestamp"),
+                        "userId":         fd.get("userId"),
+                        "participantId":  fd.get("participantId"),
+                        "flow":           flow.state(key),
+                        "timestamp":      time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    })
+                    continue
+                analyzer = participants.for_frame(fd)
+                started  = time.perf_counter()
+                result   = analyzer.analyze_frame(fd)
+                flow.analyzed(key, time.perf_counter() - started)
                 result.update({
                     "meetingId":     fd.get("meetingId"),
                     "userId":        fd.get("userId"),
                     "participantId": fd.get("participantId"),
+                    "flow":          flow.state(key),
                 })
-                print(json.dumps(result))
-                sys.stdout.flush()
+                if time.monotonic() - cpu_reported >= CPU_REPORT_EVERY:
+                    result["cpu"] = primary.governor.report()
+                    if analyzer.audio.streaming():
+                        result["audio"] = analyzer.audio.stats()
+                    if len(participants) > 1:
+                        result["participants"] = len(participants)
+                    cpu_reported  = time.monotonic()
+                if out.result(result):
+                    flow.reported(key)
+                elif flow.must_report(key):
+                    # Suppressed (delta output), but the host may be out of credits without it
+                    out.send({
+                        "status":        "CREDIT",
+                        "userId":        fd.get("userId"),
+                        "participantId": fd.get("participantId"),
+                        "flow":          flow.state(key),
+                    })
+                    flow.reported(key)
+                snapshots.maybe_save(participants.all())
 
             elif t == "LOAD_REFERENCE_FACE":
-                ok = analyzer.load_reference_face(data.get("imageUrl", ""), data.get("userId"))
-                print(json.dumps({
+                targets = participants.for_reference(data)
+                ok = all([a.load_reference_face(data.get("imageUrl", ""), data.get("userId")) for a in targets])
+                if ok:
+                    snapshots.maybe_save(participants.all(), force=True)
+                out.send({
                     "status":    "REFERENCE_FACE_LOADED",
                     "success":   ok,
                     "userId":    data.get("userId"),
+                    "participantId": data.get("participantId"),
                     "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                }))
-                sys.stdout.flush()
+                })
+
+            elif t == "SET_CPU_BUDGET":
+                primary.governor.set_budget(data.get("cores", primary.governor.budget), cv2, _split_threads,
+                                            primary.phone_pool is not None, data.get("pin"))
+                out.send({
+                    "status":    "CPU_BUDGET_SET",
+                    "cpu":       primary.governor.report(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                })
 
             elif t in ("START_PROCESSING", "STOP_PROCESSING"):
                 s = "PROCESSING_STARTED" if t == "START_PROCESSING" else "PROCESSING_STOPPED"
-                print(json.dumps({"status": s, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}))
-                sys.stdout.flush()
+                if t == "STOP_PROCESSING":
+                    snapshots.discard()
+                    participants.reset()
+                out.send({"status": s, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())})
 
         except json.JSONDecodeError as e:
+            if recorder is not None:
+                recorder.record(line)
             print(f"[PY] JSON error: {e}", file=sys.stderr)
         except Exception as e:
             print(f"[PY] error: {e}", file=sys.stderr)
 
+    out.close()
+    if recorder is not None:
+        recorder.close()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,236 @@
+"""
+Durable snapshots of the analyzer state, so a restarted worker resumes mid-exam.
+
+Every SNAPSHOT_EVERY seconds the worker copies the alert timers, cooldowns,
+streaks, smoothing histories and the reference face crops out of each
+participant's ProctoringAnalyzer (a few microseconds: the crops are replaced
+wholesale on a new reference, never mutated, so they are shared rather than
+copied) and a background thread writes them all to PROCTOR_STATE_FILE. The write goes to a
+temporary file that is fsynced and then renamed over the old snapshot, so a
+crash mid-write leaves the previous snapshot intact.
+
+File layout:
+
+    MAGIC | uint32 header length | JSON header | padding to ALIGN | raw arrays
+
+The header holds one entry per participant: its scalars and histories plus
+the offset and shape of every float32 array. On startup the file is memory-mapped and the crops are read straight
+out of the mapping as float32, with no decoding step. Entries older than
+SNAPSHOT_MAX_AGE are ignored, and the file is removed when proctoring stops
+normally, so only a crash or restart mid-exam resumes. An empty
+PROCTOR_STATE_FILE turns snapshots off.
+
+Detection outputs (frame gate, last detections) are not saved: the first
+frame after a restart always runs the full analysis.
+
+Each entry records its owner (userId and participantId). Entries are read
+at startup but held, not applied: a participant's analyzer is restored from
+the entry its first LOAD_REFERENCE_FACE or frame names, and never from
+another participant's, so a worker serving several participants (a
+worker_pool.py shard) hands each one back its own state whatever order they
+reconnect in, and the next student on the same machine never inherits the
+previous exam's reference face, streaks or timers. Unclaimed entries are
+written forward with their original save time until they expire.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+MAGIC            = b"PRSNAP02"
+ALIGN            = 64
+SNAPSHOT_EVERY   = 5.0     # seconds between snapshots
+SNAPSHOT_MAX_AGE = 600.0   # an older snapshot is from another session
+STATE_FILE = os.environ.get("PROCTOR_STATE_FILE", os.path.join(tempfile.gettempdir(), "proctoring_state.snap"))
+
+SCALARS = (
+    "ref_user_id", "identity_alerted_at", "identity_miss_streak", "identity_match_streak", "last_face_cx",
+    "no_face_start", "no_face_alerted_at", "multi_start", "multi_alerted_at",
+    "gaze_start", "gaze_alerted_at", "phone_consecutive", "phone_alerted_at",
+    "speech_start", "speech_alerted_at", "bad_feed_start", "bad_feed_alerted_at",
+)
+HISTORIES = ("face_history", "gaze_away_history", "audio_history")
+
+
+def capture(analyzer):
+    """Point-in-time copy of the analyzer state; cheap enough for the frame loop."""
+    return {
+        "savedAt":   time.time(),
+        "owner":     {"userId": analyzer.user_id or analyzer.ref_user_id, "participantId": analyzer.participant_id},
+        "scalars":   {name: getattr(analyzer, name) for name in SCALARS},
+        "histories": {name: list(getattr(analyzer, name)) for name in HISTORIES},
+        "refCrops":  list(analyzer.ref_crops) if analyzer.ref_crops is not None else None,
+    }
+
+
+def write_snapshot(path, states):
+    """Serialize the participants' `states` to `path` atomically; returns the bytes written."""
+    arrays, entries, offset = [], [], 0
+    for state in states:
+        meta = []
+        for crop in state["refCrops"] or ():
+            crop = np.ascontiguousarray(crop, dtype=np.float32)
+            meta.append({"offset": offset, "shape": list(crop.shape)})
+            arrays.append(crop)
+            offset += crop.nbytes
+        entries.append({
+            "savedAt":   state["savedAt"],
+            "owner":     state["owner"],
+            "scalars":   state["scalars"],
+            "histories": state["histories"],
+            "refCrops":  meta if state["refCrops"] is not None else None,
+        })
+    header = json.dumps({"participants": entries}, separators=(",", ":")).encode()
+    head = MAGIC + struct.pack("<I", len(header)) + header
+    head += b"\0" * (-len(head) % ALIGN)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(head)
+        for crop in arrays:
+            f.write(crop.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(head) + offset
+
+
+def read_snapshot(path, max_age=SNAPSHOT_MAX_AGE):
+    """The unexpired participant states in a snapshot file, or None when missing or corrupt."""
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(MAGIC)] != MAGIC:
+                return None
+            (n,) = struct.unpack_from("<I", mm, len(MAGIC))
+            start = len(MAGIC) + 4
+            header = json.loads(mm[start:start + n])
+            base = start + n + (-(start + n) % ALIGN)
+            states = []
+            for state in header["participants"]:
+                if time.time() - state["savedAt"] > max_age or not state["owner"]:
+                    continue
+                if state["refCrops"] is not None:
+                    crops = []
+                    for m in state["refCrops"]:
+                        count = int(np.prod(m["shape"]))
+                        view  = np.frombuffer(mm, np.float32, count, base + m["offset"])
+                        crops.append(view.reshape(m["shape"]).copy())   # copy: the mapping closes below
+                        del view
+                    state["refCrops"] = crops
+                states.append(state)
+            return states
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"[PY] snapshot unreadable, starting fresh: {e}", file=sys.stderr)
+        return None
+
+
+def same_owner(owner, user_id, participant_id):
+    """True when the ids a message carries name the snapshot's owner: one matches, none conflicts."""
+    pairs = [(owner.get("userId"), user_id), (owner.get("participantId"), participant_id)]
+    known = [(a, b) for a, b in pairs if a is not None and b is not None]
+    return bool(known) and all(a == b for a, b in known)
+
+
+def restore(analyzer, state):
+    for name, value in state["scalars"].items():
+        if name in SCALARS:
+            setattr(analyzer, name, value)
+    for name, values in state["histories"].items():
+        if name in HISTORIES:
+            old = getattr(analyzer, name)
+            setattr(analyzer, name, deque(values, maxlen=old.maxlen))
+    analyzer.ref_crops = state["refCrops"]
+
+
+class Snapshotter:
+    def __init__(self, path=None, every=SNAPSHOT_EVERY):
+        self.path    = STATE_FILE if path is None else path
+        self.every   = every
+        self.pool    = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot") if self.path else None
+        self.pending = None
+        self.held    = []      # participant states read at startup, each applied once its owner shows up
+        self.last    = time.monotonic()
+        self.saves   = 0
+        self.bytes   = 0
+        self.write_ms = None
+
+    def _write(self, state):
+        t0 = time.perf_counter()
+        try:
+            self.bytes = write_snapshot(self.path, state)
+            self.saves += 1
+        except OSError as e:
+            print(f"[PY] snapshot write failed: {e}", file=sys.stderr)
+        self.write_ms = (time.perf_counter() - t0) * 1e3
+
+    def maybe_save(self, analyzers, force=False):
+        """Queue a snapshot of every participant when one is due and the previous write has finished."""
+        if self.pool is None or (not force and time.monotonic() - self.last < self.every):
+            return
+        if self.pending is not None and not self.pending.done():
+            return
+        now = time.time()
+        self.held = [s for s in self.held if now - s["savedAt"] <= SNAPSHOT_MAX_AGE]
+        states = [capture(a) for a in analyzers if a.user_id or a.ref_user_id or a.participant_id]
+        if not states and not self.held:
+            return
+        self.last    = time.monotonic()
+        self.pending = self.pool.submit(self._write, states + self.held)
+
+    def load(self):
+        """Read the snapshot and hold its entries for claim(); returns a summary for READY, or None."""
+        if self.pool is None:
+            return None
+        t0 = time.perf_counter()
+        states = read_snapshot(self.path)
+        if not states:
+            return None
+        self.held = states
+        info = {
+            "participants": [{
+                "userId":        s["owner"].get("userId"),
+                "participantId": s["owner"].get("participantId"),
+                "ageSeconds":    round(time.time() - s["savedAt"], 1),
+                "referenceFace": s["refCrops"] is not None,
+            } for s in states],
+            "readMs":  round((time.perf_counter() - t0) * 1e3, 2),
+            "pending": True,
+        }
+        print(f"[PY] Snapshot {self.path} held until its owners show up: {info}", file=sys.stderr)
+        return info
+
+    def claim(self, analyzer, user_id, participant_id):
+        """
+        A participant's first message: restore the held entry it names into
+        its new `analyzer`. True when restored.
+        """
+        for i, state in enumerate(self.held):
+            if same_owner(state["owner"], user_id, participant_id):
+                del self.held[i]
+                restore(analyzer, state)
+                print(f"[PY] Resumed from snapshot for {state['owner']}", file=sys.stderr)
+                return True
+        return False
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def discard(self):
+        """Session ended normally: the next worker must start fresh."""
+        if self.pool is None:
+            return
+        if self.pending is not None:
+            self.pending.result()
+        self.held = []
+        self._remove()
@@ -0,0 +1,171 @@
+"""
+Capture of the worker's stdin protocol, for reproducing production runs.
+
+Set PROCTOR_CAPTURE to a path prefix and main() records every incoming line
+(VIDEO_FRAME, AUDIO_PCM, LOAD_REFERENCE_FACE, START/STOP, ...) with its arrival time to
+<prefix>.0001.prcap, <prefix>.0002.prcap, ... Each file is capped at
+PROCTOR_CAPTURE_MAX_MB; once PROCTOR_CAPTURE_FILES files exist, the oldest
+is deleted.
+
+The hot path only timestamps the raw line and hands it to a writer thread
+(a bounded queue; if the disk falls behind, lines are dropped and counted
+rather than stalling analysis). The writer strips the base64 image out of
+the JSON and stores the decoded JPEG bytes next to it, so a capture is about
+3/4 the size of the text it came from. An AUDIO_PCM header keeps its raw PCM
+payload in the same slot. Record layout after the MAGIC file header:
+
+    float64 arrival time | uint32 JSON length | uint32 blob length | JSON | image or PCM
+
+read_capture() rebuilds the original messages; replay_capture.py feeds them
+back to a worker.
+"""
+import base64
+import glob
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+MAGIC          = b"PRCAP01\n"
+RECORD         = struct.Struct("<dII")
+MAX_MB         = float(os.environ.get("PROCTOR_CAPTURE_MAX_MB", 256))
+MAX_FILES      = int(os.environ.get("PROCTOR_CAPTURE_FILES", 4))
+QUEUE_LINES    = 256     # ~10s of frames; beyond this the writer is hopelessly behind
+FLUSH_EVERY    = 1.0     # seconds
+
+# Where each message type carries its image: (nested object or None, field)
+IMAGE_FIELDS = {
+    "VIDEO_FRAME":         ("data", "imageData"),
+    "LOAD_REFERENCE_FACE": (None, "imageUrl"),
+}
+
+
+def _image_holder(msg):
+    where = IMAGE_FIELDS.get(msg.get("type"))
+    if where is None:
+        return None, None
+    obj = msg.get(where[0]) if where[0] else msg
+    return (obj, where[1]) if isinstance(obj, dict) and isinstance(obj.get(where[1]), str) else (None, None)
+
+
+def pack(t, line, payload=b""):
+    """One capture record for a raw stdin line (and the binary payload that followed it)."""
+    if payload:
+        text = line.encode()
+        return RECORD.pack(t, len(text), len(payload)) + text + payload
+    blob = b""
+    try:
+        msg = json.loads(line)
+        obj, field = _image_holder(msg)
+        if obj is not None and not obj[field].startswith(("http://", "https://")):
+            prefix, _, b64 = obj[field].rpartition(",")
+            blob = base64.b64decode(b64 + "=" * (-len(b64) % 4), validate=True)
+            obj[field] = prefix + "," if prefix else ""
+            line = json.dumps(msg, separators=(",", ":"))
+    except (ValueError, TypeError):
+        pass   # not JSON / not base64: stored verbatim, exactly as the worker saw it
+    text = line.encode()
+    return RECORD.pack(t, len(text), len(blob)) + text + blob
+
+
+def read_capture(path):
+    """Yield (arrival time, original line, binary payload or b"") from one capture file."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            t, n_text, n_blob = RECORD.unpack(head)
+            text = f.read(n_text).decode()
+            blob = f.read(n_blob)
+            if len(blob) < n_blob:
+                return   # truncated tail (worker killed mid-write)
+            if n_blob:
+                msg = json.loads(text)
+                obj, field = _image_holder(msg)
+                if obj is None:
+                    yield t, text, blob   # AUDIO_PCM: the payload goes back on the wire as is
+                    continue
+                obj[field] += base64.b64encode(blob).decode()
+                text = json.dumps(msg, separators=(",", ":"))
+            yield t, text, b""
+
+
+def capture_files(prefix_or_path):
+    """The files of a capture in order: an explicit file, or every <prefix>.NNNN.prcap."""
+    if os.path.isfile(prefix_or_path):
+        return [prefix_or_path]
+    return sorted(glob.glob(f"{glob.escape(prefix_or_path)}.[0-9][0-9][0-9][0-9].prcap"))
+
+
+class CaptureRecorder:
+    def __init__(self, prefix, max_mb=MAX_MB, max_files=MAX_FILES):
+        self.prefix    = prefix
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_files = max(1, max_files)
+        self.queue     = queue.Queue(maxsize=QUEUE_LINES)
+        self.recorded  = 0
+        self.dropped   = 0
+        self.bytes     = 0
+        existing = capture_files(prefix)
+        self.seq  = int(existing[-1].rsplit(".", 2)[-2]) if existing else 0
+        self.file = None
+        self.size = 0
+        self._open_next()
+        self.thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def from_env(cls):
+        prefix = os.environ.get("PROCTOR_CAPTURE")
+        return cls(prefix) if prefix else None
+
+    def record(self, line, payload=b""):
+        """Hot path: timestamp and enqueue; never blocks."""
+        try:
+            self.queue.put_nowait((time.time(), line, payload))
+        except queue.Full:
+            self.dropped += 1
+
+    def _open_next(self):
+        if self.file is not None:
+            self.file.close()
+        self.seq += 1
+        self.file = open(f"{self.prefix}.{self.seq:04d}.prcap", "wb")
+        self.file.write(MAGIC)
+        self.size = len(MAGIC)
+        for old in capture_files(self.prefix)[:-self.max_files]:
+            os.remove(old)
+
+    def _run(self):
+        flushed = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=FLUSH_EVERY)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                rec = pack(*item)
+                if self.size + len(rec) > self.max_bytes and self.size > len(MAGIC):
+                    self._open_next()
+                self.file.write(rec)
+                self.size     += len(rec)
+                self.bytes    += len(rec)
+                self.recorded += 1
+            if time.monotonic() - flushed >= FLUSH_EVERY:
+                self.file.flush()
+                flushed = time.monotonic()
+        self.file.close()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        print(f"[PY] capture {self.prefix}: {self.recorded} messages, {self.bytes} bytes, "
+              f"{self.dropped} dropped", file=sys.stderr)
@@ -0,0 +1,39 @@
+from flow_control import FlowControl
+
+
+def test_answered_counts_analyzed_and_dropped_frames():
+    flow = FlowControl(credits=2, stale_ms=3000)
+    flow.analyzed("a", 0.1)
+    flow.dropped("a")
+    assert flow.state("a")["answered"] == 2 and flow.state("a")["dropped"] == 1
+    assert flow.state("b")["answered"] == 0
+
+
+def test_credit_line_is_due_once_credits_answers_go_unreported():
+    flow = FlowControl(credits=2, stale_ms=3000)
+    flow.analyzed("a", 0.1)
+    assert not flow.must_report("a")
+    flow.analyzed("a", 0.1)
+    assert flow.must_report("a")
+    flow.reported("a")
+    assert not flow.must_report("a")
+    flow.analyzed("b", 0.1)
+    assert not flow.must_report("b")
+
+
+def test_stale_frames_and_the_off_switch():
+    flow = FlowControl(credits=2, stale_ms=3000)
+    assert flow.stale_ms_of({"timestamp": 1000.0 * 1000 - 5000}, now=1000.0) == 5000.0
+    assert flow.stale_ms_of({"timestamp": 1000.0 * 1000 - 1000}, now=1000.0) is None
+    assert flow.stale_ms_of({}, now=1000.0) is None
+    assert FlowControl(stale_ms=0).stale_ms_of({"timestamp": 0}, now=1000.0) is None
+
+
+def test_rate_is_shared_between_streams():
+    flow = FlowControl(credits=2, stale_ms=3000)
+    assert flow.rate() is None
+    flow.analyzed("a", 0.1)
+    assert flow.rate() == 10.0
+    flow.analyzed("b", 0.1)
+    assert flow.rate() == 5.0
+    assert flow.ready() == {"credits": 2, "staleMs": 3000, "epoch": flow.epoch}
@@ -0,0 +1,78 @@
+import io
+import json
+import time
+
+from output_channel import OutputChannel
+
+
+def lines(buf):
+    return [json.loads(l) for l in buf.getvalue().splitlines()]
+
+
+def test_heartbeat_goes_out_without_frames():
+    buf = io.BytesIO()
+    out = OutputChannel("delta", buf, heartbeat=0.05)
+    out.start_heartbeat()
+    try:
+        time.sleep(0.3)
+    finally:
+        out.close()
+    beats = [l for l in lines(buf) if l.get("status") == "HEARTBEAT"]
+    assert len(beats) >= 2
+    assert beats[-1]["frames"] == 0
+
+
+def test_beat_is_due_once_per_interval():
+    buf = io.BytesIO()
+    out = OutputChannel("delta", buf, heartbeat=5.0)
+    assert not out.beat(100.0)
+    assert not out.beat(104.0)
+    assert out.beat(105.0)
+    assert not out.beat(106.0)
+    assert OutputChannel("full", io.BytesIO()).beat(1e9) is False
+
+
+def frame(pid="p1", **fields):
+    return {"participantId": pid, "faceDetected": True, "faceCount": 1, "alerts": [], **fields}
+
+
+def test_full_mode_writes_every_result():
+    buf = io.BytesIO()
+    out = OutputChannel("full", buf)
+    for _ in range(3):
+        assert out.result(frame(), now=0.0)
+    assert len(lines(buf)) == 3
+
+
+def test_delta_mode_suppresses_unchanged_results_per_participant():
+    buf = io.BytesIO()
+    out = OutputChannel("delta", buf)
+    assert out.result(frame("p1"), now=0.0)
+    assert not out.result(frame("p1"), now=0.1)
+    assert out.result(frame("p2"), now=0.2)
+    assert out.result(frame("p1", faceDetected=False, faceCount=0), now=0.3)
+    assert out.result(frame("p1", faceDetected=False, faceCount=0, frameQuality={"issue": "dark"}), now=0.4)
+    assert (out.emitted, out.suppressed) == (4, 1)
+
+
+def test_alerts_and_positive_phone_results_always_pass():
+    buf = io.BytesIO()
+    out = OutputChannel("delta", buf)
+    out.result(frame(), now=0.0)
+    alert = frame(alerts=[{"alertType": "GAZE_AWAY"}])
+    assert out.result(alert, now=0.1)
+    assert out.result(frame(phoneResults=[{"detected": True}]), now=0.2)
+    assert not out.result(frame(phoneResults=[{"detected": False}]), now=0.3)
+    assert out.result(frame(cpu={"budget": 1}), now=0.4)
+    assert lines(buf)[1] == alert
+
+
+def test_heartbeat_carries_the_counters():
+    buf = io.BytesIO()
+    out = OutputChannel("delta", buf, heartbeat=5.0)
+    out.result(frame(), now=0.0)
+    out.result(frame(), now=1.0)
+    out.result(frame(), now=6.0)
+    beat = lines(buf)[-1]
+    assert beat["status"] == "HEARTBEAT"
+    assert (beat["frames"], beat["emitted"], beat["suppressed"]) == (3, 1, 2)
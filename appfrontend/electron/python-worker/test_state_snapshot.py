@@ -0,0 +1,84 @@
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+
+import state_snapshot
+from state_snapshot import HISTORIES, SCALARS, Snapshotter, capture, read_snapshot, same_owner, write_snapshot
+
+
+def analyzer(user_id=None, participant_id=None, seed=0):
+    a = SimpleNamespace(user_id=user_id, participant_id=participant_id, ref_user_id=None, ref_crops=None)
+    for name in SCALARS:
+        setattr(a, name, None)
+    for name in HISTORIES:
+        setattr(a, name, deque(maxlen=10))
+    if seed:
+        a.ref_user_id = user_id
+        a.no_face_alerted_at = 1000.0 + seed
+        a.phone_consecutive = seed
+        a.face_history.extend([True, False] * seed)
+        a.ref_crops = [np.full((4, 3), seed, np.float32), np.arange(6, dtype=np.float32).reshape(2, 3) * seed]
+    return a
+
+
+def fields(a):
+    return ({n: getattr(a, n) for n in SCALARS}, {n: list(getattr(a, n)) for n in HISTORIES},
+            [c.tolist() for c in a.ref_crops or ()])
+
+
+def test_round_trip_restores_each_owner_its_own_state(tmp_path):
+    path = str(tmp_path / "state.snap")
+    saved = {("u1", "p1"): analyzer("u1", "p1", seed=1), ("u2", "p2"): analyzer("u2", "p2", seed=2)}
+    write_snapshot(path, [capture(a) for a in saved.values()])
+
+    snaps = Snapshotter(path)
+    info = snaps.load()
+    assert {p["participantId"] for p in info["participants"]} == {"p1", "p2"}
+    for owner in (("u2", "p2"), ("u1", "p1")):      # reconnect order does not matter
+        fresh = analyzer(*owner)
+        assert snaps.claim(fresh, *owner)
+        assert fields(fresh) == fields(saved[owner])
+    assert snaps.claim(analyzer("u1", "p1"), "u1", "p1") is False   # each entry is applied once
+
+
+def test_a_stranger_never_claims_an_entry(tmp_path):
+    path = str(tmp_path / "state.snap")
+    write_snapshot(path, [capture(analyzer("u1", "p1", seed=1))])
+    snaps = Snapshotter(path)
+    snaps.load()
+    stranger = analyzer("u9", "p1")
+    assert not snaps.claim(stranger, "u9", "p1")
+    assert stranger.ref_crops is None and stranger.phone_consecutive is None
+
+
+def test_same_owner_matching():
+    owner = {"userId": "u1", "participantId": "p1"}
+    assert same_owner(owner, "u1", None)
+    assert same_owner(owner, None, "p1")
+    assert same_owner(owner, "u1", "p1")
+    assert not same_owner(owner, "u1", "p2")
+    assert not same_owner(owner, None, None)
+
+
+def test_expired_and_corrupt_snapshots_are_ignored(tmp_path):
+    path = str(tmp_path / "state.snap")
+    state = capture(analyzer("u1", "p1", seed=1))
+    state["savedAt"] = time.time() - state_snapshot.SNAPSHOT_MAX_AGE - 1
+    write_snapshot(path, [state])
+    assert read_snapshot(path) == []
+    with open(path, "r+b") as f:
+        f.write(b"garbage!")
+    assert read_snapshot(path) is None
+    assert read_snapshot(str(tmp_path / "missing.snap")) is None
+
+
+def test_discard_removes_the_file(tmp_path):
+    path = tmp_path / "state.snap"
+    snaps = Snapshotter(str(path))
+    snaps.maybe_save([analyzer("u1", "p1", seed=1)], force=True)
+    snaps.pending.result()
+    assert path.exists()
+    snaps.discard()
+    assert not path.exists()
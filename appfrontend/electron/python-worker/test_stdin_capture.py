@@ -0,0 +1,66 @@
+import base64
+import json
+import struct
+
+import pytest
+
+import stdin_capture
+from stdin_capture import MAGIC, CaptureRecorder, capture_files, pack, read_capture
+
+JPEG = bytes(range(256)) * 4
+
+
+def frame_line(pid="p1"):
+    image = "data:image/jpeg;base64," + base64.b64encode(JPEG).decode()
+    return json.dumps({"type": "VIDEO_FRAME", "data": {"imageData": image, "participantId": pid}},
+                      separators=(",", ":"))
+
+
+def write(path, records):
+    path.write_bytes(MAGIC + b"".join(records))
+    return str(path)
+
+
+def test_pack_read_round_trip(tmp_path):
+    frame = frame_line()
+    ref   = json.dumps({"type": "LOAD_REFERENCE_FACE", "imageUrl": "https://example.com/a.jpg"})
+    pcm   = (json.dumps({"type": "AUDIO_PCM", "bytes": 6}), b"\x01\x00\x02\x00\x03\x00")
+    path = write(tmp_path / "c.prcap", [pack(1.0, frame), pack(2.0, ref), pack(3.0, *pcm), pack(4.0, "not json")])
+    got = list(read_capture(path))
+    assert [t for t, _, _ in got] == [1.0, 2.0, 3.0, 4.0]
+    assert json.loads(got[0][1]) == json.loads(frame) and got[0][2] == b""
+    assert got[1][1] == ref
+    assert got[2][1:] == pcm
+    assert got[3][1] == "not json"
+
+
+def test_image_is_stored_as_raw_bytes():
+    rec = pack(1.0, frame_line())
+    _, _, n_blob = stdin_capture.RECORD.unpack_from(rec)
+    assert n_blob == len(JPEG) and rec.endswith(JPEG)
+    assert len(rec) < len(frame_line())
+
+
+def test_truncated_tail_is_ignored(tmp_path):
+    rec = pack(1.0, frame_line())
+    path = write(tmp_path / "c.prcap", [rec, rec[:-10]])
+    assert len(list(read_capture(path))) == 1
+
+
+def test_recorder_rotates_and_keeps_the_newest_files(tmp_path):
+    prefix = str(tmp_path / "cap")
+    rec = CaptureRecorder(prefix, max_mb=2000 / (1024 * 1024), max_files=2)
+    for i in range(8):
+        rec.record(frame_line(f"p{i}"))
+    rec.close()
+    files = capture_files(prefix)
+    assert len(files) == 2 and files[-1].endswith(".0008.prcap")
+    pids = [json.loads(line)["data"]["participantId"] for f in files for _, line, _ in read_capture(f)]
+    assert pids == ["p6", "p7"]
+
+
+def test_not_a_capture_file(tmp_path):
+    path = tmp_path / "x.prcap"
+    path.write_bytes(struct.pack("<d", 1.0))
+    with pytest.raises(ValueError):
+        list(read_capture(str(path)))
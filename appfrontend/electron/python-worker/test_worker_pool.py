@@ -0,0 +1,55 @@
+import subprocess
+import time
+
+import worker_pool
+from worker_pool import HashRing, WorkerPool
+
+
+KEYS = [f"participant-{i}" for i in range(2000)]
+
+
+def test_ring_is_deterministic_and_balanced():
+    a, b = HashRing(4), HashRing(4)
+    slots = [a.slot(k) for k in KEYS]
+    assert slots == [b.slot(k) for k in KEYS]
+    assert [a.slot(k) for k in KEYS] == slots          # cached answers agree
+    counts = [slots.count(s) for s in range(4)]
+    assert min(counts) > len(KEYS) / 4 * 0.6
+
+
+def test_adding_a_shard_only_moves_keys_onto_it():
+    before, after = HashRing(4), HashRing(5)
+    moved = [k for k in KEYS if before.slot(k) != after.slot(k)]
+    assert all(after.slot(k) == 4 for k in moved)
+    assert len(moved) < len(KEYS) / 5 * 1.5
+
+
+def test_failed_respawn_is_retried_with_backoff(tmp_path, monkeypatch):
+    script = tmp_path / "worker.py"
+    script.write_text("import sys\nprint('{\"status\": \"READY\"}', flush=True)\nsys.stdin.read()\n")
+    monkeypatch.setattr(worker_pool, "RESTART_BACKOFF", (0.05, 0.2))
+    monkeypatch.setenv("PROCTOR_STATE_FILE", "")
+    pool = WorkerPool(1, worker=str(script), budget=1.0)
+    shard = pool.shards[0]
+    shard.started = time.monotonic()
+
+    real, failures = subprocess.Popen, []
+
+    def flaky(*args, **kwargs):
+        if len(failures) < 2:
+            failures.append(1)
+            raise OSError("no processes left")
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(worker_pool.subprocess, "Popen", flaky)
+    pool.restart(shard, "exited with code -9")
+    deadline = time.monotonic() + 5
+    while (shard.proc is None or not shard.ready.is_set()) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    try:
+        assert shard.proc is not None and shard.proc.poll() is None
+        assert shard.restarts == 3 and len(failures) == 2
+        assert shard.backoff > worker_pool.RESTART_BACKOFF[0]
+    finally:
+        pool.closing = True
+        shard.proc.kill()
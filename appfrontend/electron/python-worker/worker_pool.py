@@ -0,0 +1,392 @@
+"""
+Participant-sharded pool of proctoring workers behind one stdin/stdout.
+
+    python worker_pool.py --workers 4      # or PROCTOR_POOL_WORKERS=4
+
+Speaks exactly the protocol of simple_proctoring_worker.py, so the host
+spawns it in the worker's place. It starts N worker processes (each loads
+its models before the pool reports READY) and routes every message by
+participant:
+
+  VIDEO_FRAME, AUDIO_PCM   consistent hash of participantId (else userId)
+                           onto a ring of VNODES points per shard; a
+                           participant always lands on the same shard, so
+                           its timers, histories and identity stay in one
+                           process and its results come back in order
+  LOAD_REFERENCE_FACE      the shard(s) holding that participant or user; if
+                           none has seen it yet, held back and delivered just
+                           before the user's first frame on its shard
+  START/STOP_PROCESSING,   every shard (SET_CPU_BUDGET split evenly); the host
+  SET_CPU_BUDGET           gets one reply
+
+Each shard has a writer thread with a bounded queue: when a shard falls
+behind, its video and audio messages are dropped and counted, so one busy
+participant never stalls the others (PROCTOR_POOL_DROP=0 blocks instead, for
+replays). A video frame lost here or to a crashed shard is answered with a
+FRAME_DROPPED notice ("source": "pool", no "flow"), which the host counts
+against that participant's in-flight frames (flow_control.py). Shard stdout lines are copied whole to
+the pool's stdout under one lock. A crashed shard is restarted with backoff
+on the same slot, so routing is unchanged; it is sent START_PROCESSING and
+every reference face it held again, and each of its participants resumes from
+its own entry in the shard's snapshot
+(PROCTOR_STATE_FILE.shard<k>). Frames for it are dropped meanwhile.
+
+The CPU budget (PROCTOR_CPU_BUDGET, default half the cores) is divided
+between the shards; with PROCTOR_CPU_PIN=1 each shard is pinned to its own
+slice of cores. PROCTOR_CAPTURE records the pool's stdin, not the shards'.
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import math
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from cpu_governor import budget_from_env
+from output_channel import encode
+from state_snapshot import STATE_FILE
+from stdin_capture import CaptureRecorder
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+WORKER          = os.path.join(SCRIPT_DIR, "simple_proctoring_worker.py")
+VNODES          = 64        # ring points per shard
+QUEUE_MESSAGES  = 16        # per shard: ~15s of one participant's frames at 1 fps
+READY_TIMEOUT   = 180.0     # model loading on a cold disk
+RESTART_BACKOFF = (1.0, 30.0)
+STABLE_AFTER    = 60.0      # a shard that ran this long restarts with the shortest backoff
+DROP_BEHIND     = os.environ.get("PROCTOR_POOL_DROP", "1") != "0"   # 0: block instead (replay, offline)
+BROADCAST       = ("START_PROCESSING", "STOP_PROCESSING", "SET_CPU_BUDGET")
+
+
+def _now_iso():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, slots, vnodes=VNODES):
+        points     = sorted((_hash(f"shard-{s}-{v}"), s) for s in range(slots) for v in range(vnodes))
+        self.keys  = [p for p, _ in points]
+        self.slots = [s for _, s in points]
+        self.cache = {}     # participant key -> slot
+
+    def slot(self, key):
+        s = self.cache.get(key)
+        if s is None:
+            i = bisect.bisect(self.keys, _hash(str(key))) % len(self.keys)
+            s = self.cache[key] = self.slots[i]
+        return s
+
+
+class Shard:
+    def __init__(self, pool, slot):
+        self.pool     = pool
+        self.slot     = slot
+        self.proc     = None
+        self.ready    = threading.Event()
+        self.queue    = queue.Queue(maxsize=QUEUE_MESSAGES)
+        self.refs     = set()     # userIds whose reference face this shard has been sent
+        self.swallow  = {}        # status -> replies still to drop (broadcasts, replays)
+        self.lock     = threading.Lock()
+        self.started  = None
+        self.backoff  = RESTART_BACKOFF[0]
+        self.restarts = 0
+        self.sent     = 0
+        self.dropped  = 0
+        self.info     = {}        # the shard's READY message
+        threading.Thread(target=self._write, name=f"shard{slot}-in", daemon=True).start()
+
+    def start(self):
+        env = dict(os.environ, PROCTOR_CPU_BUDGET=str(self.pool.shard_budget), PROCTOR_CPU_PIN="0")
+        env.pop("PROCTOR_CAPTURE", None)
+        if self.pool.state_file:
+            env["PROCTOR_STATE_FILE"] = f"{self.pool.state_file}.shard{self.slot}"
+        self.ready.clear()
+        with self.lock:
+            self.swallow = {}     # owed by the previous process, if any
+        self.proc    = subprocess.Popen([sys.executable, self.pool.worker], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, env=env, cwd=SCRIPT_DIR)
+        self.started = time.monotonic()
+        cores = self.pool.pinned_cores(self.slot)
+        if cores:
+            try:
+                os.sched_setaffinity(self.proc.pid, cores)
+            except OSError as e:
+                print(f"[PY] pool: shard {self.slot} not pinned: {e}", file=sys.stderr)
+        threading.Thread(target=self._read, args=(self.proc,), name=f"shard{self.slot}-out", daemon=True).start()
+
+    def send(self, data, droppable=False, notice=None):
+        """Queue `data` for the shard; `notice` is sent to the host instead if a video frame is lost."""
+        if droppable and DROP_BEHIND:
+            try:
+                self.queue.put_nowait((data, notice))
+            except queue.Full:
+                self._lost(notice, "behind")
+                return False
+        else:
+            self.queue.put((data, notice))
+        return True
+
+    def _lost(self, notice, reason):
+        self.dropped += 1
+        if notice is not None:
+            # Answers the frame for the host's credit count (flow_control.py)
+            self.pool.emit(encode(dict(notice, reason=reason, timestamp=_now_iso())))
+
+    def expect(self, status, n=1):
+        """Drop the next `n` `status` replies from this shard."""
+        with self.lock:
+            self.swallow[status] = self.swallow.get(status, 0) + n
+
+    def _write(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            data, notice = item
+            proc = self.proc
+            if proc is None or proc.poll() is not None:
+                self._lost(notice, "restarting")
+                continue
+            try:
+                proc.stdin.write(data)
+                proc.stdin.flush()
+                self.sent += 1
+            except (OSError, ValueError):
+                self._lost(notice, "restarting")
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+
+    def _read(self, proc):
+        for line in proc.stdout:
+            if b'"status"' in line and b'"alerts"' not in line:
+                try:
+                    status = _loads(line).get("status")
+                except ValueError:
+                    status = None
+                if status == "READY":
+                    self.info = _loads(line)
+                    if self.restarts:
+                        print(f"[PY] pool: shard {self.slot} ready again", file=sys.stderr)
+                    self.ready.set()
+                    continue
+                with self.lock:
+                    if self.swallow.get(status):
+                        self.swallow[status] -= 1
+                        continue
+            self.pool.emit(line)
+        code = proc.wait()
+        self.ready.set()    # never leave the pool waiting on a dead shard
+        if proc is self.proc and not self.pool.closing:
+            self.pool.restart(self, f"exited with code {code}")
+
+    def restart_delay(self):
+        if time.monotonic() - self.started > STABLE_AFTER:
+            self.backoff = RESTART_BACKOFF[0]
+        delay, self.backoff = self.backoff, min(self.backoff * 2, RESTART_BACKOFF[1])
+        return delay
+
+    def stats(self):
+        return {"slot": self.slot, "pid": self.proc.pid if self.proc else None, "sent": self.sent,
+                "dropped": self.dropped, "restarts": self.restarts}
+
+
+class WorkerPool:
+    def __init__(self, workers, worker=WORKER, budget=None):
+        self.worker       = worker
+        self.budget       = budget or budget_from_env()
+        self.shard_budget = round(max(0.5, self.budget / workers), 2)
+        self.pin          = os.environ.get("PROCTOR_CPU_PIN") == "1" and hasattr(os, "sched_setaffinity")
+        self.state_file   = os.environ.get("PROCTOR_STATE_FILE", STATE_FILE)
+        self.ring         = HashRing(workers)
+        self.shards       = [Shard(self, k) for k in range(workers)]
+        self.out          = sys.stdout.buffer
+        self.out_lock     = threading.Lock()
+        self.references   = {}      # userId -> LOAD_REFERENCE_FACE line (bytes)
+        self.user_slots   = {}      # userId -> slots its frames went to
+        self.held         = set()   # userIds whose held-back reference still owes the host a reply
+        self.processing   = False
+        self.closing      = False
+
+    def pinned_cores(self, slot):
+        if not self.pin:
+            return None
+        avail = sorted(os.sched_getaffinity(0))
+        per   = max(1, math.ceil(self.shard_budget))
+        want  = avail[-per * len(self.shards):]     # highest cores, as the governor does
+        start = (slot * per) % len(want)
+        return want[start:start + per] or want
+
+    def emit(self, line):
+        with self.out_lock:
+            self.out.write(line)
+            self.out.flush()
+
+    def start(self):
+        for shard in self.shards:
+            shard.start()
+        deadline = time.monotonic() + READY_TIMEOUT
+        for shard in self.shards:
+            shard.ready.wait(max(0.0, deadline - time.monotonic()))
+        first = next((s.info for s in self.shards if s.info), {})
+        # No flow epoch: each shard has its own, which the host adopts per participant from its first
+        # result; shard 0's here would make every other shard's results look like a restart
+        self.emit(encode(dict(first,
+            status="READY",
+            snapshot=[s.info.get("snapshot") for s in self.shards],
+            flow=dict(first.get("flow") or {}, epoch=None),
+            cpu={"budget": self.budget, "shards": [s.info.get("cpu") for s in self.shards]},
+            pool={"workers": len(self.shards), "ready": sum(bool(s.info) for s in self.shards)},
+            timestamp=_now_iso(),
+        )))
+
+    def restart(self, shard, why):
+        delay = shard.restart_delay()
+        print(f"[PY] pool: shard {shard.slot} {why}; restarting in {delay:.0f}s", file=sys.stderr)
+
+        def again():
+            if self.closing:
+                return
+            shard.restarts += 1
+            try:
+                shard.start()
+            except (OSError, ValueError, subprocess.SubprocessError) as e:
+                # Try again later, backing off further: a failed spawn is not a stable run
+                shard.started = time.monotonic()
+                self.restart(shard, f"failed to start ({e})")
+                return
+            if self.processing:
+                shard.expect("PROCESSING_STARTED")
+                shard.send(b'{"type":"START_PROCESSING"}\n')
+            for user in sorted(shard.refs, key=str):
+                shard.expect("REFERENCE_FACE_LOADED")
+                shard.send(self.references[user])
+
+        threading.Timer(delay, again).start()
+
+    def _give_reference(self, shard, user):
+        """Send `user`'s reference to `shard` ahead of its frames, unless it already has it."""
+        if user in self.references and user not in shard.refs:
+            shard.refs.add(user)
+            if user in self.held:
+                self.held.discard(user)
+            else:
+                shard.expect("REFERENCE_FACE_LOADED")
+            shard.send(self.references[user])
+
+    def route(self, data, raw):
+        t = data.get("type")
+        if t == "VIDEO_FRAME":
+            fd    = data.get("data") or {}
+            user  = fd.get("userId")
+            shard = self.shards[self.ring.slot(fd.get("participantId") or user)]
+            self.user_slots.setdefault(user, set()).add(shard.slot)
+            self._give_reference(shard, user)
+            shard.send(raw, droppable=True, notice={
+                "status": "FRAME_DROPPED", "source": "pool", "frameTimestamp": fd.get("timestamp"),
+                "userId": user, "participantId": fd.get("participantId")})
+
+        elif t == "AUDIO_PCM":
+            self.shards[self.ring.slot(data.get("participantId"))].send(raw, droppable=True)
+
+        elif t == "LOAD_REFERENCE_FACE":
+            user = data.get("userId")
+            self.references[user] = raw
+            for shard in self.shards:
+                shard.refs.discard(user)
+            if data.get("participantId") is not None:
+                slots = [self.ring.slot(data["participantId"])]
+            else:
+                slots = sorted(self.user_slots.get(user, ())) or ([0] if len(self.shards) == 1 else [])
+            if not slots:
+                self.held.add(user)
+            for i, slot in enumerate(slots):
+                shard = self.shards[slot]
+                shard.refs.add(user)
+                if i:
+                    shard.expect("REFERENCE_FACE_LOADED")
+                shard.send(raw)
+
+        elif t in BROADCAST:
+            if t != "SET_CPU_BUDGET":
+                self.processing = t == "START_PROCESSING"
+            elif "cores" in data:
+                self.budget = float(data["cores"])
+                self.shard_budget = round(max(0.5, self.budget / len(self.shards)), 2)
+                raw = encode(dict(data, cores=self.shard_budget))
+            live = [s for s in self.shards if s.proc is not None and s.proc.poll() is None]
+            reply = {"START_PROCESSING": "PROCESSING_STARTED", "STOP_PROCESSING": "PROCESSING_STOPPED",
+                     "SET_CPU_BUDGET": "CPU_BUDGET_SET"}[t]
+            for shard in live[1:]:
+                shard.expect(reply)
+            for shard in live:
+                shard.send(raw)
+
+        else:
+            key = data.get("participantId") or data.get("userId")
+            self.shards[self.ring.slot(key) if key is not None else 0].send(raw)
+
+    def run(self):
+        self.start()
+        recorder = CaptureRecorder.from_env()
+        stdin = sys.stdin.buffer
+        for raw in stdin:
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                data = _loads(line)
+            except ValueError as e:
+                print(f"[PY] pool: JSON error: {e}", file=sys.stderr)
+                continue
+            try:
+                payload = b""
+                if data.get("type") == "AUDIO_PCM":
+                    payload = stdin.read(int(data.get("bytes") or 0))
+                if recorder is not None:
+                    recorder.record(line.decode("utf-8", "replace"), payload)
+                self.route(data, line + b"\n" + payload)
+            except Exception as e:
+                print(f"[PY] pool: error: {e}", file=sys.stderr)
+        self.closing = True
+        if recorder is not None:
+            recorder.close()
+        for shard in self.shards:
+            shard.queue.put(None)
+        for shard in self.shards:
+            if shard.proc is not None:
+                shard.proc.wait()
+        print(f"[PY] pool: {json.dumps([s.stats() for s in self.shards])}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None, help="shards (default PROCTOR_POOL_WORKERS, "
+                        "else one per core of the CPU budget)")
+    parser.add_argument("--worker", default=WORKER, help="worker script each shard runs")
+    args = parser.parse_args()
+    workers = args.workers or int(os.environ.get("PROCTOR_POOL_WORKERS") or 0) or max(1, int(budget_from_env()))
+    WorkerPool(workers, args.worker).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Admission control and load shedding for /analyze-frame.
+
+Two cheap checks run before a frame is decoded:
+
+  stale     the frame's client timestamp is older than STALE_BUDGET. Browser
+            and server clocks may disagree, so age is measured against the
+            smallest (server_now - client_ts) offset seen recently for that
+            participant rather than against absolute time. A participant's
+            first frame has no baseline yet, so it is held to an absolute
+            cap instead: up to CLOCK_SKEW of its offset counts as clock
+            disagreement, the rest as age.
+  overload  too much work is already in flight, or this participant already
+            holds its fair share of the in-flight slots.
+
+Shed frames are answered with 429 and a retry hint; counts appear on /health.
+"""
+import os
+import threading
+import time
+
+MAX_IN_FLIGHT  = max(2, (os.cpu_count() or 2) * 2)
+STALE_BUDGET   = 2.0     # seconds a frame may age before its analysis starts
+OFFSET_DRIFT   = 0.01    # baseline offset may creep up this many s/s (clock drift, route changes)
+CLOCK_SKEW     = 30.0    # client/server clock disagreement tolerated before a baseline exists
+ACTIVE_WINDOW  = 10.0    # participants seen this recently share the in-flight slots
+RETRY_AFTER    = 0.5     # base retry hint in seconds
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, stale_budget=STALE_BUDGET):
+        self.max_in_flight = max_in_flight
+        self.stale_budget  = stale_budget
+        self.in_flight     = 0
+        self._per_pid      = {}     # pid -> in-flight count
+        self._baseline     = {}     # pid -> (offset, at)
+        self._last_seen    = {}     # pid -> server time
+        self._lock         = threading.Lock()
+        self.admitted = 0
+        self.shed     = {"stale": 0, "overload": 0, "participant_busy": 0, "sampled": 0}
+
+    def age(self, pid, client_ts_ms, now, update=True):
+        """
+        Seconds this frame has aged relative to the participant's best observed
+        offset. update=False only reads the baseline (re-checks of a frame
+        that was already admitted).
+        """
+        if not client_ts_ms:
+            return 0.0
+        offset = now - client_ts_ms / 1000.0
+        base = self._baseline.get(pid)
+        if base is None:
+            if update:
+                self._baseline[pid] = (offset, now)
+            return max(0.0, offset - CLOCK_SKEW)
+        b_off, b_at = base
+        b_off += OFFSET_DRIFT * (now - b_at)
+        if offset >= b_off:
+            if update:
+                self._baseline[pid] = (b_off, now)
+            return offset - b_off
+        if update:
+            self._baseline[pid] = (offset, now)
+        return 0.0
+
+    def try_admit(self, pid, client_ts_ms, now=None):
+        """Return (None, 0) if admitted, else (reason, retry_after_seconds)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._last_seen[pid] = now
+            if self.age(pid, client_ts_ms, now) > self.stale_budget:
+                self.shed["stale"] += 1
+                return "stale", 0.0
+            if self.in_flight >= self.max_in_flight:
+                self.shed["overload"] += 1
+                return "overload", RETRY_AFTER * (1 + self.in_flight / self.max_in_flight)
+            active = sum(1 for t in self._last_seen.values() if now - t < ACTIVE_WINDOW)
+            share  = max(1, self.max_in_flight // max(1, active))
+            if self._per_pid.get(pid, 0) >= share:
+                self.shed["participant_busy"] += 1
+                return "participant_busy", RETRY_AFTER
+            self.in_flight += 1
+            self._per_pid[pid] = self._per_pid.get(pid, 0) + 1
+            self.admitted += 1
+            if self.admitted % 256 == 0:
+                self._forget_idle(now)
+            return None, 0.0
+
+    def is_stale(self, pid, client_ts_ms, now=None):
+        """Re-check right before analysis starts (the frame may have waited for a thread); read-only."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.age(pid, client_ts_ms, now, update=False) > self.stale_budget:
+                self.shed["stale"] += 1
+                return True
+            return False
+
+    def note_shed(self, reason):
+        """Count a frame shed by a later stage (e.g. clean-participant sampling)."""
+        with self._lock:
+            self.shed[reason] = self.shed.get(reason, 0) + 1
+
+    def release(self, pid):
+        with self._lock:
+            self.in_flight -= 1
+            n = self._per_pid.get(pid, 1) - 1
+            if n > 0:
+                self._per_pid[pid] = n
+            else:
+                self._per_pid.pop(pid, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "inFlight":    self.in_flight,
+                "maxInFlight": self.max_in_flight,
+                "admitted":    self.admitted,
+                "shed":        dict(self.shed),
+            }
+
+    def _forget_idle(self, now):
+        for pid in [p for p, t in self._last_seen.items() if now - t > ACTIVE_WINDOW * 6]:
+            self._last_seen.pop(pid, None)
+            self._baseline.pop(pid, None)
@@ -0,0 +1,469 @@
+"""
+Benchmarks for the AI service.
+
+    python bench.py prefork --workers 4     # serve.py preload+fork vs N independent uvicorn processes
+    python bench.py metrics                 # /metrics instrumentation overhead per /analyze-frame request
+    python bench.py load --rates 10,20,40   # open-loop /analyze-frame load: p99 of admitted frames vs offered load
+    python bench.py priority                # alert latency for suspicious participants, FIFO vs priority, fixed CPU
+    python bench.py rules --participants 1000,10000   # vectorized rule engine vs per-participant if/else
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_healthy(url, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def process_tree(pid):
+    pids, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        pids.append(p)
+        try:
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                todo.extend(int(c) for c in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def memory_mb(pids):
+    """Total (RSS, PSS) in MB. RSS double-counts shared pages; PSS does not."""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            pass
+    return rss / 1024, pss / 1024
+
+
+def bench_prefork(args):
+    py = sys.executable
+    rows = []
+
+    t0 = time.time()
+    proc = subprocess.Popen([py, "serve.py", "--app", args.app, "--workers", str(args.workers),
+                             "--port", str(args.port)], cwd=HERE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ok = wait_healthy(f"http://127.0.0.1:{args.port}/health")
+    startup = time.time() - t0
+    time.sleep(1.0)
+    rows.append(("serve.py preload+fork", ok, startup, *memory_mb(process_tree(proc.pid))))
+    proc.terminate()
+    proc.wait()
+
+    t0 = time.time()
+    procs = [subprocess.Popen([py, "-m", "uvicorn", f"{args.app}:app", "--port", str(args.port + 1 + i),
+                               "--log-level", "warning"], cwd=HERE,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+             for i in range(args.workers)]
+    ok = all(wait_healthy(f"http://127.0.0.1:{args.port + 1 + i}/health") for i in range(args.workers))
+    startup = time.time() - t0
+    time.sleep(1.0)
+    rows.append((f"{args.workers} x uvicorn", ok, startup, *memory_mb([p.pid for p in procs])))
+    for p in procs:
+        p.terminate()
+        p.wait()
+
+    print(f"{'mode':<24}{'ok':>4}{'startup s':>12}{'RSS MB':>10}{'PSS MB':>10}")
+    for name, ok, startup, rss, pss in rows:
+        print(f"{name:<24}{'y' if ok else 'n':>4}{startup:>12.2f}{rss:>10.0f}{pss:>10.0f}")
+
+
+def bench_metrics(args):
+    sys.path.insert(0, HERE)
+    import simple_main
+    from metrics import Registry
+
+    # Real requests: distinct frames so the perceptual cache doesn't short-circuit them
+    frames = synthetic_frames(args.requests)
+    t0 = time.perf_counter()
+    for i, b64 in enumerate(frames):
+        simple_main.analyze_frame(simple_main.AnalyzeRequest(imageData=b64, participantId=f"p{i % 8}"))
+    per_request = (time.perf_counter() - t0) / len(frames)
+
+    # One request's worth of instrumentation: middleware bookkeeping + 8 stage timers + 1 alert
+    reg = Registry()
+    lat = reg.histogram("a", "", ("route", "method"))
+    req = reg.counter("b", "", ("route", "method", "status"))
+    inflight = reg.gauge("c", "")
+    stage = reg.histogram("d", "", ("endpoint", "stage"))
+    alerts = reg.counter("e", "", ("alertType",))
+    n = 20000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        inflight.inc()
+        s = time.perf_counter()
+        for name in ("b64", "hash", "decode", "cascade", "gaze", "phone", "temporal", "alerts"):
+            with stage.time("analyze-frame", name):
+                pass
+        alerts.inc("NO_FACE")
+        inflight.dec()
+        lat.observe(time.perf_counter() - s, "/analyze-frame", "POST")
+        req.inc("/analyze-frame", "POST", "200")
+    per_instr = (time.perf_counter() - t0) / n
+
+    print(f"analyze-frame   {per_request * 1e3:8.3f} ms/request")
+    print(f"instrumentation {per_instr * 1e6:8.2f} us/request")
+    print(f"overhead        {100 * per_instr / per_request:8.3f} %")
+
+
+def synthetic_frames(n, seed=0):
+    """Distinct blurred-noise JPEGs (base64) so the perceptual cache doesn't absorb the load."""
+    import base64
+    import cv2
+    import numpy as np
+    rng = np.random.RandomState(seed)
+    out = []
+    for _ in range(n):
+        img = cv2.GaussianBlur(rng.randint(0, 255, (240, 320, 3), np.uint8), (9, 9), 0)
+        out.append(base64.b64encode(cv2.imencode(".jpg", img)[1].tobytes()).decode())
+    return out
+
+
+def post_json(url, payload, timeout=10.0):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def bench_load(args):
+    from concurrent.futures import ThreadPoolExecutor
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", f"{args.app}:app", "--port", str(args.port),
+                                   "--log-level", "warning"], cwd=HERE,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_healthy(f"{url}/health")
+
+    frames = synthetic_frames(400)
+    print(f"{'rate/s':>8}{'sent':>7}{'ok':>7}{'stale':>7}{'busy':>7}{'p50 ms':>9}{'p99 ms':>9}")
+    try:
+        for rate in [float(r) for r in args.rates.split(",")]:
+            results = []
+
+            def one(i):
+                t0 = time.time()
+                status, body = post_json(f"{url}/analyze-frame", {
+                    "imageData": frames[i % len(frames)],
+                    "participantId": f"p{i % args.participants}",
+                    "timestamp": t0 * 1000,
+                })
+                results.append((status, body.get("shed"), time.time() - t0))
+
+            n = int(rate * args.duration)
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=256) as pool:
+                for i in range(n):
+                    delay = start + i / rate - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(one, i)
+            ok = [lat for status, _, lat in results if status == 200]
+            stale = sum(1 for _, shed, _ in results if shed == "stale")
+            print(f"{rate:>8.0f}{n:>7}{len(ok):>7}{stale:>7}{len(results) - len(ok) - stale:>7}"
+                  f"{percentile(ok, 0.50) * 1e3:>9.1f}{percentile(ok, 0.99) * 1e3:>9.1f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def bench_priority(args):
+    """
+    Simulated analysis at fixed capacity (--workers threads, --cost s per frame)
+    under --overload x offered load. Alert delay is the time from an arbitrary
+    moment until a frame captured after it has been analyzed, i.e. how late a
+    timer threshold crossing is noticed.
+    """
+    import threading
+    sys.path.insert(0, HERE)
+    from priority_executor import PriorityExecutor, frame_priority, should_sample_down
+
+    capacity = args.workers / args.cost
+    rate = capacity * args.overload / args.participants
+    n_susp = max(1, int(args.participants * args.suspicious))
+    print(f"{args.workers} workers x {args.cost * 1e3:.0f} ms = {capacity:.0f} frames/s; "
+          f"offered {rate * args.participants:.0f} frames/s from {args.participants} participants "
+          f"({n_susp} suspicious)")
+    print(f"{'mode':<10}{'class':<12}{'fps':>7}{'p50 ms':>9}{'p99 ms':>9}{'max gap s':>11}{'alert p50':>11}{'alert p99':>11}")
+
+    for mode in ("fifo", "priority"):
+        executor = PriorityExecutor(args.workers)
+        start = time.time()
+        states = [{"no_face_start": start} if i < n_susp else {} for i in range(args.participants)]
+        done = [[] for _ in range(args.participants)]   # (captured_at, completed_at)
+        lock = threading.Lock()
+
+        def analyze(i, captured):
+            time.sleep(args.cost)
+            now = time.time()
+            states[i]["last_analyzed_at"] = states[i]["last_analyzed_wall"] = now
+            with lock:
+                done[i].append((captured, now))
+
+        events = sorted((start + (k + (i / args.participants)) / rate, i)
+                        for i in range(args.participants) for k in range(int(rate * args.duration)))
+        for at, i in events:
+            delay = at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.time()
+            if mode == "fifo":
+                key, suspicious = now, i < n_susp
+            else:
+                key, suspicious = frame_priority(states[i], now, now)
+                if should_sample_down(states[i], suspicious, executor, now) > 0:
+                    continue
+            st = executor.stats()
+            if st["queued"] + st["busy"] >= args.max_in_flight:
+                continue
+            executor.submit(key, analyze, i, now, suspicious=suspicious)
+        time.sleep(args.max_in_flight * args.cost)
+
+        end = start + args.duration
+        for name, members in (("suspicious", range(n_susp)), ("clean", range(n_susp, args.participants))):
+            lat, gaps, alert = [], [], []
+            for i in members:
+                rows = sorted(done[i], key=lambda r: r[1])
+                lat += [c - a for a, c in rows]
+                last = start
+                for _, c in rows:
+                    gaps.append(c - last)
+                    last = c
+                t = start + 1.0
+                while t < end - 1.0:
+                    nxt = [c for a, c in rows if a >= t]
+                    if nxt:
+                        alert.append(min(nxt) - t)
+                    t += 0.25
+            fps = sum(len(done[i]) for i in members) / args.duration
+            print(f"{mode:<10}{name:<12}{fps:>7.1f}{percentile(lat, 0.5) * 1e3:>9.0f}"
+                  f"{percentile(lat, 0.99) * 1e3:>9.0f}{max(gaps or [0]):>11.2f}"
+                  f"{percentile(alert, 0.5):>11.2f}{percentile(alert, 0.99):>11.2f}")
+
+
+def legacy_alert_stage(state, det, now, computed, audio_energy):
+    """The per-participant if/else the rule engine replaced, kept as the reference for `rules`."""
+    alerts = []
+    face_count = len(det["faces"])
+    if det["cascades"]:
+        if face_count == 0:
+            if state["no_face_start"] is None:
+                state["no_face_start"] = now
+            elif now - state["no_face_start"] > 5.0 and now - state["no_face_alerted_at"] > 10.0:
+                alerts.append(("NO_FACE", f"No face detected for {int(now - state['no_face_start'])}s"))
+                state["no_face_alerted_at"] = now
+        else:
+            state["no_face_start"] = None
+        if face_count > 1:
+            if state["multi_face_start"] is None:
+                state["multi_face_start"] = now
+            elif now - state["multi_face_start"] > 3.0 and now - state["multi_face_alerted_at"] > 10.0:
+                alerts.append(("MULTIPLE_FACES", f"{face_count} faces detected in frame"))
+                state["multi_face_alerted_at"] = now
+        else:
+            state["multi_face_start"] = None
+        if face_count >= 1 and computed:
+            if det["gazeOff"]:
+                state["gaze_off_count"] += 1
+                if state["gaze_off_count"] >= 4 and now - state["gaze_alerted_at"] > 15.0:
+                    alerts.append(("GAZE_DEVIATION", "Student gaze deviated off-screen"))
+                    state["gaze_alerted_at"] = now
+                    state["gaze_off_count"] = 0
+            else:
+                state["gaze_off_count"] = max(0, state["gaze_off_count"] - 1)
+    if det["phone"] and now - state["phone_alerted_at"] > 10.0:
+        alerts.append(("PHONE_DETECTED", "Possible mobile phone detected in frame"))
+        state["phone_alerted_at"] = now
+    if audio_energy > 0.15:
+        if state["speech_start"] is None:
+            state["speech_start"] = now
+        elif now - state["speech_start"] > 8.0 and now - state["speech_alerted_at"] > 20.0:
+            alerts.append(("SUSTAINED_SPEECH", f"Continuous speech for {int(now - state['speech_start'])}s"))
+            state["speech_alerted_at"] = now
+    else:
+        state["speech_start"] = None
+    return alerts
+
+
+def bench_rules(args):
+    """
+    Equivalence: random but persistent observation streams for many participants,
+    each with its own clock, through the engine in batches and through the
+    reference if/else one participant at a time, and through the engine's
+    scalar evaluate_one() (the per-frame path /analyze-frame takes); alerts and
+    final state must match exactly. Cost: microseconds per participant per
+    evaluation.
+    """
+    import numpy as np
+    sys.path.insert(0, HERE)
+    from rule_engine import RuleEngine
+
+    def streams(n, rng):
+        """Per-step observation arrays with sticky states so timers actually expire."""
+        faces = rng.choice([0, 1, 2], n, p=[0.2, 0.7, 0.1])
+        speak = rng.rand(n) < 0.2
+        while True:
+            flip = rng.rand(n) < 0.1
+            faces = np.where(flip, rng.choice([0, 1, 2], n, p=[0.2, 0.7, 0.1]), faces)
+            speak = np.where(rng.rand(n) < 0.08, ~speak, speak)
+            yield {
+                "faces":    faces.copy(),
+                "cascades": rng.rand(n) < 0.97,
+                "computed": rng.rand(n) < 0.7,
+                "gaze_off": rng.rand(n) < 0.5,
+                "phone":    rng.rand(n) < 0.03,
+                "audio":    np.where(speak, 0.3, 0.05) + rng.rand(n) * 0.05,
+            }
+
+    def legacy_state():
+        return {"no_face_start": None, "no_face_alerted_at": 0, "multi_face_start": None, "multi_face_alerted_at": 0,
+                "phone_alerted_at": 0, "speech_start": None, "speech_alerted_at": 0, "gaze_off_count": 0,
+                "gaze_alerted_at": 0}
+
+    def legacy_det(obs, j):
+        return {"faces": [None] * int(obs["faces"][j]), "cascades": bool(obs["cascades"][j]),
+                "gazeOff": bool(obs["gaze_off"][j]), "phone": bool(obs["phone"][j])}
+
+    # Equivalence
+    rng = np.random.RandomState(1)
+    n = args.check_participants
+    engine, scalar, states = RuleEngine(), RuleEngine(), [legacy_state() for _ in range(n)]
+    rows = engine.rows([f"p{j}" for j in range(n)])
+    now = 1.7e9 + rng.rand(n) * 100
+    mismatches, scalar_mismatches, fired = 0, 0, 0
+    gen = streams(n, rng)
+    for _ in range(args.steps):
+        obs = next(gen)
+        now = now + rng.uniform(0.2, 1.5, n)
+        got = engine.evaluate(rows, obs, now)
+        for j in range(n):
+            want = legacy_alert_stage(states[j], legacy_det(obs, j), float(now[j]), bool(obs["computed"][j]),
+                                      float(obs["audio"][j]))
+            one = scalar.evaluate_one(f"p{j}", {k: v[j].item() for k, v in obs.items()}, float(now[j]))
+            fired += len(want)
+            mismatches += [(a["alertType"], a["description"]) for a in got.get(j, [])] != want
+            scalar_mismatches += [(a["alertType"], a["description"]) for a in one] != want
+    legacy_views = [{k: (float(v) if k.endswith("_at") or (k.endswith("_start") and v is not None) else v)
+                     for k, v in st.items()} for st in states]
+    state_ok = all(engine.state_view(f"p{j}") == view and scalar.state_view(f"p{j}") == view
+                   for j, view in enumerate(legacy_views))
+    print(f"equivalence: {n} participants x {args.steps} frames, {fired} alerts, "
+          f"{mismatches} mismatching frames (batch), {scalar_mismatches} (evaluate_one), "
+          f"final state identical: {state_ok}")
+
+    # Cost per participant
+    print(f"{'participants':>12}{'engine us/p':>13}{'one us/p':>10}{'if/else us/p':>14}{'speedup':>9}")
+    for n in [1] + [int(x) for x in args.participants.split(",")]:
+        rng = np.random.RandomState(2)
+        engine, states = RuleEngine(), [legacy_state() for _ in range(n)]
+        rows = engine.rows([f"p{j}" for j in range(n)])
+        gen = streams(n, rng)
+        batches = [next(gen) for _ in range(20)]
+        dets = [[legacy_det(obs, j) for j in range(n)] for obs in batches]
+        rounds = max(1, 20000 // n)
+        t0 = time.perf_counter()
+        for r in range(rounds):
+            obs = batches[r % 20]
+            engine.evaluate(rows, obs, 1.7e9 + r)
+        engine_us = (time.perf_counter() - t0) / rounds / n * 1e6
+        scalar = RuleEngine()
+        one = [[{k: v[j].item() for k, v in obs.items()} for j in range(n)] for obs in batches]
+        t0 = time.perf_counter()
+        for r in range(rounds):
+            for j in range(n):
+                scalar.evaluate_one(f"p{j}", one[r % 20][j], 1.7e9 + r)
+        one_us = (time.perf_counter() - t0) / rounds / n * 1e6
+        t0 = time.perf_counter()
+        for r in range(rounds):
+            obs, det = batches[r % 20], dets[r % 20]
+            for j in range(n):
+                legacy_alert_stage(states[j], det[j], 1.7e9 + r, bool(obs["computed"][j]), float(obs["audio"][j]))
+        legacy_us = (time.perf_counter() - t0) / rounds / n * 1e6
+        print(f"{n:>12}{engine_us:>13.2f}{one_us:>10.2f}{legacy_us:>14.2f}{legacy_us / engine_us:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("prefork", help="startup time and memory: preload+fork vs independent processes")
+    p.add_argument("--app", default="simple_main")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--port", type=int, default=8100)
+    p.set_defaults(func=bench_prefork)
+
+    p = sub.add_parser("metrics", help="instrumentation overhead relative to /analyze-frame")
+    p.add_argument("--requests", type=int, default=200)
+    p.set_defaults(func=bench_metrics)
+
+    p = sub.add_parser("load", help="open-loop /analyze-frame load test")
+    p.add_argument("--url", default=None, help="running service; default spawns uvicorn")
+    p.add_argument("--app", default="simple_main")
+    p.add_argument("--port", type=int, default=8101)
+    p.add_argument("--rates", default="10,20,40")
+    p.add_argument("--duration", type=float, default=10.0)
+    p.add_argument("--participants", type=int, default=20)
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser("priority", help="alert latency for suspicious participants: FIFO vs suspicion priority")
+    p.add_argument("--workers", type=int, default=2)
+    p.add_argument("--cost", type=float, default=0.02, help="seconds of analysis per frame")
+    p.add_argument("--participants", type=int, default=40)
+    p.add_argument("--suspicious", type=float, default=0.1, help="fraction of participants with a running timer")
+    p.add_argument("--overload", type=float, default=1.5, help="offered load / capacity")
+    p.add_argument("--max-in-flight", type=int, default=4)
+    p.add_argument("--duration", type=float, default=10.0)
+    p.set_defaults(func=bench_priority)
+
+    p = sub.add_parser("rules", help="vectorized rule engine: equivalence with the if/else and cost per participant")
+    p.add_argument("--participants", default="100,1000,10000", help="batch sizes to time")
+    p.add_argument("--check-participants", type=int, default=200)
+    p.add_argument("--steps", type=int, default=400)
+    p.set_defaults(func=bench_rules)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
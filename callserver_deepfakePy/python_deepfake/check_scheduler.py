@@ -0,0 +1,110 @@
+"""
+Risk-based deepfake check scheduling.
+
+Keeps a short verification history per participant and turns it into a
+`nextCheckAfter` hint (seconds). Consecutive clean, confident verdicts
+stretch the interval geometrically up to MAX_INTERVAL; a flagged or
+low-confidence verdict, or an external trigger (identity mismatch, face
+loss, ...), drops it straight back to MIN_INTERVAL.
+"""
+import threading
+import time
+from collections import deque
+
+MIN_INTERVAL   = 5.0     # suspicious participant: check again this soon
+BASE_INTERVAL  = 15.0    # new participant
+MAX_INTERVAL   = 120.0   # long-clean participant
+GROWTH         = 1.5     # interval multiplier per clean verdict once the streak is established
+CLEAN_STREAK   = 3       # clean verdicts before the interval starts growing
+LOW_CONFIDENCE = 0.75    # a clean verdict below this is treated as suspicious
+HISTORY_LEN    = 20
+IDLE_EVICT     = 3 * 3600.0
+
+TRIGGER_REASONS = {
+    "IDENTITY_MISMATCH", "NO_FACE", "MULTIPLE_FACES", "FACE_CHANGED", "MANUAL",
+}
+
+
+class CheckScheduler:
+    def __init__(self):
+        self._state = {}
+        self._lock  = threading.Lock()
+        self.checks   = 0
+        self.triggers = 0
+
+    def _get(self, pid, now):
+        st = self._state.get(pid)
+        if st is None:
+            st = self._state[pid] = {
+                "interval":     BASE_INTERVAL,
+                "clean_streak": 0,
+                "next_due":     now,
+                "last_seen":    now,
+                "history":      deque(maxlen=HISTORY_LEN),
+            }
+        st["last_seen"] = now
+        return st
+
+    def record_result(self, pid, is_deepfake, confidence, now=None):
+        """Record a verdict and return the nextCheckAfter hint in seconds."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.checks += 1
+            st = self._get(pid, now)
+            st["history"].append((now, bool(is_deepfake), round(float(confidence), 3)))
+            if is_deepfake or confidence < LOW_CONFIDENCE:
+                st["clean_streak"] = 0
+                st["interval"]     = MIN_INTERVAL
+            else:
+                st["clean_streak"] += 1
+                # Until the streak is established the interval stays where it was
+                # (MIN_INTERVAL right after a flag, BASE_INTERVAL for a new participant)
+                if st["clean_streak"] >= CLEAN_STREAK:
+                    st["interval"] = min(MAX_INTERVAL, max(st["interval"], BASE_INTERVAL) * GROWTH)
+            st["next_due"] = now + st["interval"]
+            self._evict_idle(now)
+            return round(st["interval"], 2)
+
+    def notify(self, pid, reason, now=None):
+        """External trigger: make the participant due immediately and reset the backoff."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.triggers += 1
+            st = self._get(pid, now)
+            st["history"].append((now, "trigger", reason))
+            st["clean_streak"] = 0
+            st["interval"]     = MIN_INTERVAL
+            st["next_due"]     = now
+            return 0.0
+
+    def next_check_after(self, pid, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            st = self._state.get(pid)
+            return 0.0 if st is None else max(0.0, st["next_due"] - now)
+
+    def describe(self, pid, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            st = self._state.get(pid)
+            if st is None:
+                return None
+            return {
+                "participantId":  pid,
+                "interval":       st["interval"],
+                "cleanStreak":    st["clean_streak"],
+                "nextCheckAfter": round(max(0.0, st["next_due"] - now), 2),
+                "history":        [list(h) for h in st["history"]],
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "participants": len(self._state),
+                "checks":       self.checks,
+                "triggers":     self.triggers,
+            }
+
+    def _evict_idle(self, now):
+        for pid in [p for p, st in self._state.items() if now - st["last_seen"] > IDLE_EVICT]:
+            del self._state[pid]
@@ -0,0 +1,85 @@
+"""
+Per-participant clock for /analyze-frame's timers and cooldowns.
+
+  wall   time.time() when the frame is processed (default)
+  frame  the frame's capture time: the request's `timestamp`, epoch ms
+  sim    a simulated clock moved with set()/advance() (replays, benchmarks)
+
+Under "frame" a participant never mixes the two clocks, which can be minutes
+apart: one whose first frame has no `timestamp` stays on the wall clock, and
+a timestamped participant's later frame without one is placed at wall time
+minus the offset between its last timestamp and the wall clock then.
+
+Each participant's time never moves backwards: a frame that arrives out of
+order is clamped to the latest time already handed out for that participant.
+Admission control, staleness and frame scheduling always stay on the wall
+clock; this only drives the alert timers and cooldowns.
+
+Select the source with TI_CLOCK=wall|frame|sim.
+"""
+import os
+import threading
+import time
+
+SOURCES = ("wall", "frame", "sim")
+_UNSEEN = object()
+
+
+class ParticipantClock:
+    def __init__(self, source="wall", start=0.0):
+        if source not in SOURCES:
+            raise ValueError(f"unknown clock {source!r} (choose from {', '.join(SOURCES)})")
+        self.source   = source
+        self.sim_time = start
+        self.clamped  = 0
+        self.offset_frames = 0   # "frame": untimestamped frames placed by offset
+        self._last    = {}
+        self._offset  = {}       # "frame": pid -> wall - capture time, None = participant on the wall clock
+        self._lock    = threading.Lock()
+
+    def set(self, t):
+        self.sim_time = t
+
+    def advance(self, dt):
+        self.sim_time += dt
+
+    def now(self, pid, frame_ts_ms=None, record=True):
+        """
+        Epoch seconds for this participant's frame; never earlier than the last
+        one. record=False peeks (e.g. to prioritize a frame before analyzing it).
+        """
+        t = self.sim_time if self.source == "sim" else time.time()
+        with self._lock:
+            if self.source == "frame":
+                t = self._frame_time(pid, frame_ts_ms, t, record)
+            last = self._last.get(pid)
+            if last is not None and t < last:
+                if not record:
+                    return last
+                self.clamped += 1
+                t = last
+            if record:
+                self._last[pid] = t
+        return t
+
+    def _frame_time(self, pid, frame_ts_ms, wall, record):
+        offset = self._offset.get(pid, _UNSEEN)
+        if offset is None or (offset is _UNSEEN and not frame_ts_ms):
+            if record:
+                self._offset[pid] = None
+            return wall
+        if frame_ts_ms:
+            t = float(frame_ts_ms) / 1000.0
+            if record:
+                self._offset[pid] = wall - t
+            return t
+        if record:
+            self.offset_frames += 1
+        return wall - offset
+
+    def stats(self):
+        return {"source": self.source, "clamped": self.clamped, "offsetFrames": self.offset_frames}
+
+
+def clock_from_env():
+    return ParticipantClock(os.environ.get("TI_CLOCK", "wall"), start=time.time())
@@ -0,0 +1,105 @@
+"""
+Per-participant perceptual-hash result cache.
+
+Webcam frames of a seated candidate are mostly near-duplicates, so results
+(deepfake verdicts, face-detection outputs) are cached under a 64-bit
+difference hash of a tiny grayscale thumbnail and reused for any later frame
+of the SAME participant whose hash is within a small Hamming distance.
+Entries are evicted LRU per participant and by TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+HASH_W, HASH_H = 9, 8   # dHash input size → 8x8 = 64 bit hash
+
+
+def dhash(thumb) -> int:
+    """64-bit difference hash of a (8, 9) grayscale array."""
+    g = np.asarray(thumb, dtype=np.int16)
+    bits = (g[:, 1:] > g[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PerceptualCache:
+    def __init__(self, max_distance=4, ttl=10.0, max_entries=8, max_participants=2048):
+        self.max_distance     = max_distance
+        self.ttl              = ttl
+        self.max_entries      = max_entries        # per participant, per kind
+        self.max_participants = max_participants
+        self._data = OrderedDict()                 # pid -> {kind: OrderedDict(hash -> (stored_at, result))}
+        self._lock = threading.Lock()
+        self.hits      = {}
+        self.misses    = {}
+        self.evictions = 0
+
+    def lookup(self, participant_id, kind, h, now=None):
+        """Return a cached result for this participant within max_distance of h, or None."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = self._data.get(participant_id, {}).get(kind)
+            if entries:
+                for key in [k for k, (ts, _) in entries.items() if now - ts > self.ttl]:
+                    del entries[key]
+                    self.evictions += 1
+                best = None
+                for key in entries:
+                    d = hamming(key, h)
+                    if d <= self.max_distance and (best is None or d < best[0]):
+                        best = (d, key)
+                if best is not None:
+                    entries.move_to_end(best[1])
+                    self._data.move_to_end(participant_id)
+                    self.hits[kind] = self.hits.get(kind, 0) + 1
+                    return entries[best[1]][1]
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return None
+
+    def store(self, participant_id, kind, h, result, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            kinds = self._data.get(participant_id)
+            if kinds is None:
+                kinds = self._data[participant_id] = {}
+                if len(self._data) > self.max_participants:
+                    _, dropped = self._data.popitem(last=False)
+                    self.evictions += sum(len(e) for e in dropped.values())
+            self._data.move_to_end(participant_id)
+            entries = kinds.setdefault(kind, OrderedDict())
+            entries[h] = (now, result)
+            entries.move_to_end(h)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def forget(self, participant_id, kind=None):
+        """Drop the participant's cached results, or only those of one kind."""
+        with self._lock:
+            if kind is None:
+                self._data.pop(participant_id, None)
+            else:
+                self._data.get(participant_id, {}).pop(kind, None)
+
+    def stats(self):
+        with self._lock:
+            kinds = sorted(set(self.hits) | set(self.misses))
+            per_kind = {}
+            for k in kinds:
+                hits, misses = self.hits.get(k, 0), self.misses.get(k, 0)
+                per_kind[k] = {
+                    "hits":    hits,
+                    "misses":  misses,
+                    "hitRate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                }
+            return {
+                "participants": len(self._data),
+                "entries":      sum(len(e) for kinds in self._data.values() for e in kinds.values()),
+                "evictions":    self.evictions,
+                "byKind":       per_kind,
+            }
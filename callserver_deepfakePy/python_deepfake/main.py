@@ -1,10 +1,17 @@
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
 import uvicorn
 import numpy as np
 from PIL import Image
 import io
 
+from frame_cache import PerceptualCache, dhash, HASH_W, HASH_H
+from check_scheduler import CheckScheduler, TRIGGER_REASONS
+from temporal_scorer import TemporalScorer, CROP
+from metrics import Registry, MetricsMiddleware
+
 app = FastAPI(title="TestIntegrity Deepfake Detection Service")
 
 app.add_middleware(
@@ -15,10 +22,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Near-duplicate verdict cache (per participant, never shared across participants)
+deepfake_cache = PerceptualCache(max_distance=4, ttl=30.0)
+
+# Per-participant deepfake check cadence (nextCheckAfter hints)
+check_scheduler = CheckScheduler()
+
+# Per-participant ring buffer of face crops for sequence-level deepfake scoring
+temporal_scorer = TemporalScorer()
+
+# ── Metrics (/metrics, text exposition format) ───────────────────────────
+registry = Registry()
+REQUEST_LATENCY = registry.histogram("ti_request_duration_seconds", "Request latency by route", ("route", "method"))
+REQUESTS = registry.counter("ti_requests_total", "Requests by route and status", ("route", "method", "status"))
+IN_FLIGHT = registry.gauge("ti_requests_in_flight", "Requests currently being handled")
+STAGE = registry.histogram("ti_stage_duration_seconds", "Time spent per analysis stage", ("endpoint", "stage"))
+VERDICTS = registry.counter("ti_deepfake_verdicts_total", "Deepfake verdicts", ("verdict",))
+registry.gauge("ti_participants_tracked", "Participants with live state per store", ("store",), fn=lambda: {
+    ("deepfake_cache",): deepfake_cache.stats()["participants"],
+    ("scheduler",): check_scheduler.stats()["participants"],
+    ("temporal",): temporal_scorer.stats()["participants"],
+})
+registry.counter("ti_cache_hits_total", "Perceptual cache hits", ("cache",), fn=lambda: {
+    ("deepfake",): sum(k["hits"] for k in deepfake_cache.stats()["byKind"].values()),
+})
+registry.counter("ti_cache_misses_total", "Perceptual cache misses", ("cache",), fn=lambda: {
+    ("deepfake",): sum(k["misses"] for k in deepfake_cache.stats()["byKind"].values()),
+})
+
+app.add_middleware(MetricsMiddleware, latency=REQUEST_LATENCY, requests=REQUESTS, in_flight=IN_FLIGHT)
+
+
+def perceptual_hash(contents: bytes):
+    """dHash using JPEG draft mode, so only a tiny grayscale image is decoded."""
+    try:
+        thumb = Image.open(io.BytesIO(contents))
+        thumb.draft("L", (HASH_W * 8, HASH_H * 8))
+        thumb = thumb.convert("L").resize((HASH_W, HASH_H), Image.BILINEAR)
+        return dhash(np.asarray(thumb))
+    except Exception as e:
+        print(f"⚠️ Hash error: {str(e)}")
+        return None
+
+
+def center_crop(contents: bytes):
+    """Central square of the frame (no face detector here) as a CROP x CROP gray array."""
+    try:
+        img = Image.open(io.BytesIO(contents))
+        img.draft("L", (CROP * 4, CROP * 4))
+        img = img.convert("L")
+        w, h = img.size
+        side = int(min(w, h) * 0.6)
+        left, top = (w - side) // 2, (h - side) // 2
+        img = img.crop((left, top, left + side, top + side)).resize((CROP, CROP), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8)
+    except Exception as e:
+        print(f"⚠️ Crop error: {str(e)}")
+        return None
+
+
 @app.get("/health")
 def health():
     return {"status": "healthy", "service": "Deepfake Detection"}
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return registry.render()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"deepfake": deepfake_cache.stats(), "scheduler": check_scheduler.stats(),
+            "temporal": temporal_scorer.stats()}
+
 @app.post("/deepfake/predict")
 async def predict_deepfake(
     file: UploadFile = File(...),
@@ -27,25 +104,61 @@ async def predict_deepfake(
     participantId: str = Form(...)
 ):
     try:
-        # Read image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
         import random
         from datetime import datetime
-        
-        is_deepfake = random.random() < 0.1  # 10% chance of being flagged as deepfake
-        confidence = random.uniform(0.7, 0.95)
-        
-        print(f"🛡️ Deepfake check for user {userId}: {'DETECTED' if is_deepfake else 'CLEAN'} (confidence: {confidence:.2f})")
+
+        # Read image
+        with STAGE.time("deepfake", "read"):
+            contents = await file.read()
+        with STAGE.time("deepfake", "hash"):
+            h = perceptual_hash(contents)
+        # A due check is a real check: the cache only answers frames sent ahead of schedule
+        due = check_scheduler.next_check_after(participantId) == 0.0
+        verdict = deepfake_cache.lookup(participantId, "deepfake", h) if h is not None and not due else None
+        cache_hit = verdict is not None
+        window = None
+
+        if verdict is None:
+            with STAGE.time("deepfake", "temporal"):
+                crop = center_crop(contents)
+                if crop is not None:
+                    window = temporal_scorer.push(participantId, crop)
+
+            with STAGE.time("deepfake", "decode"):
+                image = Image.open(io.BytesIO(contents))
+
+                # Convert to RGB if needed
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+
+            with STAGE.time("deepfake", "inference"):
+                verdict = {
+                    "is_deepfake": random.random() < 0.1,  # 10% chance of being flagged as deepfake
+                    "confidence": random.uniform(0.7, 0.95),
+                }
+            if h is not None:
+                deepfake_cache.store(participantId, "deepfake", h, verdict)
+
+        is_deepfake = verdict["is_deepfake"]
+        confidence = verdict["confidence"]
+        if cache_hit:
+            next_check = round(check_scheduler.next_check_after(participantId), 2)   # a cached verdict is not a new data point
+        else:
+            next_check = check_scheduler.record_result(participantId, is_deepfake, confidence)
+        VERDICTS.inc("deepfake" if is_deepfake else "clean")
+        if window is None:
+            window = temporal_scorer.score(participantId)
+
+        print(f"🛡️ Deepfake check for user {userId}: {'DETECTED' if is_deepfake else 'CLEAN'} (confidence: {confidence:.2f}){' [cached]' if cache_hit else ''}")
         
         return {
             "is_deepfake": is_deepfake,
             "confidence": confidence,
+            "frameScore": round(confidence if is_deepfake else 1.0 - confidence, 4),
+            "windowScore": window["score"] if window else None,
+            "window": window,
+            "cacheHit": cache_hit,
+            "nextCheckAfter": next_check,
             "userId": userId,
             "meetingId": meetingId,
             "participantId": participantId,
@@ -62,6 +175,28 @@ async def predict_deepfake(
             "meetingId": meetingId
         }
 
+class NotifyRequest(BaseModel):
+    participantId: str
+    reason: str = "MANUAL"
+
+
+@app.post("/deepfake/notify")
+def notify_trigger(req: NotifyRequest):
+    """External trigger (identity mismatch, face loss, ...) — makes the participant due now."""
+    if req.reason not in TRIGGER_REASONS:
+        return {"accepted": False, "error": f"unknown reason {req.reason}", "participantId": req.participantId}
+    deepfake_cache.forget(req.participantId, "deepfake")   # cached verdicts predate the trigger
+    return {
+        "accepted": True,
+        "participantId": req.participantId,
+        "nextCheckAfter": check_scheduler.notify(req.participantId, req.reason),
+    }
+
+
+@app.get("/deepfake/schedule/{participant_id}")
+def check_schedule(participant_id: str):
+    return check_scheduler.describe(participant_id) or {"participantId": participant_id, "nextCheckAfter": 0.0}
+
 @app.post("/analyze")
 def analyze_frame(data: dict):
     return {"status": "analyzed", "alerts": [], "confidence": 0.8}
@@ -0,0 +1,179 @@
+"""
+In-process Prometheus-style metrics (text exposition format, no collector needed).
+
+Counters, gauges and fixed-bucket histograms keyed by label values. Each
+metric holds one uncontended lock around a dict update, so an observation
+costs well under a microsecond. Callback-backed metrics are evaluated only when
+/metrics is scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+INF_LABEL = 'le="+Inf"'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labelnames=(), fn=None):
+        self.name       = name
+        self.help       = help
+        self.labelnames = tuple(labelnames)
+        self.fn         = fn   # optional callback returning {labels_tuple: value} (or a scalar when unlabelled)
+        self._values    = {}
+        self._lock      = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        if self.fn is not None:
+            v = self.fn()
+            items = list(v.items()) if isinstance(v, dict) else [((), v)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            h = self._values.get(labels)
+            if h is None:
+                h = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        with self._lock:
+            items = [(k, (list(c), s, n)) for k, (c, s, n) in self._values.items()]
+        lines = self.header()
+        for k, (counts, total, n) in items:
+            cum = 0
+            for le, c in zip(self.buckets, counts):
+                cum += c
+                le_label = 'le="%s"' % le
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, k, [le_label])} {cum}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, k, [INF_LABEL])} {n}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, k)} {n}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "t0")
+
+    def __init__(self, hist, labels):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labelnames=(), fn=None):
+        return self._add(Counter(name, help, labelnames, fn))
+
+    def gauge(self, name, help, labelnames=(), fn=None):
+        return self._add(Gauge(name, help, labelnames, fn))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histogram, request counter, in-flight gauge."""
+
+    def __init__(self, app, latency, requests, in_flight):
+        self.app       = app
+        self.latency   = latency
+        self.requests  = requests
+        self.in_flight = in_flight
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(msg):
+            if msg["type"] == "http.response.start":
+                status[0] = msg["status"]
+            await send(msg)
+
+        self.in_flight.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            # Route template (not raw path) keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "other")
+            self.latency.observe(time.perf_counter() - t0, route, scope["method"])
+            self.requests.inc(route, scope["method"], str(status[0]))
@@ -0,0 +1,120 @@
+"""
+Suspicion-aware priority scheduling of frame analysis.
+
+Frames wait in a heap ordered by a virtual deadline: their arrival time minus
+a boost. Participants with running timers (no face, multiple faces, speech),
+gaze strikes, recent alerts or a recent face-count change get
+SUSPICIOUS_BOOST. Anyone not analyzed for MAX_GAP gets STARVED_BOOST, which
+outranks suspicion, so every participant keeps a minimum analysis rate.
+Because the key is arrival time based, waiting frames age naturally and
+nothing starves. When the queue is backed up, participants in a steady clean
+state are also sampled down to one frame per CLEAN_INTERVAL.
+
+Suspicion is read from the participant's alert state, which is kept on its own
+clock (clock.py; under TI_CLOCK=frame that is the sender's capture clock). The
+heap key, MAX_GAP and CLEAN_INTERVAL are on the server's wall clock, against
+`last_analyzed_wall`: one heap is shared by every participant, so a sender
+whose clock runs behind must not jump the queue, nor one running ahead starve.
+"""
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+SUSPICIOUS_BOOST = 2.0    # seconds a suspicious frame jumps ahead
+STARVED_BOOST    = 10.0   # seconds a starved participant jumps ahead
+MAX_GAP          = 5.0    # minimum analysis rate: at least one frame per MAX_GAP
+CLEAN_INTERVAL   = 2.0    # under contention, clean participants are analyzed at most this often
+RECENT_ALERT     = 60.0
+RECENT_CHANGE    = 30.0
+
+TIMER_KEYS = ("no_face_start", "multi_face_start", "speech_start")
+ALERT_KEYS = ("no_face_alerted_at", "multi_face_alerted_at", "phone_alerted_at",
+              "speech_alerted_at", "gaze_alerted_at")
+
+
+def is_suspicious(state, now):
+    if any(state.get(k) is not None for k in TIMER_KEYS):
+        return True
+    if state.get("gaze_off_count", 0) > 0:
+        return True
+    if any(now - state.get(k, 0) < RECENT_ALERT for k in ALERT_KEYS):
+        return True
+    return now - state.get("face_count_changed_at", 0) < RECENT_CHANGE
+
+
+def frame_priority(state, now, wall):
+    """
+    (sort key, suspicious) for a frame arriving at `wall` (time.time()); `now`
+    is the participant's clock. Lower keys run first.
+    """
+    suspicious = is_suspicious(state, now)
+    boost = 0.0
+    if wall - state.get("last_analyzed_wall", 0) > MAX_GAP:
+        boost = STARVED_BOOST
+    elif suspicious:
+        boost = SUSPICIOUS_BOOST
+    return wall - boost, suspicious
+
+
+class PriorityExecutor:
+    def __init__(self, workers):
+        self._heap = []
+        self._seq  = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self.workers = workers
+        self.busy    = 0
+        self.dispatched = {"suspicious": 0, "clean": 0}
+
+    def submit(self, key, fn, *args, suspicious=False):
+        fut = Future()
+        with self._cond:
+            # Threads start on first use: serve.py imports the app before forking workers
+            if not self._threads:
+                self._threads = [threading.Thread(target=self._run, name=f"analysis-{i}", daemon=True)
+                                 for i in range(self.workers)]
+                for t in self._threads:
+                    t.start()
+            self.dispatched["suspicious" if suspicious else "clean"] += 1
+            heapq.heappush(self._heap, (key, next(self._seq), fut, fn, args))
+            self._cond.notify()
+        return fut
+
+    def depth(self):
+        with self._cond:
+            return len(self._heap)
+
+    def saturated(self):
+        with self._cond:
+            return len(self._heap) > 0 or self.busy >= self.workers
+
+    def stats(self):
+        with self._cond:
+            return {"workers": self.workers, "busy": self.busy, "queued": len(self._heap),
+                    "dispatched": dict(self.dispatched)}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, fut, fn, args = heapq.heappop(self._heap)
+                self.busy += 1
+            try:
+                if fut.set_running_or_notify_cancel():
+                    try:
+                        fut.set_result(fn(*args))
+                    except BaseException as exc:
+                        fut.set_exception(exc)
+            finally:
+                with self._cond:
+                    self.busy -= 1
+
+
+def should_sample_down(state, suspicious, executor, wall):
+    """Under contention, skip frames from clean participants analyzed within CLEAN_INTERVAL (wall clock)."""
+    if suspicious or not executor.saturated():
+        return 0.0
+    wait = CLEAN_INTERVAL - (wall - state.get("last_analyzed_wall", 0))
+    return max(0.0, wait)
@@ -0,0 +1,240 @@
+"""
+Declarative alert rules evaluated over columnar per-participant state.
+
+Every alert /analyze-frame can raise is one entry in RULES, evaluated in table
+order:
+
+  kind      "duration"  fires once `when` has held for more than `after` seconds
+            "strike"    `when` adds a strike, its absence removes one (floor 0);
+                        fires at `strikes` strikes and clears them
+            "instant"   fires whenever `when` holds
+  when      observations -> bool array
+  gate      observations -> bool array; where False the rule is frozen for that
+            frame (no timer start or reset, no strike change)
+  cooldown  seconds since the rule last fired (strictly more) before it may fire again
+  fields    the participant-state names of the rule's columns (timer or strike
+            count, then last-alert time), as priority_executor reads them
+  alert     severity, confidence, and a description formatted with
+            `elapsed` (seconds the condition has held) and `faces`
+
+The state of all participants lives in one NumPy column per rule field. Timers
+are NaN when idle. rows() maps participant ids to columns once; evaluate()
+takes a batch of distinct rows with their observation arrays and updates every
+rule for the whole batch with array operations, so the per-participant cost
+falls as the batch grows. A single frame does not amortize the NumPy call
+overhead (~100x the scalar cost), so evaluate_one() runs the same rules over
+one participant's row with plain Python scalars; both reproduce the former
+per-frame if/else logic exactly (test_rule_engine.py).
+
+A participant's row is reset and reused after release(), or once it has gone
+IDLE_EVICT seconds without an evaluation and the columns would otherwise grow.
+
+Observations: faces (int), cascades, computed, gaze_off, phone (bool), audio (float).
+"""
+import threading
+import time
+
+import numpy as np
+
+RULES = (
+    {"name": "NO_FACE", "kind": "duration", "after": 5.0, "cooldown": 10.0,
+     "when": lambda o: o["faces"] == 0, "gate": lambda o: o["cascades"],
+     "fields": ("no_face_start", "no_face_alerted_at"),
+     "severity": "MEDIUM", "confidence": 0.85, "text": "No face detected for {elapsed}s"},
+    {"name": "MULTIPLE_FACES", "kind": "duration", "after": 3.0, "cooldown": 10.0,
+     "when": lambda o: o["faces"] > 1, "gate": lambda o: o["cascades"],
+     "fields": ("multi_face_start", "multi_face_alerted_at"),
+     "severity": "HIGH", "confidence": 0.9, "text": "{faces} faces detected in frame"},
+    # A frame-count strike, so only fresh detections with a face move it
+    {"name": "GAZE_DEVIATION", "kind": "strike", "strikes": 4, "cooldown": 15.0,
+     "when": lambda o: o["gaze_off"], "gate": lambda o: o["cascades"] & (o["faces"] >= 1) & o["computed"],
+     "fields": ("gaze_off_count", "gaze_alerted_at"),
+     "severity": "MEDIUM", "confidence": 0.7, "text": "Student gaze deviated off-screen"},
+    {"name": "PHONE_DETECTED", "kind": "instant", "cooldown": 10.0,
+     "when": lambda o: o["phone"],
+     "fields": (None, "phone_alerted_at"),
+     "severity": "HIGH", "confidence": 0.65, "text": "Possible mobile phone detected in frame"},
+    {"name": "SUSTAINED_SPEECH", "kind": "duration", "after": 8.0, "cooldown": 20.0,
+     "when": lambda o: o["audio"] > 0.15,
+     "fields": ("speech_start", "speech_alerted_at"),
+     "severity": "MEDIUM", "confidence": 0.75, "text": "Continuous speech for {elapsed}s"},
+)
+
+INITIAL_ROWS = 64
+IDLE_EVICT   = 600.0    # seconds without an evaluation before a row may be reused
+
+
+class RuleEngine:
+    def __init__(self, rules=RULES, capacity=INITIAL_ROWS):
+        self.rules = rules
+        self.index = {}                  # participant id -> row
+        self.owner = {}                  # row -> participant id
+        self.free  = []                  # released rows, reset, reused before the columns grow
+        self.size  = 0
+        self.timer   = np.full((len(rules), capacity), np.nan)        # duration: condition start
+        self.strikes = np.zeros((len(rules), capacity), np.int64)     # strike: current strikes
+        self.alerted = np.zeros((len(rules), capacity))               # last alert time, 0 = never
+        self.seen    = np.zeros(capacity)                             # monotonic time of the last evaluation
+        self._lock = threading.Lock()
+
+    def _row(self, pid):
+        row = self.index.get(pid)
+        if row is not None:
+            self.seen[row] = time.monotonic()
+            return row
+        if not self.free and self.size == self.timer.shape[1]:
+            self._reclaim_idle()
+        if self.free:
+            row = self.free.pop()
+        else:
+            row = self.size
+            self.size += 1
+            if self.size > self.timer.shape[1]:
+                # Columns grow before the row is published, so no reader sees a row past their end
+                grow = self.timer.shape[1]
+                self.timer   = np.concatenate([self.timer, np.full((len(self.rules), grow), np.nan)], axis=1)
+                self.strikes = np.concatenate([self.strikes, np.zeros((len(self.rules), grow), np.int64)], axis=1)
+                self.alerted = np.concatenate([self.alerted, np.zeros((len(self.rules), grow))], axis=1)
+                self.seen    = np.concatenate([self.seen, np.zeros(grow)])
+        self.seen[row] = time.monotonic()
+        self.owner[row] = pid
+        self.index[pid] = row
+        return row
+
+    def _release(self, pid):
+        row = self.index.pop(pid, None)
+        if row is None:
+            return
+        del self.owner[row]
+        self.timer[:, row] = np.nan
+        self.strikes[:, row] = 0
+        self.alerted[:, row] = 0.0
+        self.free.append(row)
+
+    def _reclaim_idle(self):
+        """Release rows not evaluated for IDLE_EVICT seconds; run only when the columns would grow."""
+        cutoff = time.monotonic() - IDLE_EVICT
+        for row in np.flatnonzero(self.seen[:self.size] < cutoff).tolist():
+            if row in self.owner:
+                self._release(self.owner[row])
+
+    def release(self, pid):
+        """Forget a participant's timers, strikes and cooldowns; its row is reused."""
+        with self._lock:
+            self._release(pid)
+
+    def rows(self, pids):
+        """State rows for these participant ids, allocating new ones as needed."""
+        with self._lock:
+            return np.fromiter((self._row(p) for p in pids), np.int64, len(pids))
+
+    def evaluate(self, rows, obs, now):
+        """
+        Advance every rule for a batch of distinct rows. `obs` maps each
+        observation name to an array aligned with `rows`; `now` is a scalar or
+        per-row array. Returns {batch index: [alerts]} for the rows that fired;
+        alerts carry no timestamp.
+        """
+        n = len(rows)
+        now = np.broadcast_to(np.asarray(now, np.float64), (n,))
+        out = {}
+        with self._lock:
+            self.seen[rows] = time.monotonic()
+            for i, rule in enumerate(self.rules):
+                when = np.asarray(rule["when"](obs), bool)
+                gate = np.asarray(rule["gate"](obs), bool) if "gate" in rule else np.ones(n, bool)
+                last = self.alerted[i, rows]
+                cool = now - last > rule["cooldown"]
+                kind = rule["kind"]
+                elapsed = None
+                if kind == "duration":
+                    start   = self.timer[i, rows]
+                    running = ~np.isnan(start)
+                    held    = gate & when
+                    fire    = held & running & (now - start > rule["after"]) & cool
+                    elapsed = now - start
+                    start   = np.where(held & ~running, now, start)
+                    self.timer[i, rows] = np.where(gate & ~when, np.nan, start)
+                elif kind == "strike":
+                    count = self.strikes[i, rows]
+                    hit   = gate & when
+                    count = np.where(hit, count + 1, np.where(gate, np.maximum(count - 1, 0), count))
+                    fire  = hit & (count >= rule["strikes"]) & cool
+                    self.strikes[i, rows] = np.where(fire, 0, count)
+                else:
+                    fire = gate & when & cool
+                if not fire.any():
+                    continue
+                self.alerted[i, rows] = np.where(fire, now, last)
+                for j in np.flatnonzero(fire).tolist():
+                    out.setdefault(j, []).append({
+                        "alertType":   rule["name"],
+                        "description": rule["text"].format(
+                            elapsed=int(elapsed[j]) if elapsed is not None else 0, faces=int(obs["faces"][j])),
+                        "confidence":  rule["confidence"],
+                        "severity":    rule["severity"],
+                    })
+        return out
+
+    def evaluate_one(self, pid, obs, now):
+        """evaluate() for one participant, `obs` holding scalars. Returns its alerts (no timestamp)."""
+        out = []
+        with self._lock:
+            row = self._row(pid)
+            self.seen[row] = time.monotonic()
+            for i, rule in enumerate(self.rules):
+                when = bool(rule["when"](obs))
+                gate = bool(rule["gate"](obs)) if "gate" in rule else True
+                last = self.alerted.item(i, row)
+                cool = now - last > rule["cooldown"]
+                kind = rule["kind"]
+                elapsed = 0.0
+                if kind == "duration":
+                    start   = self.timer.item(i, row)
+                    running = start == start   # not NaN
+                    held    = gate and when
+                    fire    = held and running and now - start > rule["after"] and cool
+                    elapsed = now - start
+                    if held and not running:
+                        self.timer[i, row] = now
+                    elif gate and not when and running:
+                        self.timer[i, row] = np.nan
+                elif kind == "strike":
+                    old   = self.strikes.item(i, row)
+                    hit   = gate and when
+                    count = old + 1 if hit else (max(old - 1, 0) if gate else old)
+                    fire  = hit and count >= rule["strikes"] and cool
+                    if fire:
+                        count = 0
+                    if count != old:
+                        self.strikes[i, row] = count
+                else:
+                    fire = gate and when and cool
+                if fire:
+                    self.alerted[i, row] = now
+                    out.append({
+                        "alertType":   rule["name"],
+                        "description": rule["text"].format(elapsed=int(elapsed), faces=int(obs["faces"])),
+                        "confidence":  rule["confidence"],
+                        "severity":    rule["severity"],
+                    })
+        return out
+
+    def state_view(self, pid):
+        """The participant's rule state under its legacy field names (None = timer idle)."""
+        view = {}
+        with self._lock:
+            row = self.index.get(pid)
+            for i, rule in enumerate(self.rules):
+                timer_key, alerted_key = rule["fields"]
+                if timer_key is not None:
+                    if rule["kind"] == "strike":
+                        view[timer_key] = 0 if row is None else self.strikes.item(i, row)
+                    else:
+                        t = np.nan if row is None else self.timer.item(i, row)
+                        view[timer_key] = None if t != t else t
+                view[alerted_key] = 0.0 if row is None else self.alerted.item(i, row)
+        return view
+
+    def stats(self):
+        return {"participants": len(self.index), "rows": self.size, "rules": [r["name"] for r in self.rules]}
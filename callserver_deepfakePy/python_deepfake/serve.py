@@ -0,0 +1,354 @@
+"""
+Multi-worker launcher with model preloading and sticky participant routing.
+
+    python serve.py --app simple_main --workers 4 --port 8000
+
+The supervisor imports the app module once (cascades / models load at import
+time), freezes the GC so the loaded objects are not dirtied by refcount
+passes, and then forks the workers. Read-only weights therefore stay shared
+copy-on-write instead of being loaded N times.
+
+Each worker serves the app on its own unix socket. A small router process
+owns the public port and forwards every request to the worker chosen by a
+stable hash of its participantId, so per-participant state (cooldowns,
+caches, schedules, ring buffers) is never split across workers. Requests
+without a participantId go to worker 0. Crashed workers are re-forked into
+the same slot, so routing does not change. A worker that cannot be reached
+or does not answer within TI_FORWARD_TIMEOUT seconds gets the client a 503,
+one that answers with something other than an HTTP response a 502.
+
+--cpu-budget (cores, default all) is divided evenly across the workers via
+TI_CPU_BUDGET, which sizes each worker's analysis threads. --pin also binds
+each worker to its own slice of cores.
+
+With --workers 1 this is the same as `uvicorn <app>:app`.
+"""
+import argparse
+import asyncio
+import gc
+import importlib
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import zlib
+
+import uvicorn
+
+PID_HEADER = b"x-participant-id"
+PID_JSON   = re.compile(rb'"participantId"\s*:\s*"((?:[^"\\]|\\.)*)"')
+PID_FORM   = re.compile(rb'name="participantId"\r\n\r\n([^\r]*)')
+PID_PATH   = re.compile(r"^/deepfake/schedule/([^/]+)$")
+HOP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"content-length", b"host"}
+FORWARD_TIMEOUT = float(os.environ.get("TI_FORWARD_TIMEOUT", 30))
+
+
+class BadResponse(Exception):
+    """A worker's reply is not a complete HTTP response (it crashed or closed the socket mid-request)."""
+
+
+def worker_slot(participant_id, n_workers):
+    if not participant_id or n_workers <= 1:
+        return 0
+    if isinstance(participant_id, str):
+        participant_id = participant_id.encode()
+    return zlib.crc32(participant_id) % n_workers
+
+
+def participant_from_request(scope, body):
+    for k, v in scope.get("headers", []):
+        if k == PID_HEADER:
+            return v
+    m = PID_PATH.match(scope.get("path", ""))
+    if m:
+        return m.group(1).encode()
+    for part in scope.get("query_string", b"").split(b"&"):
+        if part.startswith(b"participantId="):
+            return part.split(b"=", 1)[1]
+    m = PID_JSON.search(body) or PID_FORM.search(body)
+    return m.group(1) if m else None
+
+
+# ── Router (runs in its own process, owns the public port) ────────────────
+
+class Router:
+    def __init__(self, sockets):
+        self.sockets = sockets
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                msg = await receive()
+                if msg["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif msg["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        chunks = []
+        while True:
+            msg = await receive()
+            chunks.append(msg.get("body", b""))
+            if not msg.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        slot = worker_slot(participant_from_request(scope, body), len(self.sockets))
+        try:
+            if scope["path"] == "/metrics":
+                status, headers, payload = await self.scrape_all(scope)
+            else:
+                status, headers, payload = await self.forward(self.sockets[slot], scope, body)
+        except asyncio.TimeoutError:
+            status, headers, payload = error_response(503, f"worker {slot} did not answer within {FORWARD_TIMEOUT:g}s")
+        except OSError as exc:
+            status, headers, payload = error_response(503, f"worker {slot} unavailable: {exc}")
+        except BadResponse as exc:
+            status, headers, payload = error_response(502, f"worker {slot}: {exc}")
+        headers.append((b"content-length", str(len(payload)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": payload})
+
+    async def forward(self, path, scope, body):
+        return await asyncio.wait_for(self._forward(path, scope, body), FORWARD_TIMEOUT)
+
+    async def _forward(self, path, scope, body):
+        reader, writer = await asyncio.open_unix_connection(path)
+        try:
+            target = scope.get("raw_path") or scope["path"].encode()
+            if scope.get("query_string"):
+                target += b"?" + scope["query_string"]
+            lines = [b"%s %s HTTP/1.1" % (scope["method"].encode(), target), b"host: worker"]
+            lines += [k + b": " + v for k, v in scope.get("headers", []) if k not in HOP_HEADERS]
+            lines += [b"content-length: %d" % len(body), b"connection: close", b"", b""]
+            writer.write(b"\r\n".join(lines) + body)
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        return parse_response(raw)
+
+    async def scrape_all(self, scope):
+        """Fan /metrics out to every worker and label each sample with its worker slot."""
+        texts = []
+        for i, path in enumerate(self.sockets):
+            try:
+                status, _, payload = await self.forward(path, scope, b"")
+            except (OSError, asyncio.TimeoutError, BadResponse):
+                continue
+            if status == 200:
+                texts.append((i, payload))
+        return 200, [(b"content-type", b"text/plain; charset=utf-8")], merge_metrics(texts)
+
+
+def merge_metrics(texts):
+    """Merge worker expositions, keeping each metric family's lines together."""
+    families = {}
+    for slot, payload in texts:
+        label  = b'worker="%d"' % slot
+        family = None
+        for line in payload.splitlines():
+            if line.startswith(b"# HELP ") or line.startswith(b"# TYPE "):
+                family = line.split(b" ", 3)[2]
+                header, _ = families.setdefault(family, ([], []))
+                if line not in header:
+                    header.append(line)
+                continue
+            if not line or family is None:
+                continue
+            name, _, value = line.rpartition(b" ")
+            if b"{" in name:
+                name = name.replace(b"{", b"{" + label + b",", 1)
+            else:
+                name = name + b"{" + label + b"}"
+            families[family][1].append(name + b" " + value)
+    return b"".join(b"\n".join(h + s) + b"\n" for h, s in families.values())
+
+
+def error_response(status, message):
+    return status, [(b"content-type", b"application/json")], json.dumps({"error": message}).encode()
+
+
+def parse_response(raw):
+    head, sep, payload = raw.partition(b"\r\n\r\n")
+    lines  = head.split(b"\r\n")
+    parts  = lines[0].split(b" ", 2)
+    if not sep or len(parts) < 2 or not parts[0].startswith(b"HTTP/") or not parts[1].isdigit():
+        raise BadResponse(f"no HTTP response ({len(raw)} bytes)")
+    status = int(parts[1])
+    headers, chunked = [], False
+    for line in lines[1:]:
+        k, _, v = line.partition(b":")
+        k, v = k.strip().lower(), v.strip()
+        if k == b"transfer-encoding" and b"chunked" in v:
+            chunked = True
+        if k not in HOP_HEADERS:
+            headers.append((k, v))
+    if chunked:
+        try:
+            payload = dechunk(payload)
+        except ValueError:
+            raise BadResponse("truncated chunked body") from None
+    return status, headers, payload
+
+
+def dechunk(data):
+    out, pos = [], 0
+    while True:
+        end = data.index(b"\r\n", pos)
+        size = int(data[pos:end].split(b";")[0], 16)
+        if size == 0:
+            return b"".join(out)
+        out.append(data[end + 2:end + 2 + size])
+        pos = end + 2 + size + 2
+
+
+# ── Supervisor ─────────────────────────────────────────────────────────────
+
+def wait_ready(path, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(path)
+                s.sendall(b"GET /health HTTP/1.1\r\nhost: worker\r\nconnection: close\r\n\r\n")
+                if s.recv(16).startswith(b"HTTP/1.1 200"):
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def memory_kb(pid):
+    """(RSS, PSS) of a process in kB from /proc; PSS splits shared pages fairly."""
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def core_slice(slot, n_workers, cores):
+    """The cores worker `slot` is pinned to: an even, non-overlapping share where possible."""
+    per = max(1, len(cores) // n_workers)
+    start = (slot * per) % len(cores)
+    return cores[start:start + per]
+
+
+def fork_worker(app, path, log_level, cores=None):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if cores:
+            os.sched_setaffinity(0, cores)
+        uvicorn.Server(uvicorn.Config(app, uds=path, log_level=log_level)).run()
+        os._exit(0)
+    return pid
+
+
+def fork_router(sockets, host, port, log_level):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        uvicorn.Server(uvicorn.Config(Router(sockets), host=host, port=port, log_level=log_level)).run()
+        os._exit(0)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preloading multi-worker launcher")
+    parser.add_argument("--app", default="simple_main", help="module exposing `app` (simple_main or main)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--cpu-budget", type=float, default=os.cpu_count() or 1, help="cores for all workers together")
+    parser.add_argument("--pin", action="store_true", help="pin each worker to its own slice of cores")
+    args = parser.parse_args()
+
+    # Read by the app at import time, so it must be set before the preload
+    os.environ.setdefault("TI_CPU_BUDGET", str(max(0.5, args.cpu_budget / max(1, args.workers))))
+
+    t0 = time.time()
+    module = importlib.import_module(args.app)
+    if args.workers <= 1:
+        uvicorn.run(module.app, host=args.host, port=args.port, log_level=args.log_level)
+        return
+
+    # Preloaded objects become permanent: later GC passes in workers won't touch
+    # (and therefore won't copy) their pages.
+    gc.collect()
+    gc.freeze()
+
+    sock_dir = tempfile.mkdtemp(prefix="ti-workers-")
+    sockets  = [os.path.join(sock_dir, f"w{i}.sock") for i in range(args.workers)]
+    cores    = sorted(os.sched_getaffinity(0)) if args.pin else None
+    pin_for  = lambda slot: core_slice(slot, args.workers, cores) if cores else None
+    workers  = {fork_worker(module.app, path, args.log_level, pin_for(i)): i for i, path in enumerate(sockets)}
+    for path in sockets:
+        wait_ready(path)
+    router = fork_router(sockets, args.host, args.port, args.log_level)
+
+    rss, pss = zip(*(memory_kb(p) for p in [os.getpid(), *workers]))
+    print(
+        f"✅ {args.workers} workers ready in {time.time() - t0:.2f}s "
+        f"(RSS {sum(rss) / 1024:.0f} MB, PSS {sum(pss) / 1024:.0f} MB incl. supervisor) "
+        f"— routing by participantId on :{args.port}, {os.environ['TI_CPU_BUDGET']} cores each",
+        flush=True,
+    )
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in [router, *workers]:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        while True:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            if stopping:
+                continue
+            if pid == router:
+                print(f"⚠️ Router exited ({status}), restarting", flush=True)
+                router = fork_router(sockets, args.host, args.port, args.log_level)
+            elif pid in workers:
+                slot = workers.pop(pid)
+                print(f"⚠️ Worker {slot} exited ({status}), restarting", flush=True)
+                if os.path.exists(sockets[slot]):
+                    os.unlink(sockets[slot])
+                workers[fork_worker(module.app, sockets[slot], args.log_level, pin_for(slot))] = slot
+    finally:
+        shutil.rmtree(sock_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
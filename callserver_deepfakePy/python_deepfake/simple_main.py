@@ -1,5 +1,6 @@
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 import uvicorn
 import base64
@@ -7,8 +8,20 @@ import time
 import numpy as np
 import cv2
 import io
+import os
+import math
+import asyncio
 from collections import defaultdict
 
+from frame_cache import PerceptualCache, dhash, HASH_W, HASH_H
+from check_scheduler import CheckScheduler, TRIGGER_REASONS
+from temporal_scorer import TemporalScorer, CROP
+from metrics import Registry, MetricsMiddleware
+from admission import AdmissionController
+from priority_executor import PriorityExecutor, frame_priority, should_sample_down
+from clock import clock_from_env
+from rule_engine import RuleEngine
+
 app = FastAPI(title="TestIntegrity AI Service")
 
 app.add_middleware(
@@ -19,18 +32,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Per-participant state for cooldowns
+# Alert timers, strikes and cooldowns for every participant (see rule_engine.RULES)
+alert_rules = RuleEngine()
+
+# Per-participant scheduling state
 participant_state: dict = defaultdict(lambda: {
-    "no_face_start": None,
-    "no_face_alerted_at": 0,
-    "multi_face_start": None,
-    "multi_face_alerted_at": 0,
-    "phone_alerted_at": 0,
-    "speech_start": None,
-    "speech_alerted_at": 0,
-    "gaze_off_count": 0,
-    "gaze_alerted_at": 0,
+    "last_face_count": None,
+    "face_count_changed_at": 0,
+    "last_analyzed_at": 0,     # participant clock
+    "last_analyzed_wall": 0,   # wall clock, for scheduling (priority_executor)
+})
+
+# Near-duplicate frame cache (per participant, never shared across participants)
+frame_cache = PerceptualCache(max_distance=4, ttl=10.0)
+deepfake_cache = PerceptualCache(max_distance=4, ttl=30.0)
+
+# Per-participant deepfake check cadence (nextCheckAfter hints)
+check_scheduler = CheckScheduler()
+
+# Per-participant ring buffer of face crops for sequence-level deepfake scoring
+temporal_scorer = TemporalScorer()
+
+# Admission control / load shedding for /analyze-frame
+admission = AdmissionController()
+
+# Time source for the alert timers and cooldowns (TI_CLOCK=wall|frame|sim)
+frame_clock = clock_from_env()
+
+# CPU budget in cores for this process; serve.py splits the host budget across its workers.
+# Parallelism comes from one analysis thread per core, so OpenCV's own pool is kept to one thread.
+CPU_BUDGET = float(os.environ.get("TI_CPU_BUDGET", os.cpu_count() or 2))
+cv2.setNumThreads(1)
+
+# Analysis threads pull frames in suspicion order rather than arrival order
+analysis_executor = PriorityExecutor(workers=max(1, int(CPU_BUDGET)))
+
+# ── Metrics (/metrics, text exposition format) ───────────────────────────
+registry = Registry()
+REQUEST_LATENCY = registry.histogram("ti_request_duration_seconds", "Request latency by route", ("route", "method"))
+REQUESTS = registry.counter("ti_requests_total", "Requests by route and status", ("route", "method", "status"))
+IN_FLIGHT = registry.gauge("ti_requests_in_flight", "Requests currently being handled")
+STAGE = registry.histogram("ti_stage_duration_seconds", "Time spent per analysis stage", ("endpoint", "stage"))
+registry.counter("ti_frames_shed_total", "Frames rejected before analysis", ("reason",),
+                 fn=lambda: {(k,): v for k, v in admission.stats()["shed"].items()})
+registry.gauge("ti_cpu_budget_cores", "CPU budget of this process in cores", fn=lambda: CPU_BUDGET)
+registry.counter("ti_cpu_seconds_total", "CPU time used by this process", fn=time.process_time)
+ALERTS = registry.counter("ti_alerts_total", "Alerts raised by alertType", ("alertType",))
+VERDICTS = registry.counter("ti_deepfake_verdicts_total", "Deepfake verdicts", ("verdict",))
+registry.gauge("ti_participants_tracked", "Participants with live state per store", ("store",), fn=lambda: {
+    ("cooldowns",): len(participant_state),
+    ("frame_cache",): frame_cache.stats()["participants"],
+    ("deepfake_cache",): deepfake_cache.stats()["participants"],
+    ("scheduler",): check_scheduler.stats()["participants"],
+    ("temporal",): temporal_scorer.stats()["participants"],
 })
+registry.counter("ti_cache_hits_total", "Perceptual cache hits", ("cache",), fn=lambda: {
+    ("frame",): sum(k["hits"] for k in frame_cache.stats()["byKind"].values()),
+    ("deepfake",): sum(k["hits"] for k in deepfake_cache.stats()["byKind"].values()),
+})
+registry.counter("ti_cache_misses_total", "Perceptual cache misses", ("cache",), fn=lambda: {
+    ("frame",): sum(k["misses"] for k in frame_cache.stats()["byKind"].values()),
+    ("deepfake",): sum(k["misses"] for k in deepfake_cache.stats()["byKind"].values()),
+})
+
+app.add_middleware(MetricsMiddleware, latency=REQUEST_LATENCY, requests=REQUESTS, in_flight=IN_FLIGHT)
 
 # Load cascades once at startup
 face_cascade = None
@@ -43,22 +108,32 @@ except Exception as e:
     print(f"⚠️ Cascade load error: {e}")
 
 
-def _iso():
-    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()) + 'Z'
+def _iso(t=None):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(t)) + 'Z'
 
 
-def decode_b64_image(b64: str):
+def b64_bytes(b64: str):
     try:
         if ',' in b64:
             b64 = b64.split(',')[1]
-        data = base64.b64decode(b64)
-        arr = np.frombuffer(data, np.uint8)
-        return cv2.imdecode(arr, cv2.IMREAD_COLOR)
+        return np.frombuffer(base64.b64decode(b64), np.uint8)
     except Exception as e:
         print(f"Image decode error: {e}")
         return None
 
 
+def perceptual_hash(arr):
+    """dHash from a 1/8-scale grayscale JPEG decode — far cheaper than a full decode."""
+    try:
+        small = cv2.imdecode(arr, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if small is None:
+            return None
+        return dhash(cv2.resize(small, (HASH_W, HASH_H), interpolation=cv2.INTER_AREA))
+    except Exception as e:
+        print(f"Hash error: {e}")
+        return None
+
+
 def detect_phone(image) -> bool:
     try:
         h, w = image.shape[:2]
@@ -104,124 +179,231 @@ class AnalyzeRequest(BaseModel):
 
 @app.get("/health")
 def health():
-    return {"status": "healthy", "service": "TestIntegrity AI"}
+    return {"status": "healthy", "service": "TestIntegrity AI", "admission": admission.stats(),
+            "analysis": analysis_executor.stats(), "clock": frame_clock.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return registry.render()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"frame": frame_cache.stats(), "deepfake": deepfake_cache.stats(), "scheduler": check_scheduler.stats(),
+            "temporal": temporal_scorer.stats(), "rules": alert_rules.stats()}
+
+
+def face_crop(gray, faces):
+    """CROP x CROP grayscale crop of the largest face, for the temporal scorer."""
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    roi = gray[y:y + h, x:x + w]
+    if roi.size == 0:
+        return None
+    return cv2.resize(roi, (CROP, CROP), interpolation=cv2.INTER_AREA)
+
+
+def detect_frame(arr):
+    """Full decode + cascades. Returns the detection outputs the alert logic needs and a face crop."""
+    with STAGE.time("analyze-frame", "decode"):
+        image = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+    if image is None:
+        return None, None
+    faces = []
+    gaze_off = False
+    crop = None
+    if face_cascade is not None:
+        with STAGE.time("analyze-frame", "cascade"):
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = cv2.equalizeHist(gray)
+            found = face_cascade.detectMultiScale(
+                gray, scaleFactor=1.1, minNeighbors=5,
+                minSize=(60, 60), flags=cv2.CASCADE_SCALE_IMAGE
+            )
+        faces = [list(map(int, f)) for f in found]
+        if faces:
+            with STAGE.time("analyze-frame", "gaze"):
+                gaze_off = check_gaze(gray, faces[0])
+            crop = face_crop(gray, faces)
+    with STAGE.time("analyze-frame", "phone"):
+        phone = detect_phone(image)
+    return {
+        "faces": faces,
+        "gazeOff": gaze_off,
+        "phone": phone,
+        "cascades": face_cascade is not None,
+    }, crop
+
+
+def shed_response(reason, retry_after):
+    return JSONResponse(
+        status_code=429,
+        content={"alerts": [], "shed": reason, "retryAfterMs": int(retry_after * 1000), "timestamp": _iso()},
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
 
 
 @app.post("/analyze-frame")
-def analyze_frame(req: AnalyzeRequest):
-    """Main proctoring endpoint called from browser mode."""
-    alerts = []
-    now = time.time()
+async def analyze_frame_route(req: AnalyzeRequest):
+    """Main proctoring endpoint called from browser mode.
+
+    Stale frames, overload and, while analysis is backed up, extra frames from
+    clean participants are shed with 429. Admitted frames are analyzed in
+    suspicion order (see priority_executor).
+    """
     pid = req.participantId
+    now = frame_clock.now(pid, req.timestamp, record=False)
+    wall = time.time()
+    state = {**participant_state[pid], **alert_rules.state_view(pid)}
+    key, suspicious = frame_priority(state, now, wall)
+    wait = should_sample_down(state, suspicious, analysis_executor, wall)
+    if wait > 0:
+        admission.note_shed("sampled")
+        return shed_response("sampled", wait)
+    reason, retry_after = admission.try_admit(pid, req.timestamp, time.time())
+    if reason is not None:
+        return shed_response(reason, retry_after)
+    try:
+        fut = analysis_executor.submit(key, analyze_frame, req, time.perf_counter(), suspicious=suspicious)
+        result = await asyncio.wrap_future(fut)
+    finally:
+        admission.release(pid)
+    if result.get("shed"):
+        return shed_response(result["shed"], 0.0)
+    return result
+
+
+def detection_stage(pid, arr, now):
+    """
+    Returns (detection outputs, computed). A frame within perceptual-hash
+    distance of one analyzed in the last frame_cache.ttl seconds reuses that
+    frame's outputs instead of re-running the cascades, gaze and phone checks.
+    """
+    with STAGE.time("analyze-frame", "hash"):
+        h = perceptual_hash(arr)
+    det = frame_cache.lookup(pid, "frame", h, now) if h is not None else None
+    if det is not None:
+        return det, False
+    det, crop = detect_frame(arr)
+    if det is None:
+        return None, True
+    if h is not None:
+        frame_cache.store(pid, "frame", h, det, now)
+    if crop is not None:
+        with STAGE.time("analyze-frame", "temporal"):
+            temporal_scorer.push(pid, crop, source="frame")   # wall clock, like the /deepfake/predict ring
+    return det, True
+
+
+def notify_check(pid, reason):
+    """Make the participant's deepfake check due now; cached verdicts predate the trigger."""
+    deepfake_cache.forget(pid, "deepfake")
+    return check_scheduler.notify(pid, reason)
+
+
+def alert_stage(pid, det, now, computed, audio_energy):
+    """Timers advance on every frame; frame-count based state only on computed detections."""
     state = participant_state[pid]
+    face_count = len(det["faces"])
+    state["last_analyzed_at"] = now
+    state["last_analyzed_wall"] = time.time()
+    if state["last_face_count"] is not None and face_count != state["last_face_count"]:
+        state["face_count_changed_at"] = now
+    state["last_face_count"] = face_count
+
+    alerts = alert_rules.evaluate_one(pid, {
+        "faces":    face_count,
+        "cascades": bool(det["cascades"]),
+        "computed": bool(computed),
+        "gaze_off": bool(det["gazeOff"]),
+        "phone":    bool(det["phone"]),
+        "audio":    float(audio_energy),
+    }, now)
+
+    # Face loss / extra faces seen here pull the next deepfake check forward
+    for a in alerts:
+        a["timestamp"] = _iso(now)
+        ALERTS.inc(a["alertType"])
+        if a["alertType"] in TRIGGER_REASONS:
+            notify_check(pid, a["alertType"])
+    return alerts
+
+
+def analyze_frame(req: AnalyzeRequest, queued_at=None):
+    pid = req.participantId
+    if queued_at is not None:
+        STAGE.observe(time.perf_counter() - queued_at, "analyze-frame", "queue")
 
-    image = decode_b64_image(req.imageData)
-    if image is None:
-        return {"alerts": [], "faceDetected": False, "faceCount": 0}
+    # The frame may have waited for a worker thread; don't analyze it if it went stale meanwhile
+    if admission.is_stale(pid, req.timestamp, time.time()):
+        return {"alerts": [], "shed": "stale"}
+    now = frame_clock.now(pid, req.timestamp)
 
-    face_count = 0
+    with STAGE.time("analyze-frame", "b64"):
+        arr = b64_bytes(req.imageData)
+    if arr is None:
+        return {"alerts": [], "faceDetected": False, "faceCount": 0}
 
-    if face_cascade is not None:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.equalizeHist(gray)
-        faces = face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5,
-            minSize=(60, 60), flags=cv2.CASCADE_SCALE_IMAGE
-        )
-        face_count = len(faces)
-
-        # No face
-        if face_count == 0:
-            if state["no_face_start"] is None:
-                state["no_face_start"] = now
-            elif now - state["no_face_start"] > 5.0 and now - state["no_face_alerted_at"] > 10.0:
-                alerts.append({
-                    "alertType": "NO_FACE",
-                    "description": f"No face detected for {int(now - state['no_face_start'])}s",
-                    "confidence": 0.85,
-                    "severity": "MEDIUM",
-                    "timestamp": _iso(),
-                })
-                state["no_face_alerted_at"] = now
-        else:
-            state["no_face_start"] = None
-
-        # Multiple faces
-        if face_count > 1:
-            if state["multi_face_start"] is None:
-                state["multi_face_start"] = now
-            elif now - state["multi_face_start"] > 3.0 and now - state["multi_face_alerted_at"] > 10.0:
-                alerts.append({
-                    "alertType": "MULTIPLE_FACES",
-                    "description": f"{face_count} faces detected in frame",
-                    "confidence": 0.9,
-                    "severity": "HIGH",
-                    "timestamp": _iso(),
-                })
-                state["multi_face_alerted_at"] = now
-        else:
-            state["multi_face_start"] = None
-
-        # Gaze deviation
-        if face_count >= 1:
-            off = check_gaze(gray, faces[0])
-            if off:
-                state["gaze_off_count"] += 1
-                if state["gaze_off_count"] >= 4 and now - state["gaze_alerted_at"] > 15.0:
-                    alerts.append({
-                        "alertType": "GAZE_DEVIATION",
-                        "description": "Student gaze deviated off-screen",
-                        "confidence": 0.7,
-                        "severity": "MEDIUM",
-                        "timestamp": _iso(),
-                    })
-                    state["gaze_alerted_at"] = now
-                    state["gaze_off_count"] = 0
-            else:
-                state["gaze_off_count"] = max(0, state["gaze_off_count"] - 1)
-
-    # Phone detection
-    if detect_phone(image) and now - state["phone_alerted_at"] > 10.0:
-        alerts.append({
-            "alertType": "PHONE_DETECTED",
-            "description": "Possible mobile phone detected in frame",
-            "confidence": 0.65,
-            "severity": "HIGH",
-            "timestamp": _iso(),
-        })
-        state["phone_alerted_at"] = now
-
-    # Sustained speech
-    energy = req.audioEnergy
-    if energy > 0.15:
-        if state["speech_start"] is None:
-            state["speech_start"] = now
-        elif now - state["speech_start"] > 8.0 and now - state["speech_alerted_at"] > 20.0:
-            alerts.append({
-                "alertType": "SUSTAINED_SPEECH",
-                "description": f"Continuous speech for {int(now - state['speech_start'])}s",
-                "confidence": 0.75,
-                "severity": "MEDIUM",
-                "timestamp": _iso(),
-            })
-            state["speech_alerted_at"] = now
-    else:
-        state["speech_start"] = None
+    det, computed = detection_stage(pid, arr, now)
+    if det is None:
+        return {"alerts": [], "faceDetected": False, "faceCount": 0}
+    alerts = alert_stage(pid, det, now, computed, req.audioEnergy)
+    face_count = len(det["faces"])
 
     return {
         "alerts": alerts,
         "faceDetected": face_count > 0,
         "faceCount": face_count,
         "participantId": pid,
-        "timestamp": _iso(),
+        "cacheHit": not computed,
+        "analysis": "computed" if computed else "reused",
+        "timestamp": _iso(now),
     }
 
 
+class NotifyRequest(BaseModel):
+    participantId: str
+    reason: str = "MANUAL"
+
+
+@app.post("/deepfake/notify")
+def notify_trigger(req: NotifyRequest):
+    """External trigger (identity mismatch, face loss, ...) — makes the participant due now."""
+    if req.reason not in TRIGGER_REASONS:
+        return {"accepted": False, "error": f"unknown reason {req.reason}", "participantId": req.participantId}
+    return {
+        "accepted": True,
+        "participantId": req.participantId,
+        "nextCheckAfter": notify_check(req.participantId, req.reason),
+    }
+
+
+@app.get("/deepfake/schedule/{participant_id}")
+def check_schedule(participant_id: str):
+    return check_scheduler.describe(participant_id) or {"participantId": participant_id, "nextCheckAfter": 0.0}
+
+
 @app.post("/analyze")
 def analyze(data: dict):
     return {"status": "analyzed", "alerts": [], "confidence": 0.8}
 
 
+def push_deepfake_crop(pid, arr):
+    """Half-scale gray decode → face crop → the upload ring (not the /analyze-frame one). Window score or None."""
+    try:
+        gray = cv2.imdecode(arr, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+        if gray is None or face_cascade is None:
+            return None
+        found = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+        crop = face_crop(gray, found)
+        return temporal_scorer.push(pid, crop, source="upload") if crop is not None else None
+    except Exception as e:
+        print(f"Temporal crop error: {e}")
+        return None
+
+
 @app.post("/deepfake/predict")
 async def predict_deepfake(
     file: UploadFile = File(...),
@@ -232,11 +414,43 @@ async def predict_deepfake(
     try:
         import random
         from datetime import datetime
-        is_deepfake = random.random() < 0.05
-        confidence = random.uniform(0.8, 0.95)
+        with STAGE.time("deepfake", "read"):
+            contents = await file.read()
+        arr = np.frombuffer(contents, np.uint8)
+        with STAGE.time("deepfake", "hash"):
+            h = perceptual_hash(arr)
+        # A due check is a real check: the cache only answers frames sent ahead of schedule
+        due = check_scheduler.next_check_after(participantId) == 0.0
+        verdict = deepfake_cache.lookup(participantId, "deepfake", h) if h is not None and not due else None
+        cache_hit = verdict is not None
+        window = None
+        if verdict is None:
+            with STAGE.time("deepfake", "temporal"):
+                window = push_deepfake_crop(participantId, arr)
+            with STAGE.time("deepfake", "inference"):
+                verdict = {
+                    "is_deepfake": random.random() < 0.05,
+                    "confidence": random.uniform(0.8, 0.95),
+                }
+            if h is not None:
+                deepfake_cache.store(participantId, "deepfake", h, verdict)
+        if window is None:
+            window = temporal_scorer.score(participantId, source="upload")
+        if cache_hit:
+            next_check = round(check_scheduler.next_check_after(participantId), 2)   # a cached verdict is not a new data point
+        else:
+            next_check = check_scheduler.record_result(participantId, verdict["is_deepfake"], verdict["confidence"])
+        VERDICTS.inc("deepfake" if verdict["is_deepfake"] else "clean")
+        frame_score = verdict["confidence"] if verdict["is_deepfake"] else 1.0 - verdict["confidence"]
         return {
-            "is_deepfake": is_deepfake,
-            "confidence": confidence,
+            "is_deepfake": verdict["is_deepfake"],
+            "confidence": verdict["confidence"],
+            "frameScore": round(frame_score, 4),
+            "windowScore": window["score"] if window else None,
+            "window": window,
+            "streamWindow": temporal_scorer.score(participantId, source="frame"),   # /analyze-frame crops
+            "cacheHit": cache_hit,
+            "nextCheckAfter": next_check,
             "userId": userId,
             "meetingId": meetingId,
             "participantId": participantId,
@@ -0,0 +1,160 @@
+"""
+Temporal multi-frame deepfake scoring.
+
+Each participant gets a fixed-size, preallocated ring buffer of downscaled
+grayscale face crops plus per-slot features. Features are computed once when
+a frame arrives and folded into running sums, so the window score costs
+O(crop) per frame regardless of window length:
+
+  flicker   mean absolute difference between consecutive crops
+  boundary  jitter (std) of the border/inner edge-energy ratio — blend seams
+            move from frame to frame on face swaps
+  blink     eye-band dips; far too many "closed" frames in a window is odd
+
+Crops from different pipelines (a full-resolution equalized frame vs a
+half-scale raw upload) differ in sharpness and contrast, and alternating them
+in one window reads as flicker and seam jitter on a real face. Each
+(participant, source) pair therefore has its own ring.
+
+Memory per ring is WINDOW * CROP * CROP bytes plus a few scalars, and rings
+are dropped once they have been idle for IDLE_EVICT.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+WINDOW           = 16
+CROP             = 64
+MIN_FRAMES       = 4        # no window score until this many frames
+IDLE_EVICT       = 120.0
+MAX_PARTICIPANTS = 1024
+
+BORDER_PX     = 8
+EYE_BAND      = (int(CROP * 0.25), int(CROP * 0.45))
+BLINK_DROP    = 0.08        # eye band this much darker than its running mean = closed
+FLICKER_BASE  = 4.0         # mean |Δ| (0-255) of a live, seated candidate
+FLICKER_SPAN  = 20.0
+BORDER_SPAN   = 0.35
+BLINK_MAX_FRAC = 0.40       # more than this fraction of frames "closed" is unnatural
+
+W_FLICKER, W_BORDER, W_BLINK = 0.4, 0.4, 0.2
+
+
+class _Ring:
+    __slots__ = ("crops", "diff", "border", "eye", "blink", "head", "count",
+                 "s_diff", "n_diff", "s_border", "s_border2", "s_eye", "n_blink", "last_seen")
+
+    def __init__(self):
+        self.crops  = np.zeros((WINDOW, CROP, CROP), np.uint8)
+        self.diff   = np.full(WINDOW, np.nan, np.float32)   # NaN = no previous frame
+        self.border = np.zeros(WINDOW, np.float32)
+        self.eye    = np.zeros(WINDOW, np.float32)
+        self.blink  = np.zeros(WINDOW, np.bool_)
+        self.head = self.count = 0
+        self.s_diff = self.s_border = self.s_border2 = self.s_eye = 0.0
+        self.n_diff = self.n_blink = 0
+        self.last_seen = 0.0
+
+    def push(self, crop, now):
+        i = self.head
+        if self.count == WINDOW:
+            # Evict the oldest slot's contribution from the running sums
+            if not np.isnan(self.diff[i]):
+                self.s_diff -= float(self.diff[i]); self.n_diff -= 1
+            self.s_border  -= float(self.border[i])
+            self.s_border2 -= float(self.border[i]) ** 2
+            self.s_eye     -= float(self.eye[i])
+            self.n_blink   -= int(self.blink[i])
+
+        f = crop.astype(np.float32)
+        if self.count > 0:
+            prev = self.crops[(i - 1) % WINDOW]
+            d = float(np.mean(np.abs(f - prev)))
+            self.diff[i] = d
+            self.s_diff += d; self.n_diff += 1
+        else:
+            self.diff[i] = np.nan
+
+        gx = np.abs(np.diff(f, axis=1))[:-1, :]
+        gy = np.abs(np.diff(f, axis=0))[:, :-1]
+        g  = gx + gy
+        inner = g[BORDER_PX:-BORDER_PX, BORDER_PX:-BORDER_PX]
+        ring_sum = float(g.sum()) - float(inner.sum())
+        ring_n   = g.size - inner.size
+        b = (ring_sum / ring_n) / (float(inner.mean()) + 1e-3)
+        self.border[i] = b
+        self.s_border += b; self.s_border2 += b * b
+
+        e = float(f[EYE_BAND[0]:EYE_BAND[1]].mean())
+        n_prev = min(self.count, WINDOW - 1)
+        mean_eye = self.s_eye / n_prev if n_prev else e
+        closed = n_prev >= 2 and e < mean_eye * (1.0 - BLINK_DROP)
+        self.eye[i] = e; self.s_eye += e
+        self.blink[i] = closed; self.n_blink += int(closed)
+
+        np.copyto(self.crops[i], crop)
+        self.head  = (i + 1) % WINDOW
+        self.count = min(self.count + 1, WINDOW)
+        self.last_seen = now
+
+    def score(self):
+        n = self.count
+        if n < MIN_FRAMES:
+            return None
+        flicker = 0.0
+        if self.n_diff:
+            flicker = float(np.clip((self.s_diff / self.n_diff - FLICKER_BASE) / FLICKER_SPAN, 0.0, 1.0))
+        mean_b = self.s_border / n
+        std_b  = max(0.0, self.s_border2 / n - mean_b * mean_b) ** 0.5
+        boundary = float(np.clip(std_b / BORDER_SPAN, 0.0, 1.0))
+        blink = 0.0
+        if n == WINDOW:
+            blink = float(np.clip((self.n_blink / n - BLINK_MAX_FRAC) / BLINK_MAX_FRAC, 0.0, 1.0))
+        return {
+            "score":    round(W_FLICKER * flicker + W_BORDER * boundary + W_BLINK * blink, 4),
+            "flicker":  round(flicker, 4),
+            "boundary": round(boundary, 4),
+            "blink":    round(blink, 4),
+            "frames":   n,
+        }
+
+
+class TemporalScorer:
+    def __init__(self):
+        self._rings = OrderedDict()
+        self._lock  = threading.Lock()
+
+    def push(self, participant_id, crop, now=None, source="frame"):
+        """Add a CROP x CROP uint8 face crop from `source` and return that ring's window score (or None)."""
+        now = time.time() if now is None else now
+        key = (participant_id, source)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = _Ring()
+            self._rings.move_to_end(key)
+            ring.push(crop, now)
+            self._evict(now)
+            return ring.score()
+
+    def score(self, participant_id, source="frame"):
+        with self._lock:
+            ring = self._rings.get((participant_id, source))
+            return ring.score() if ring is not None else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "participants": len({pid for pid, _ in self._rings}),
+                "rings": len(self._rings),
+                "bytes": len(self._rings) * WINDOW * CROP * CROP,
+            }
+
+    def _evict(self, now):
+        while self._rings:
+            key, ring = next(iter(self._rings.items()))
+            if len(self._rings) <= MAX_PARTICIPANTS and now - ring.last_seen <= IDLE_EVICT:
+                break
+            del self._rings[key]
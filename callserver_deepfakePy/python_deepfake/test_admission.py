@@ -0,0 +1,34 @@
+from admission import CLOCK_SKEW, AdmissionController
+
+
+def test_first_frame_is_capped_against_wall_time():
+    adm = AdmissionController()
+    now = 1000.0
+    assert adm.try_admit("a", (now - CLOCK_SKEW - 5) * 1000, now) == ("stale", 0.0)
+    assert adm.try_admit("b", (now - CLOCK_SKEW + 1) * 1000, now) == (None, 0.0)
+
+
+def test_skewed_client_recovers_after_its_first_frame():
+    adm = AdmissionController()
+    skew = 300.0
+    assert adm.try_admit("a", (1000.0 - skew) * 1000, 1000.0)[0] == "stale"
+    assert adm.try_admit("a", (1001.0 - skew) * 1000, 1001.0) == (None, 0.0)
+
+
+def test_is_stale_does_not_move_the_baseline():
+    adm = AdmissionController()
+    assert adm.try_admit("a", 1000.0 * 1000, 1000.0) == (None, 0.0)
+    before = dict(adm._baseline)
+    assert adm.is_stale("a", 1000.0 * 1000, 1003.0)
+    assert adm._baseline == before
+    assert not adm.is_stale("a", 1003.0 * 1000, 1003.5)
+    assert adm._baseline == before
+    assert adm.shed["stale"] == 1
+
+
+def test_late_frame_is_measured_against_the_baseline():
+    adm = AdmissionController()
+    adm.try_admit("a", 1000.0 * 1000, 1000.2)
+    adm.release("a")
+    assert adm.age("a", 1001.0 * 1000, 1001.2) < 0.05
+    assert adm.age("a", 1001.0 * 1000, 1004.2) > 2.9
@@ -0,0 +1,50 @@
+import check_scheduler
+from check_scheduler import BASE_INTERVAL, CLEAN_STREAK, GROWTH, MAX_INTERVAL, MIN_INTERVAL, CheckScheduler
+
+
+def test_new_participant_is_due_and_keeps_the_base_interval_until_the_streak():
+    sched = CheckScheduler()
+    assert sched.next_check_after("a", now=0.0) == 0.0
+    for i in range(CLEAN_STREAK - 1):
+        assert sched.record_result("a", False, 0.95, now=float(i)) == BASE_INTERVAL
+    assert sched.record_result("a", False, 0.95, now=10.0) == round(BASE_INTERVAL * GROWTH, 2)
+
+
+def test_clean_streak_grows_up_to_the_cap():
+    sched = CheckScheduler()
+    for i in range(50):
+        hint = sched.record_result("a", False, 0.99, now=float(i))
+    assert hint == MAX_INTERVAL
+    assert sched.next_check_after("a", now=49.0) == MAX_INTERVAL
+
+
+def test_flag_or_low_confidence_drops_to_min():
+    sched = CheckScheduler()
+    for i in range(10):
+        sched.record_result("a", False, 0.99, now=float(i))
+    assert sched.record_result("a", True, 0.99, now=10.0) == MIN_INTERVAL
+    for i in range(10):
+        sched.record_result("b", False, 0.99, now=float(i))
+    assert sched.record_result("b", False, 0.5, now=10.0) == MIN_INTERVAL
+    # right after a flag, clean verdicts stay at MIN until the streak is re-established
+    assert sched.record_result("a", False, 0.99, now=11.0) == MIN_INTERVAL
+
+
+def test_trigger_makes_the_participant_due_now():
+    sched = CheckScheduler()
+    for i in range(10):
+        sched.record_result("a", False, 0.99, now=float(i))
+    assert sched.notify("a", "IDENTITY_MISMATCH", now=20.0) == 0.0
+    assert sched.next_check_after("a", now=20.0) == 0.0
+    desc = sched.describe("a", now=20.0)
+    assert desc["interval"] == MIN_INTERVAL and desc["cleanStreak"] == 0
+    assert desc["history"][-1] == [20.0, "trigger", "IDENTITY_MISMATCH"]
+
+
+def test_idle_participants_are_evicted(monkeypatch):
+    monkeypatch.setattr(check_scheduler, "IDLE_EVICT", 100.0)
+    sched = CheckScheduler()
+    sched.record_result("a", False, 0.99, now=0.0)
+    sched.record_result("b", False, 0.99, now=200.0)
+    assert sched.describe("a") is None
+    assert sched.stats()["participants"] == 1
@@ -0,0 +1,34 @@
+import time
+
+from clock import ParticipantClock
+
+
+def test_frame_clock_follows_capture_time_per_participant():
+    clock = ParticipantClock("frame")
+    assert clock.now("a", 1_000_000) == 1000.0
+    assert clock.now("a", 1_002_500) == 1002.5
+    assert clock.now("a", 1_001_000) == 1002.5    # out of order: clamped
+    assert clock.stats()["clamped"] == 1
+
+
+def test_untimestamped_frame_keeps_the_participant_offset():
+    clock = ParticipantClock("frame")
+    behind = time.time() - 300.0                  # sender clock five minutes behind
+    clock.now("a", behind * 1000)
+    t = clock.now("a", 0)
+    assert abs(t - behind) < 1.0                  # not wall time, which would pin the clamp
+    assert abs(clock.now("a", (behind + 2.0) * 1000) - (behind + 2.0)) < 1e-6
+    assert clock.stats()["offsetFrames"] == 1
+
+
+def test_participant_first_seen_without_timestamp_stays_on_wall_clock():
+    clock = ParticipantClock("frame")
+    clock.now("a", 0)
+    t = clock.now("a", (time.time() - 300.0) * 1000)
+    assert abs(t - time.time()) < 1.0
+
+
+def test_peek_does_not_record():
+    clock = ParticipantClock("frame")
+    clock.now("a", 5_000, record=False)
+    assert clock.now("a", 1_000) == 1.0
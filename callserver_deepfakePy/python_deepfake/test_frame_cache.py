@@ -0,0 +1,58 @@
+import numpy as np
+
+from frame_cache import HASH_H, HASH_W, PerceptualCache, dhash, hamming
+
+
+def test_dhash_is_stable_and_close_for_near_duplicates():
+    rng = np.random.RandomState(0)
+    thumb = rng.randint(0, 256, (HASH_H, HASH_W))
+    assert dhash(thumb) == dhash(thumb.copy())
+    noisy = np.clip(thumb + rng.randint(-2, 3, thumb.shape), 0, 255)
+    assert hamming(dhash(thumb), dhash(noisy)) <= 8
+    assert 0 <= dhash(thumb) < 1 << 64
+
+
+def test_lookup_hits_within_distance_and_misses_beyond():
+    cache = PerceptualCache(max_distance=2)
+    cache.store("a", "deepfake", 0b1111, "r", now=0.0)
+    assert cache.lookup("a", "deepfake", 0b1100, now=1.0) == "r"
+    assert cache.lookup("a", "deepfake", 0b0000, now=1.0) is None
+    assert cache.stats()["byKind"]["deepfake"] == {"hits": 1, "misses": 1, "hitRate": 0.5}
+
+
+def test_results_never_cross_participants_or_kinds():
+    cache = PerceptualCache()
+    cache.store("a", "deepfake", 42, "r", now=0.0)
+    assert cache.lookup("b", "deepfake", 42, now=0.0) is None
+    assert cache.lookup("a", "faces", 42, now=0.0) is None
+
+
+def test_nearest_entry_wins():
+    cache = PerceptualCache(max_distance=4)
+    cache.store("a", "k", 0b0000, "far", now=0.0)
+    cache.store("a", "k", 0b0111, "near", now=0.0)
+    assert cache.lookup("a", "k", 0b1111, now=0.0) == "near"
+
+
+def test_ttl_and_lru_eviction():
+    cache = PerceptualCache(max_distance=0, ttl=10.0, max_entries=2, max_participants=1)
+    cache.store("a", "k", 1, "one", now=0.0)
+    assert cache.lookup("a", "k", 1, now=11.0) is None
+    cache.store("a", "k", 2, "two", now=20.0)
+    cache.store("a", "k", 3, "three", now=20.0)
+    cache.store("a", "k", 4, "four", now=20.0)
+    assert cache.lookup("a", "k", 2, now=20.0) is None
+    assert cache.lookup("a", "k", 4, now=20.0) == "four"
+    cache.store("b", "k", 4, "b", now=20.0)
+    assert cache.lookup("a", "k", 4, now=20.0) is None
+    assert cache.stats()["participants"] == 1
+
+
+def test_forget_one_kind_or_all():
+    cache = PerceptualCache()
+    cache.store("a", "x", 1, "x", now=0.0)
+    cache.store("a", "y", 1, "y", now=0.0)
+    cache.forget("a", "x")
+    assert cache.lookup("a", "x", 1, now=0.0) is None and cache.lookup("a", "y", 1, now=0.0) == "y"
+    cache.forget("a")
+    assert cache.stats()["participants"] == 0
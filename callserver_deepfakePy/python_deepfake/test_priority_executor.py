@@ -0,0 +1,29 @@
+from priority_executor import CLEAN_INTERVAL, STARVED_BOOST, SUSPICIOUS_BOOST, frame_priority, should_sample_down
+
+
+class Busy:
+    def saturated(self):
+        return True
+
+
+def test_priority_key_is_wall_time_whatever_the_participant_clock():
+    wall = 1.7e9
+    state = {"last_analyzed_wall": wall - 1.0}
+    behind, _ = frame_priority(state, wall - 600.0, wall)
+    ahead, _ = frame_priority(state, wall + 600.0, wall)
+    assert behind == ahead == wall
+
+
+def test_boosts():
+    wall = 1.7e9
+    key, suspicious = frame_priority({"no_face_start": wall - 3, "last_analyzed_wall": wall - 1}, wall, wall)
+    assert suspicious and key == wall - SUSPICIOUS_BOOST
+    key, _ = frame_priority({"last_analyzed_wall": wall - 60}, wall, wall)
+    assert key == wall - STARVED_BOOST
+
+
+def test_sampling_uses_wall_clock_gap():
+    wall = 1.7e9
+    state = {"last_analyzed_at": wall + 600.0, "last_analyzed_wall": wall - 0.5}
+    assert should_sample_down(state, False, Busy(), wall) == CLEAN_INTERVAL - 0.5
+    assert should_sample_down(state, True, Busy(), wall) == 0.0
@@ -0,0 +1,95 @@
+import numpy as np
+
+import rule_engine
+from bench import legacy_alert_stage
+from rule_engine import RuleEngine
+
+
+def legacy_state():
+    return {"no_face_start": None, "no_face_alerted_at": 0, "multi_face_start": None, "multi_face_alerted_at": 0,
+            "phone_alerted_at": 0, "speech_start": None, "speech_alerted_at": 0, "gaze_off_count": 0,
+            "gaze_alerted_at": 0}
+
+
+def legacy_view(state):
+    return {k: (float(v) if v is not None and (k.endswith("_at") or k.endswith("_start")) else v)
+            for k, v in state.items()}
+
+
+def observations(n, steps, seed=1):
+    """Sticky random observation batches, so duration rules actually expire and fire."""
+    rng = np.random.RandomState(seed)
+    faces = rng.choice([0, 1, 2], n, p=[0.2, 0.7, 0.1])
+    speak = rng.rand(n) < 0.2
+    for _ in range(steps):
+        faces = np.where(rng.rand(n) < 0.1, rng.choice([0, 1, 2], n, p=[0.2, 0.7, 0.1]), faces)
+        speak = np.where(rng.rand(n) < 0.08, ~speak, speak)
+        yield rng.uniform(0.2, 1.5, n), {
+            "faces":    faces.copy(),
+            "cascades": rng.rand(n) < 0.97,
+            "computed": rng.rand(n) < 0.7,
+            "gaze_off": rng.rand(n) < 0.5,
+            "phone":    rng.rand(n) < 0.03,
+            "audio":    np.where(speak, 0.3, 0.05) + rng.rand(n) * 0.05,
+        }
+
+
+def legacy(states, obs, now, j):
+    det = {"faces": [None] * int(obs["faces"][j]), "cascades": bool(obs["cascades"][j]),
+           "gazeOff": bool(obs["gaze_off"][j]), "phone": bool(obs["phone"][j])}
+    return legacy_alert_stage(states[j], det, float(now[j]), bool(obs["computed"][j]), float(obs["audio"][j]))
+
+
+def test_batch_and_scalar_match_legacy_if_else():
+    n = 20
+    batch, scalar, states = RuleEngine(), RuleEngine(), [legacy_state() for _ in range(n)]
+    rows = batch.rows([f"p{j}" for j in range(n)])
+    now, fired = np.full(n, 1.7e9), 0
+    for step, obs in observations(n, 400):
+        now = now + step
+        got = batch.evaluate(rows, obs, now)
+        for j in range(n):
+            want = legacy(states, obs, now, j)
+            one = scalar.evaluate_one(f"p{j}", {k: v[j].item() for k, v in obs.items()}, float(now[j]))
+            assert [(a["alertType"], a["description"]) for a in got.get(j, [])] == want
+            assert [(a["alertType"], a["description"]) for a in one] == want
+            fired += len(want)
+    assert fired > 50
+    for j in range(n):
+        assert batch.state_view(f"p{j}") == scalar.state_view(f"p{j}") == legacy_view(states[j])
+
+
+def test_state_view_of_unseen_participant_allocates_nothing():
+    engine = RuleEngine()
+    view = engine.state_view("nobody")
+    assert view["no_face_start"] is None and view["gaze_off_count"] == 0 and view["phone_alerted_at"] == 0.0
+    assert engine.stats()["participants"] == 0
+
+
+def test_rows_survive_column_growth():
+    engine = RuleEngine(capacity=2)
+    engine.evaluate_one("a", {"faces": 0, "cascades": True, "computed": True, "gaze_off": False,
+                              "phone": False, "audio": 0.0}, 100.0)
+    engine.rows([f"p{j}" for j in range(5)])
+    assert engine.timer.shape[1] >= 6
+    assert engine.state_view("a")["no_face_start"] == 100.0
+
+
+def test_released_row_is_reset_and_reused():
+    engine = RuleEngine()
+    engine.evaluate_one("a", {"faces": 1, "cascades": True, "computed": True, "gaze_off": False,
+                              "phone": True, "audio": 0.0}, 100.0)
+    row = engine.index["a"]
+    engine.release("a")
+    assert engine.rows(["b"])[0] == row
+    assert engine.state_view("b")["phone_alerted_at"] == 0.0
+    assert "a" not in engine.index
+
+
+def test_idle_rows_are_reclaimed_instead_of_growing(monkeypatch):
+    engine = RuleEngine(capacity=2)
+    engine.rows(["a", "b"])
+    monkeypatch.setattr(rule_engine, "IDLE_EVICT", -1.0)
+    engine.rows(["c"])
+    assert engine.timer.shape[1] == 2
+    assert "c" in engine.index and len(engine.index) == 1
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+
+import serve
+from serve import BadResponse, Router, parse_response, worker_slot
+
+
+def test_parse_response_plain_and_chunked():
+    assert parse_response(b"HTTP/1.1 200 OK\r\ncontent-type: text/plain\r\ncontent-length: 2\r\n\r\nhi") == \
+        (200, [(b"content-type", b"text/plain")], b"hi")
+    status, _, payload = parse_response(b"HTTP/1.1 201 Created\r\ntransfer-encoding: chunked\r\n\r\n"
+                                        b"2\r\nhe\r\n3\r\nllo\r\n0\r\n\r\n")
+    assert (status, payload) == (201, b"hello")
+
+
+@pytest.mark.parametrize("raw", [b"", b"garbage", b"HTTP/1.1\r\n\r\n",
+                                 b"HTTP/1.1 200 OK\r\ntransfer-encoding: chunked\r\n\r\n5\r\nab"])
+def test_parse_response_rejects_broken_replies(raw):
+    with pytest.raises(BadResponse):
+        parse_response(raw)
+
+
+def test_worker_slot_is_stable():
+    assert worker_slot("p-1", 4) == worker_slot(b"p-1", 4)
+    assert worker_slot(None, 4) == 0 and worker_slot("p-1", 1) == 0
+
+
+def call(router, path="/analyze-frame"):
+    """Run one request through the router; returns (status, JSON body)."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b'{"participantId": "p"}', "more_body": False}
+
+    async def send(msg):
+        sent.append(msg)
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": [], "query_string": b""}
+    asyncio.run(router(scope, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def with_worker(handler):
+    """A router in front of one unix-socket worker that runs `handler(reader, writer)`."""
+    path = os.path.join(tempfile.mkdtemp(), "w.sock")
+    result = {}
+
+    async def main():
+        server = await asyncio.start_unix_server(handler, path)
+        async with server:
+            result["reply"] = await asyncio.get_running_loop().run_in_executor(None, call, Router([path]))
+
+    asyncio.run(main())
+    return result["reply"]
+
+
+def test_worker_closing_the_socket_is_a_502():
+    async def crash(reader, writer):
+        await reader.read(1)
+        writer.close()
+
+    status, body = with_worker(crash)
+    assert status == 502 and "worker 0" in body["error"]
+
+
+def test_hung_worker_is_a_503(monkeypatch):
+    monkeypatch.setattr(serve, "FORWARD_TIMEOUT", 0.2)
+
+    async def hang(reader, writer):
+        await asyncio.sleep(5)
+
+    status, body = with_worker(hang)
+    assert status == 503 and "did not answer" in body["error"]
+
+
+def test_missing_worker_is_a_503():
+    status, body = call(Router([os.path.join(tempfile.mkdtemp(), "none.sock")]))
+    assert status == 503 and "unavailable" in body["error"]